@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
 
 from app.models.exercise import (
     ExerciseInfo,
     ExerciseSessionResponse,
     ExerciseSessionListResponse,
+    VideoAnalysisJob,
     EXERCISE_CATALOG,
 )
 from app.services.exercise_session_service import ExerciseSessionService
+from app.services.video_analysis_service import VideoAnalysisService
 
 router = APIRouter(prefix="/api/exercises", tags=["Exercises"])
 
@@ -36,3 +38,25 @@ async def get_session(session_id: str):
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
+
+
+@router.post("/analyze", response_model=VideoAnalysisJob, status_code=202)
+async def analyze_video(
+    file: UploadFile = File(...),
+    exercise: str = Form(...),
+    member_id: str = Form(...),
+):
+    """Upload a recorded set; reps are counted in the background."""
+    try:
+        return await VideoAnalysisService.create_job(file, exercise, member_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/analyze/{job_id}", response_model=VideoAnalysisJob)
+async def get_analysis(job_id: str):
+    """Poll the progress and result of a video analysis job."""
+    job = await VideoAnalysisService.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
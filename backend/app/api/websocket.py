@@ -2,38 +2,80 @@
 WebSocket endpoint for real-time exercise tracking.
 
 Flow:
-1. Client connects with exercise type and member_id
-2. Client sends base64-encoded video frames
-3. Server processes frames through PoseEngine → ExerciseTracker
-4. Server streams back real-time state, rep count, form score, feedback
-5. On disconnect, session is saved to MongoDB and Kafka event is published
+1. Client connects with exercise type and member_id; when the node is full
+   it waits briefly for a slot and is otherwise closed with 1013 and a
+   retry-after hint
+2. Server advertises the capture profile (resolution, fps, JPEG quality)
+3. Client sends video frames: raw JPEG behind a small binary header, or
+   base64 in JSON for clients that do not negotiate the binary subprotocol
+4. Server hands frames to the pose worker processes → ExerciseTracker
+5. Server streams back real-time state, rep count, form score, feedback,
+   and a new capture profile whenever session latency or node load changes it;
+   the client may switch exercise between frames (a circuit) on the same
+   socket and pose engine
+6. On disconnect, each exercise block is saved to MongoDB in one write and
+   Kafka events are published; a dropped connection first gets a grace period
+   to resume (see session_checkpoint_service)
+
+Receiving, processing and sending run as separate tasks joined by bounded
+queues (see frame_ingest), so a slow client and slow inference do not stall
+each other.
 """
 
-import base64
-import json
+import asyncio
 import time
-from datetime import datetime
-
-import numpy as np
-from PIL import Image
-import io
+from datetime import datetime, timedelta
+from functools import partial
 
 import structlog
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
 
+from app.config import settings
+from app.models.exercise import ExerciseSegment, ExerciseSessionCheckpoint
+from app.services.admission import get_admission
+from app.services.capture_control import CaptureController
 from app.services.exercise_tracker import create_tracker
 from app.services.exercise_session_service import ExerciseSessionService
+from app.services.frame_decoder import FrameDecoder
+from app.services.frame_ingest import (
+    FRAME_POLICIES,
+    FrameMailbox,
+    ResponseOutbox,
+    receive_into,
+    send_from,
+)
+from app.services.frame_protocol import (
+    BINARY_SUBPROTOCOLS,
+    FLAG_OVERLAY,
+    POSE_SOURCES,
+    SUBPROTOCOL_COMPACT,
+    ControlMessage,
+    FrameProtocolError,
+    negotiate,
+    parse_binary,
+    parse_json,
+)
+from app.services.frame_sampling import FrameChangeDetector, KeyframeScheduler
+from app.services.frame_timing import ClockOffset, FrameTimer, SessionTimings
+from app.services.pose_engine import ANGLE_PLANS
+from app.services.pose_executor import PoseWorkerLost, get_pose_executor
+from app.services.response_codec import (
+    MSGPACK_AVAILABLE,
+    CompactResponder,
+    JsonResponder,
+)
+from app.services.session_checkpoint_service import (
+    SessionCheckpointer,
+    SessionCheckpointService,
+)
+
 
 router = APIRouter()
 logger = structlog.get_logger()
 
-# Try to import PoseEngine — may not be available in test/CI
-try:
-    from app.services.pose_engine import PoseEngine
-
-    POSE_ENGINE_AVAILABLE = True
-except Exception:
-    POSE_ENGINE_AVAILABLE = False
+# Closes that end a session on purpose; anything else is a drop that may be
+# resumed. Browsers report close() without a code as 1005.
+CLEAN_CLOSE_CODES = (status.WS_1000_NORMAL_CLOSURE, status.WS_1005_NO_STATUS_RCVD)
 
 
 @router.websocket("/ws/exercise/{exercise_type}")
@@ -43,9 +85,38 @@ async def exercise_websocket(websocket: WebSocket, exercise_type: str):
 
     Query params:
         member_id: optional member ID to save session on disconnect
-
-    Message format (client → server):
-        {"frame": "<base64-encoded-jpeg>"}
+        session: token from an earlier "session" message, to resume that
+            session's reps after a dropped connection (on any node)
+        frames: "latest" (default) processes only the newest pending frame and
+            drops stale ones, and skips frames captured more than
+            ws_frame_deadline_ms ago; "ordered" processes every frame in order
+        timings: "1" adds this frame's stage durations (ms) to each response
+        pose: "server" (default) runs inference on the frames the client
+            sends; "client" expects landmarks computed in the browser and
+            only leases a pose engine if the client falls back to frames
+
+    Subprotocols:
+        fithub.compact.v1: binary frames as below, answered with msgpack
+            deltas; landmarks only for frames flagged FLAG_OVERLAY
+        fithub.binary.v1: binary messages, a 16-byte header (seq, client
+            timestamp, flags) followed by the JPEG bytes
+        fithub.json.v1 (or none): text messages as below
+
+    Message format (client → server, JSON mode):
+        {"frame": "<base64-encoded-jpeg>", "seq": 812, "ts": <capture ms>}
+        {"landmarks": [[x, y, z, visibility], ...]}  (33 BlazePose or 13 rows)
+        (seq and ts optional; ts is the client's capture time)
+
+    Control message (client → server, JSON text in every mode):
+        {"type": "exercise", "exercise": "bicep_curl"}
+        answered with {"type": "exercise", "exercise": "bicep_curl",
+        "segment": 2, "rep_count": 0}
+
+    Session message (server → client), on connect when Redis is available:
+        {"type": "session", "token": "...", "resumed": false, "rep_count": 0}
+
+    Control message (server → client), on connect and on every change:
+        {"type": "capture", "width": 640, "height": 480, "fps": 10, "quality": 0.7}
 
     Message format (server → client):
         {
@@ -56,149 +127,589 @@ async def exercise_websocket(websocket: WebSocket, exercise_type: str):
             "avg_form_score": 85.2,
             "feedback": ["Control the descent"],
             "angles": {"left_knee": 120.5, "right_knee": 118.3, "primary": 119.4},
-            "landmarks": {...}
+            "landmarks": {...},
+            "frame_number": 12,
+            "seq": 812,
+            "dropped_frames": 4,
+            "expired_frames": 1,
+            "model_complexity": 1,
+            "skipped_frames": 20,
+            "interpolated_frames": 0,
+            "queue_depths": {"receive": 0, "send": 1},
+            "timings": {"parse": 0.02, "decode": 1.8, ...}  (with ?timings=1)
         }
     """
-    await websocket.accept()
+    subprotocol = negotiate(
+        websocket.scope.get("subprotocols", []), compact=MSGPACK_AVAILABLE
+    )
+    binary = subprotocol in BINARY_SUBPROTOCOLS
+    responder = (
+        CompactResponder() if subprotocol == SUBPROTOCOL_COMPACT else JsonResponder()
+    )
+    await websocket.accept(subprotocol=subprotocol)
 
     member_id = websocket.query_params.get("member_id", "anonymous")
+    frame_policy = websocket.query_params.get("frames", settings.ws_frame_policy)
+    if frame_policy not in FRAME_POLICIES:
+        await responder.send(
+            websocket,
+            {
+                "error": f"Unknown frame policy: {frame_policy}. Available: {list(FRAME_POLICIES)}"
+            },
+        )
+        await websocket.close(code=4000)
+        return
+
+    pose_source = websocket.query_params.get("pose", "server")
+    if pose_source not in POSE_SOURCES or (
+        pose_source == "client" and not settings.ws_client_landmarks_enabled
+    ):
+        await responder.send(
+            websocket,
+            {"error": f"Unsupported pose source: {pose_source}"},
+        )
+        await websocket.close(code=4000)
+        return
 
     # Validate exercise type
     try:
         tracker = create_tracker(exercise_type)
     except ValueError as e:
-        await websocket.send_json({"error": str(e)})
+        await responder.send(websocket, {"error": str(e)})
         await websocket.close(code=4000)
         return
 
-    # Initialize pose engine
-    pose_engine = None
-    if POSE_ENGINE_AVAILABLE:
-        try:
-            pose_engine = PoseEngine()
-            logger.info("pose_engine_ready", exercise=exercise_type)
-        except Exception as e:
-            logger.warning("pose_engine_init_failed", error=str(e))
-    else:
-        logger.warning("pose_engine_not_available")
-
-    started_at = datetime.utcnow()
-    start_time = time.monotonic()
-    rep_details: list[dict] = []
-    frame_count = 0
-
-    logger.info(
-        "exercise_ws_connected",
-        exercise=exercise_type,
-        member_id=member_id,
-    )
+    # Admission: a slot among this node's live sessions, waiting briefly in
+    # line when the node is full
+    admission = get_admission()
 
-    try:
-        while True:
-            raw = await websocket.receive_text()
+    async def reject_at_capacity():
+        retry_after = settings.ws_retry_after
+        await responder.send(
+            websocket, {"error": "Server at capacity", "retry_after": retry_after}
+        )
+        await websocket.close(
+            code=status.WS_1013_TRY_AGAIN_LATER, reason=f"retry-after={retry_after}"
+        )
 
-            try:
-                data = json.loads(raw)
-            except json.JSONDecodeError:
-                await websocket.send_json({"error": "Invalid JSON"})
-                continue
+    if not await admission.admit():
+        logger.warning(
+            "exercise_ws_rejected", exercise=exercise_type, **admission.stats
+        )
+        await reject_at_capacity()
+        return
 
-            frame_b64 = data.get("frame")
-            if not frame_b64:
-                await websocket.send_json({"error": "Missing 'frame' field"})
-                continue
+    # Everything the session holds from here on (the slot, an engine lease)
+    # is released however the handler exits, including a client that gives
+    # up while the messages below are sent
+    admitted = True
+    pose_executor = get_pose_executor()
+    pose_lease = None
+    try:
+        # Pose inference runs in worker processes, off the event loop, on a
+        # warm engine leased from the pool for the lifetime of this session.
+        # Client-side landmark sessions lease one only when frames arrive.
+        lease_attempted = False
+
+        async def checkout_engine():
+            nonlocal lease_attempted
+            lease_attempted = True
+            if not pose_executor:
+                logger.warning("pose_engine_not_available")
+                return None
+            try:
+                lease = await pose_executor.checkout(
+                    timeout=settings.pose_pool_checkout_timeout
+                )
+                logger.info("pose_engine_ready", exercise=exercise_type)
+                return lease
+            except asyncio.TimeoutError:
+                logger.warning("pose_pool_exhausted", exercise=exercise_type)
+                return None
+
+        if pose_source == "server":
+            pose_lease = await checkout_engine()
+            if pose_executor and pose_lease is None:
+                await reject_at_capacity()
+                return
+
+        started_at = datetime.utcnow()
+        start_time = time.monotonic()
+        rep_details: list[dict] = []
+        # Finished exercise blocks of a circuit, and when the current one began
+        segments: list[ExerciseSegment] = []
+        segment_offset = 0
+        frame_count = 0
+        # Per-stage frame latency histograms (see frame_timing)
+        timings = SessionTimings()
+        dropped_before = 0
+        # Frames skipped for arriving past ws_frame_deadline_ms
+        expired = expired_before = 0
+        mailbox: FrameMailbox | None = None
+        echo_timings = websocket.query_params.get("timings") in ("1", "true")
+
+        # Resume a dropped session from its Redis checkpoint, or start a new one.
+        # Without Redis the session is simply not resumable.
+        connection_id = SessionCheckpointService.new_token()
+        session_token = None
+        resumed = False
+
+        def checkpoint_state() -> ExerciseSessionCheckpoint:
+            return ExerciseSessionCheckpoint(
+                token=session_token,
+                owner=connection_id,
+                member_id=member_id,
+                exercise=exercise_type,
+                tracker=tracker.snapshot(),
+                rep_details=rep_details,
+                frame_count=frame_count,
+                dropped_frames=dropped_before + (mailbox.dropped if mailbox else 0),
+                expired_frames=expired_before + expired,
+                duration_seconds=int(time.monotonic() - start_time),
+                started_at=started_at,
+                timings=timings.snapshot(),
+                segments=segments,
+                segment_offset=segment_offset,
+            )
+
+        def current_segment() -> ExerciseSegment:
+            elapsed = int(time.monotonic() - start_time)
+            return ExerciseSegment(
+                exercise=exercise_type,
+                tracker=tracker.snapshot(),
+                rep_details=rep_details,
+                started_at=started_at + timedelta(seconds=segment_offset),
+                duration_seconds=elapsed - segment_offset,
+            )
+
+        if settings.ws_resume_enabled:
+            resume_token = websocket.query_params.get("session")
+            try:
+                checkpoint = (
+                    await SessionCheckpointService.claim(resume_token, connection_id)
+                    if resume_token
+                    else None
+                )
+                if checkpoint and (
+                    checkpoint.member_id != member_id
+                    or checkpoint.exercise != exercise_type
+                ):
+                    # Not this client's set — hand it back to its owner
+                    await SessionCheckpointService.save(checkpoint, connection_id)
+                    await responder.send(
+                        websocket,
+                        {"error": "Session belongs to another member or exercise"},
+                    )
+                    await websocket.close(code=4000)
+                    return
+                if checkpoint:
+                    tracker.restore(checkpoint.tracker)
+                    rep_details = checkpoint.rep_details
+                    frame_count = checkpoint.frame_count
+                    dropped_before = checkpoint.dropped_frames
+                    expired_before = checkpoint.expired_frames
+                    timings.restore(checkpoint.timings)
+                    segments = checkpoint.segments
+                    segment_offset = checkpoint.segment_offset
+                    started_at = checkpoint.started_at
+                    start_time -= checkpoint.duration_seconds
+                    resumed = True
+                session_token = (
+                    checkpoint.token
+                    if checkpoint
+                    else SessionCheckpointService.new_token()
+                )
+                await SessionCheckpointService.save(checkpoint_state())
+            except Exception as e:
+                logger.warning("session_checkpoint_unavailable", error=str(e))
+                session_token = None
+        checkpointer = SessionCheckpointer(settings.ws_checkpoint_interval)
+
+        # Tell the client how to capture; adjusted below as load changes
+        capture = (
+            CaptureController(
+                settings.capture_latency_budget_ms, settings.capture_initial_level
+            )
+            if settings.capture_control_enabled
+            else None
+        )
+        if session_token:
+            await responder.send(
+                websocket,
+                {
+                    "type": "session",
+                    "token": session_token,
+                    "resumed": resumed,
+                    "rep_count": tracker.rep_count,
+                },
+            )
+        if capture:
+            await responder.send(websocket, capture.message())
+
+        client_landmark_frames = 0
+        decoder = FrameDecoder(
+            settings.frame_target_width, settings.frame_target_height
+        )
+        change_detector = (
+            FrameChangeDetector(
+                settings.frame_skip_threshold, settings.frame_skip_max_run
+            )
+            if settings.frame_skip_enabled
+            else None
+        )
+        keyframes = KeyframeScheduler(
+            settings.pose_keyframe_interval, settings.pose_keyframe_max_speed
+        )
+        # Last inference result, reused for frames that did not change
+        last_pose: tuple = (None, {}, {})
+        # Client capture clock; ordered sockets process every frame however late
+        clock = ClockOffset(settings.ws_clock_window)
+        deadline_ms = settings.ws_frame_deadline_ms if frame_policy == "latest" else 0
 
-            frame_count += 1
-            angles = {}
-            landmarks = None
+        logger.info(
+            "exercise_ws_connected",
+            exercise=exercise_type,
+            member_id=member_id,
+            frame_policy=frame_policy,
+            pose_source=pose_source,
+            resumed=resumed,
+            binary=binary,
+        )
 
-            if pose_engine:
-                try:
-                    # Decode base64 → PIL Image → numpy RGB array
-                    img_bytes = base64.b64decode(frame_b64)
-                    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-                    frame_array = np.array(img)
+        async def send_frame(
+            response: dict, landmarks, overlay: bool, captured_at: float | None
+        ) -> None:
+            started = time.perf_counter()
+            await responder.send_frame(websocket, response, landmarks, overlay)
+            timings.record("send", (time.perf_counter() - started) * 1000)
+            if captured_at is not None:
+                timings.record("e2e", time.monotonic() * 1000 - captured_at)
+
+        # Receive and send concurrently with processing; stale frames are dropped
+        # (latest) or the client is held back (ordered) when processing lags
+        mailbox = FrameMailbox(
+            latest_only=frame_policy == "latest", maxsize=settings.ws_receive_queue_size
+        )
+        outbox = ResponseOutbox(settings.ws_send_queue_size)
+        receiver = asyncio.create_task(receive_into(websocket, mailbox))
+        sender = asyncio.create_task(send_from(outbox))
 
-                    # Extract landmarks
-                    landmarks = pose_engine.process_frame(frame_array)
+        try:
+            while True:
+                raw = await mailbox.get()
+                timer = FrameTimer()
 
-                    if landmarks:
-                        angles = pose_engine.get_exercise_angles(
-                            landmarks, exercise_type
+                try:
+                    packet = (
+                        parse_binary(raw)
+                        if binary and not isinstance(raw, str)
+                        else parse_json(raw)
+                    )
+                except FrameProtocolError as e:
+                    await outbox.put(
+                        partial(responder.send, websocket, {"error": str(e)})
+                    )
+                    continue
+
+                if isinstance(packet, ControlMessage):
+                    # Next block of a circuit: a new tracker, same socket, decoder
+                    # and pose engine
+                    next_exercise = packet.data.get("exercise")
+                    try:
+                        if not isinstance(next_exercise, str):
+                            raise ValueError("Missing 'exercise' field")
+                        next_tracker = create_tracker(next_exercise)
+                    except ValueError as e:
+                        await outbox.put(
+                            partial(responder.send, websocket, {"error": str(e)})
                         )
-
-                    # Log detection status periodically
-                    if frame_count % 30 == 0:
+                        continue
+                    if next_exercise != exercise_type:
+                        segments.append(current_segment())
+                        segment_offset = int(time.monotonic() - start_time)
                         logger.info(
-                            "frame_status",
-                            frame=frame_count,
-                            pose_detected=landmarks is not None,
-                            primary_angle=angles.get("primary"),
+                            "exercise_switched",
+                            previous=exercise_type,
+                            exercise=next_exercise,
+                            previous_reps=tracker.rep_count,
+                        )
+                        exercise_type = next_exercise
+                        tracker = next_tracker
+                        rep_details = []
+                        # Reused and predicted poses carry the old exercise's angles
+                        last_pose = (None, {}, {})
+                        keyframes.reset()
+                        if change_detector:
+                            change_detector.reset()
+                    await outbox.put(
+                        partial(
+                            responder.send,
+                            websocket,
+                            {
+                                "type": "exercise",
+                                "exercise": exercise_type,
+                                "segment": len(segments) + 1,
+                                "rep_count": tracker.rep_count,
+                            },
                         )
-                except Exception as e:
-                    logger.warning(
-                        "frame_processing_error",
-                        frame=frame_count,
-                        error=str(e),
                     )
+                    continue
+                timer.lap("parse")
+
+                # Capture time on our clock (binary headers carry 0 when the
+                # client has none); frames already past the deadline are skipped
+                # before any decode, base64 included
+                captured_at = None
+                if packet.client_ts:
+                    clock.observe(packet.client_ts, mailbox.received_at * 1000)
+                    captured_at = clock.to_server(packet.client_ts)
+                    age_ms = time.monotonic() * 1000 - captured_at
+                    if deadline_ms and age_ms > deadline_ms:
+                        expired += 1
+                        continue
+                    timer.stages["age"] = age_ms
 
-            # Run state machine with primary angle
-            primary_angle = angles.get("primary")
-            result = tracker.update(primary_angle)
-
-            # Track completed reps
-            if result["completed_rep"]:
-                rep_details.append(
-                    {
-                        "rep_number": result["rep_count"],
-                        "score": result["rep_score"],
-                        "feedback": result["feedback"],
-                    }
+                try:
+                    packet.decode_frame()
+                except FrameProtocolError as e:
+                    await outbox.put(
+                        partial(responder.send, websocket, {"error": str(e)})
+                    )
+                    continue
+                timer.lap("parse")
+
+                frame_count += 1
+                angles = {}
+                landmarks = None
+                pose_info = {}
+
+                if packet.client_landmarks:
+                    # Landmarks from the browser, already validated by the parser
+                    if pose_source != "client":
+                        await outbox.put(
+                            partial(
+                                responder.send,
+                                websocket,
+                                {"error": "Landmark messages need pose=client"},
+                            )
+                        )
+                        continue
+                    client_landmark_frames += 1
+                    landmarks = packet.landmarks
+                    if landmarks is not None:
+                        angles = ANGLE_PLANS[exercise_type].compute(landmarks)
+                        timer.lap("angles")
+                elif pose_lease is None and not lease_attempted:
+                    # A client-side session fell back to sending frames
+                    pose_lease = await checkout_engine()
+                    timer.skip()
+
+                if pose_lease and not packet.client_landmarks:
+                    try:
+                        # Position in the client's frame stream, dropped frames included
+                        frame_index = frame_count + mailbox.dropped + expired
+
+                        if not keyframes.due(frame_index):
+                            # Between keyframes — extrapolate, no decode or inference
+                            landmarks = keyframes.predict(frame_index)
+                            angles = ANGLE_PLANS[exercise_type].compute(landmarks)
+                            pose_info = last_pose[2]
+                            timer.lap("angles")
+                        else:
+                            # Decode JPEG → downscaled RGB array (reused buffer)
+                            frame_array = decoder.decode(packet.jpeg)
+
+                            changed = not change_detector or change_detector.changed(
+                                frame_array
+                            )
+                            timer.lap("decode")
+
+                            if not changed:
+                                # Scene unchanged — reuse the last landmarks and angles
+                                landmarks, angles, pose_info = last_pose
+                            else:
+                                # Extract landmarks and angles in a worker process; in
+                                # cascade mode the full model only near key moments
+                                precise = not settings.pose_cascade_enabled or (
+                                    tracker.near_key_moment(
+                                        settings.pose_cascade_margin
+                                    )
+                                )
+                                (
+                                    landmarks,
+                                    angles,
+                                    pose_info,
+                                ) = await pose_executor.infer(
+                                    pose_lease,
+                                    frame_array,
+                                    exercise_type,
+                                    precise=precise,
+                                )
+                                timer.lap_remote(
+                                    "ipc",
+                                    {
+                                        "inference": pose_info.get("inference_ms", 0.0),
+                                        "angles": pose_info.get("angles_ms", 0.0),
+                                    },
+                                )
+                                last_pose = (landmarks, angles, pose_info)
+                            keyframes.observe(frame_index, landmarks)
+
+                        # Log detection status periodically
+                        if frame_count % 30 == 0:
+                            logger.info(
+                                "frame_status",
+                                frame=frame_count,
+                                pose_detected=landmarks is not None,
+                                primary_angle=angles.get("primary"),
+                            )
+                    except PoseWorkerLost:
+                        # The engine's worker died; lease a fresh one next frame
+                        logger.warning("pose_worker_lost", frame=frame_count)
+                        pose_lease = None
+                        lease_attempted = False
+                    except Exception as e:
+                        logger.warning(
+                            "frame_processing_error",
+                            frame=frame_count,
+                            error=str(e),
+                        )
+
+                # Run state machine with primary angle
+                primary_angle = angles.get("primary")
+                timer.skip()
+                result = tracker.update(
+                    primary_angle, packet.client_ts / 1000 if packet.client_ts else None
                 )
+                timer.lap("tracker")
+
+                # Track completed reps
+                if result["completed_rep"]:
+                    rep_details.append(
+                        {
+                            "rep_number": result["rep_count"],
+                            "score": result["rep_score"],
+                            "feedback": result["feedback"],
+                        }
+                    )
 
-            # Build response
-            response = {
-                **result,
-                "angles": angles,
-                "landmarks": landmarks,
-                "frame_number": frame_count,
-            }
+                if session_token and checkpointer.due():
+                    try:
+                        await checkpointer.save(checkpoint_state())
+                    except Exception as e:
+                        logger.warning("session_checkpoint_failed", error=str(e))
+
+                timer.finish()
+                timings.add(timer)
+
+                # Build response
+                response = {
+                    **result,
+                    "angles": angles,
+                    "frame_number": frame_count,
+                    "seq": packet.seq,
+                    "dropped_frames": mailbox.dropped,
+                    "expired_frames": expired,
+                    "model_complexity": pose_info.get("model_complexity"),
+                    "skipped_frames": change_detector.skipped if change_detector else 0,
+                    "interpolated_frames": keyframes.interpolated,
+                    "queue_depths": {
+                        "receive": mailbox.pending,
+                        "send": outbox.pending,
+                    },
+                }
+                if echo_timings:
+                    response["timings"] = timer.rounded()
+
+                # The client already has the landmarks it computed
+                await outbox.put(
+                    partial(
+                        send_frame,
+                        response,
+                        None if packet.client_landmarks else landmarks,
+                        overlay=bool(packet.flags & FLAG_OVERLAY),
+                        captured_at=captured_at,
+                    )
+                )
 
-            await websocket.send_json(response)
+                if capture:
+                    control = capture.update(
+                        timer.stages["frame"],
+                        pose_executor.load if pose_executor else 0.0,
+                    )
+                    if control:
+                        logger.info("capture_profile_changed", **control)
+                        await outbox.put(partial(responder.send, websocket, control))
+
+        except WebSocketDisconnect:
+            logger.info(
+                "exercise_ws_disconnected",
+                exercise=exercise_type,
+                member_id=member_id,
+                total_reps=tracker.rep_count,
+                frames_processed=frame_count,
+                frames_dropped=mailbox.dropped,
+                frames_expired=expired,
+                client_landmark_frames=client_landmark_frames,
+                receive_waits=mailbox.waits,
+                send_waits=outbox.waits,
+                frame_p95_ms=timings.stages["frame"].percentile(95),
+            )
+        finally:
+            receiver.cancel()
+            sender.cancel()
+
+            # Return the engine to the pool and the slot to the next in line
+            # before the saves below
+            if pose_lease:
+                pose_executor.release(pose_lease)
+                pose_lease = None
+            admission.release()
+            admitted = False
+
+            # A dropped session stays resumable for ws_resume_grace seconds and
+            # is saved by the finalizer if nobody resumes it; a session another
+            # socket has resumed belongs to that socket
+            handed_off = False
+            if session_token:
+                try:
+                    if mailbox.close_code in CLEAN_CLOSE_CODES:
+                        # Saved below unless another socket took the set over
+                        # or already finished it; an expired one is still ours
+                        if not await SessionCheckpointService.claim_owned(
+                            session_token, connection_id
+                        ) and not await SessionCheckpointService.owned_by(
+                            session_token, connection_id
+                        ):
+                            handed_off = True
+                    else:
+                        # Refused once another socket owns or finished the set
+                        if await SessionCheckpointService.save(checkpoint_state()):
+                            SessionCheckpointService.schedule_finish(
+                                session_token, connection_id
+                            )
+                        handed_off = True
+                except Exception as e:
+                    logger.warning("session_checkpoint_failed", error=str(e))
 
-    except WebSocketDisconnect:
-        logger.info(
-            "exercise_ws_disconnected",
-            exercise=exercise_type,
-            member_id=member_id,
-            total_reps=tracker.rep_count,
-            frames_processed=frame_count,
-        )
+            # Save each exercise block that has reps, in one write
+            duration = int(time.monotonic() - start_time)
+            if not handed_off and member_id != "anonymous":
+                try:
+                    await ExerciseSessionService.save_segments(
+                        member_id,
+                        [*segments, current_segment()],
+                        performance=timings.summary(
+                            frame_count,
+                            duration,
+                            dropped_before + mailbox.dropped,
+                            expired_before + expired,
+                        ),
+                    )
+                except Exception as e:
+                    logger.error("session_save_failed", error=str(e))
     finally:
-        # Clean up pose engine
-        if pose_engine:
-            try:
-                pose_engine.close()
-            except Exception:
-                pass
-
-        # Save session if any reps were completed
-        duration = int(time.monotonic() - start_time)
-        if tracker.rep_count > 0 and member_id != "anonymous":
-            try:
-                avg_score = (
-                    round(sum(tracker.form_scores) / len(tracker.form_scores), 1)
-                    if tracker.form_scores
-                    else None
-                )
-                await ExerciseSessionService.save_session(
-                    member_id=member_id,
-                    exercise=exercise_type,
-                    total_reps=tracker.rep_count,
-                    avg_form_score=avg_score,
-                    rep_details=rep_details,
-                    duration_seconds=duration,
-                    started_at=started_at,
-                )
-            except Exception as e:
-                logger.error("session_save_failed", error=str(e))
+        if pose_lease:
+            pose_executor.release(pose_lease)
+        if admitted:
+            admission.release()
@@ -22,6 +22,98 @@ class Settings(BaseSettings):
     member_search_cache_ttl: int = 300
     class_capacity_cache_ttl: int = 3600
 
+    # Pose inference (0 workers = one per CPU core)
+    pose_workers: int = 0
+    pose_ring_slots: int = 4
+    pose_max_frame_width: int = 1280
+    pose_max_frame_height: int = 720
+    pose_infer_timeout: float = 5.0
+    pose_pool_size: int = 8
+    pose_pool_checkout_timeout: float = 2.0
+    # Estimated model memory all pool engines may use, in MB (0 = no limit);
+    # the pool is shrunk at startup until the estimate fits
+    pose_memory_budget_mb: int = 0
+    # Model runtime: "mediapipe", "mediapipe_tasks" or "movenet" (onnxruntime);
+    # the file-based backends load their models from pose_model_dir
+    pose_backend: str = "mediapipe"
+    pose_model_dir: str = "models"
+    # Micro-batching per worker: up to pose_batch_size frames from different
+    # sessions, held at most pose_batch_wait_ms (size 1 sends every frame alone)
+    pose_batch_size: int = 1
+    pose_batch_wait_ms: float = 2.0
+    # Crop inference to a box around the previous pose, padded by this fraction
+    pose_roi_enabled: bool = True
+    pose_roi_padding: float = 0.25
+    # Heaviest MediaPipe model (0 lite, 1 full, 2 heavy); adaptive mode steps
+    # down from it when a frame's inference runs over the latency budget
+    pose_model_complexity: int = 1
+    pose_adaptive_complexity: bool = True
+    pose_latency_budget_ms: float = 60.0
+    # Cascade: the cheap tier tracks every frame; the full model runs only
+    # within pose_cascade_margin degrees of a rep threshold, at the bottom or
+    # top of a rep, and on the frame that completes it
+    pose_cascade_enabled: bool = False
+    pose_cascade_tier: int = 0
+    pose_cascade_margin: float = 15.0
+
+    # Exercise socket ("latest" drops stale frames, "ordered" processes all).
+    # Ordered sockets stop reading once ws_receive_queue_size frames wait;
+    # processing waits once ws_send_queue_size responses are unsent
+    ws_frame_policy: str = "latest"
+    ws_receive_queue_size: int = 8
+    ws_send_queue_size: int = 4
+    # Accept landmarks computed in the browser (?pose=client) in place of frames
+    ws_client_landmarks_enabled: bool = True
+    # "latest" sockets skip frames older than ws_frame_deadline_ms (capture to
+    # processing, 0 = never) before decoding them; the client clock offset is
+    # estimated over the last ws_clock_window seconds
+    ws_frame_deadline_ms: float = 500.0
+    ws_clock_window: float = 30.0
+
+    # Admission: at most ws_max_sessions live sockets per node (0 = no limit).
+    # Up to ws_admission_queue more wait ws_admission_timeout seconds for a
+    # slot in arrival order; the rest are closed with 1013 and ws_retry_after
+    ws_max_sessions: int = 0
+    ws_admission_queue: int = 8
+    ws_admission_timeout: float = 5.0
+    ws_retry_after: int = 10
+
+    # Resumable sessions: tracker state checkpointed to Redis at most every
+    # ws_checkpoint_interval seconds; a dropped socket can resume on any node
+    # within ws_resume_grace seconds before the session is saved as ended
+    ws_resume_enabled: bool = True
+    ws_checkpoint_interval: float = 2.0
+    ws_resume_grace: int = 60
+
+    # Server-driven capture profile: sessions step down the ladder in
+    # capture_control when frame latency or node load exceeds the budget
+    capture_control_enabled: bool = True
+    capture_latency_budget_ms: float = 100.0
+    capture_initial_level: int = 1
+
+    # Frames are JPEG-downscaled at decode time to at least this size
+    frame_target_width: int = 320
+    frame_target_height: int = 240
+
+    # Reuse the last pose for frames whose thumbnail barely changed (mean
+    # absolute luma difference), for at most frame_skip_max_run frames in a row
+    frame_skip_enabled: bool = True
+    frame_skip_threshold: float = 3.0
+    frame_skip_max_run: int = 15
+    # Full inference on every Nth frame only (1 = every frame), or on every
+    # frame while a landmark moves faster than this (normalised units/frame);
+    # landmarks in between are extrapolated from the keyframe velocity
+    pose_keyframe_interval: int = 1
+    pose_keyframe_max_speed: float = 0.02
+
+    # Offline video analysis (engines leased per job, upload size cap); all
+    # jobs on a node together lease at most video_analysis_max_engines, so
+    # live sockets keep the rest of the pool
+    video_analysis_parallelism: int = 4
+    video_analysis_max_engines: int = 4
+    video_max_upload_mb: int = 200
+    video_job_ttl: int = 86400
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
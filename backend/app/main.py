@@ -1,7 +1,7 @@
 from contextlib import asynccontextmanager
 
 import structlog
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.analytics import router as analytics_router
@@ -13,7 +13,17 @@ from app.api.workouts import router as workouts_router
 from app.config import settings
 from app.db.mongodb import connect_mongodb, close_mongodb
 from app.db.redis import connect_redis, close_redis
+from app.services.admission import get_admission
+from app.services.frame_ingest import queue_stats
+from app.services.frame_sampling import skip_stats
+from app.services.frame_timing import node_timing_stats
 from app.services.kafka_service import start_producer, stop_producer
+from app.services.pose_backends import estimate_memory_mb
+from app.services.pose_executor import (
+    get_pose_executor,
+    start_pose_executor,
+    stop_pose_executor,
+)
 
 structlog.configure(
     processors=[
@@ -36,8 +46,13 @@ async def lifespan(app: FastAPI):
         await start_producer()
     except Exception as e:
         logger.warning("kafka_producer_failed", error=str(e))
+    try:
+        await start_pose_executor()
+    except Exception as e:
+        logger.warning("pose_executor_failed", error=str(e))
     yield
     # Shutdown
+    await stop_pose_executor()
     await stop_producer()
     await close_redis()
     await close_mongodb()
@@ -90,6 +105,52 @@ async def readiness():
     return {"status": "ready" if all_ok else "degraded", "checks": checks}
 
 
+@app.get("/health/pose", tags=["Health"])
+async def pose_health():
+    executor = get_pose_executor()
+    if executor is None:
+        return {"status": "unavailable"}
+    return {
+        "status": "ok",
+        **executor.stats,
+        "frame_skip": skip_stats(),
+        "socket_queues": queue_stats(),
+        "frame_timing": node_timing_stats(),
+    }
+
+
+@app.get("/health/capacity", tags=["Health"])
+async def capacity_health(response: Response):
+    """Session and pose engine occupancy; 503 while new sockets would wait."""
+    admission = get_admission()
+    executor = get_pose_executor()
+    engines = None
+    if executor is not None:
+        pool = executor.stats["pool"]
+        engines = {
+            "size": pool["size"],
+            "in_use": pool["in_use"],
+            "memory_mb": estimate_memory_mb(
+                settings.pose_backend,
+                settings.pose_model_complexity,
+                executor.pool_size,
+                executor.num_workers,
+            ),
+            "memory_budget_mb": settings.pose_memory_budget_mb,
+        }
+    accepting = not admission.full and not (
+        engines and engines["in_use"] >= engines["size"]
+    )
+    if not accepting:
+        response.status_code = 503
+    return {
+        "status": "accepting" if accepting else "full",
+        "retry_after": None if accepting else settings.ws_retry_after,
+        "sessions": admission.stats,
+        "pose_engines": engines,
+    }
+
+
 # --- Register Routers ---
 app.include_router(members_router)
 app.include_router(classes_router)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
 from pydantic import BaseModel, Field
@@ -31,6 +31,11 @@ class ExerciseSessionResponse(BaseModel):
     duration_seconds: int
     started_at: datetime
     ended_at: datetime | None = None
+    # Frame timing summary (fps, dropped frames, p50/p95 per stage)
+    performance: dict | None = None
+    # Sessions recorded as blocks of one circuit over one socket share an id
+    circuit_id: str | None = None
+    segment: int | None = None
 
     @classmethod
     def from_mongo(cls, doc: dict) -> "ExerciseSessionResponse":
@@ -44,6 +49,9 @@ class ExerciseSessionResponse(BaseModel):
             duration_seconds=doc.get("duration_seconds", 0),
             started_at=doc["started_at"],
             ended_at=doc.get("ended_at"),
+            performance=doc.get("performance"),
+            circuit_id=doc.get("circuit_id"),
+            segment=doc.get("segment"),
         )
 
 
@@ -52,6 +60,77 @@ class ExerciseSessionListResponse(BaseModel):
     total: int
 
 
+class ExerciseSegment(BaseModel):
+    """One exercise block of a socket session; a circuit has several."""
+
+    exercise: str
+    # ExerciseTracker.snapshot() at the end of the block
+    tracker: dict
+    rep_details: list[dict] = Field(default_factory=list)
+    started_at: datetime
+    duration_seconds: int = 0
+
+
+class ExerciseSessionCheckpoint(BaseModel):
+    """Live exercise socket state, kept in Redis so a session can resume."""
+
+    token: str
+    # The socket currently serving the session
+    owner: str
+    member_id: str
+    exercise: str
+    tracker: dict
+    rep_details: list[dict] = Field(default_factory=list)
+    frame_count: int = 0
+    dropped_frames: int = 0
+    expired_frames: int = 0
+    duration_seconds: int = 0
+    started_at: datetime
+    # SessionTimings.snapshot() histograms
+    timings: dict = Field(default_factory=dict)
+    # Finished exercise blocks, and when (seconds into the session) the
+    # current one began
+    segments: list[ExerciseSegment] = Field(default_factory=list)
+    segment_offset: int = 0
+
+    def all_segments(self) -> list[ExerciseSegment]:
+        """The finished blocks followed by the current one."""
+        return [
+            *self.segments,
+            ExerciseSegment(
+                exercise=self.exercise,
+                tracker=self.tracker,
+                rep_details=self.rep_details,
+                started_at=self.started_at + timedelta(seconds=self.segment_offset),
+                duration_seconds=self.duration_seconds - self.segment_offset,
+            ),
+        ]
+
+
+class VideoAnalysisStatus(str, Enum):
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class VideoAnalysisJob(BaseModel):
+    job_id: str
+    status: VideoAnalysisStatus
+    exercise: str
+    member_id: str
+    progress: float = 0.0
+    frames_processed: int = 0
+    total_frames: int | None = None
+    session_id: str | None = None
+    total_reps: int | None = None
+    avg_form_score: float | None = None
+    fps: float | None = None
+    fps_per_core: float | None = None
+    error: str | None = None
+    created_at: datetime
+
+
 class ExerciseInfo(BaseModel):
     name: str
     display_name: str
@@ -0,0 +1,110 @@
+"""
+Admission control for exercise sockets.
+
+A node serves at most ws_max_sessions live sockets. Connections beyond that
+wait in a short first-come-first-served queue: a slot freed by a finished
+session passes straight to the longest waiter, so a burst of reconnects
+cannot jump the line. Connections that find the queue full, or wait longer
+than ws_admission_timeout, are closed with 1013 (try again later) and a
+retry-after hint. The pose engine pool, sized to the pose memory budget,
+queues server-inference sessions the same way at checkout.
+
+Occupancy is reported at /health/capacity, which answers 503 while the node
+is full so a load balancer can route new sockets elsewhere.
+"""
+
+import asyncio
+from collections import deque
+
+from app.config import settings
+
+
+class AdmissionController:
+    """Live session slots for one node, with a bounded fair wait queue."""
+
+    def __init__(self, max_sessions: int, queue_size: int, queue_timeout: float):
+        # 0 = no limit
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.live = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def full(self) -> bool:
+        return bool(self.max_sessions) and self.live >= self.max_sessions
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def admit(self) -> bool:
+        """
+        Take a session slot, waiting in line while the node is full. False
+        when the queue is full or the wait times out; call release() once
+        for every True.
+        """
+        if not self.full and not self._waiters:
+            self.live += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except BaseException as e:
+            if future.done():
+                # Handed a slot just as the wait ended — pass it on
+                self.release()
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                return False
+            raise
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        """Free a slot, handing it to the longest waiter if there is one."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.live -= 1
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "live": self.live,
+            "max": self.max_sessions,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+
+_admission: AdmissionController | None = None
+
+
+def get_admission() -> AdmissionController:
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController(
+            settings.ws_max_sessions,
+            settings.ws_admission_queue,
+            settings.ws_admission_timeout,
+        )
+    return _admission
@@ -0,0 +1,71 @@
+"""
+Capture control — tells the browser how big, how often and how compressed to
+send frames.
+
+Each session walks a ladder of capture profiles. The server measures how long
+the session's frames take to process and how loaded the node's pose workers
+are, steps down the ladder when either runs over budget and back up once there
+is headroom (see latency_ladder), and pushes every change to the client as a
+control message:
+
+    {"type": "capture", "width": 480, "height": 360, "fps": 10, "quality": 0.6}
+
+The client composable applies it to its capture loop, so an overloaded node
+sheds work by receiving less of it instead of dropping sessions.
+"""
+
+from app.services.latency_ladder import HEAVIER, LIGHTER, LatencyLadder
+
+# From most to least demanding. Frames are decoded down to about 320x240, so
+# lower steps trade frame rate and JPEG size rather than resolution.
+CAPTURE_PROFILES = (
+    {"width": 640, "height": 480, "fps": 15, "quality": 0.7},
+    {"width": 640, "height": 480, "fps": 10, "quality": 0.7},
+    {"width": 480, "height": 360, "fps": 10, "quality": 0.6},
+    {"width": 320, "height": 240, "fps": 8, "quality": 0.6},
+    {"width": 320, "height": 240, "fps": 5, "quality": 0.5},
+)
+
+# Frames to hold a profile after a change, and the node load (in-flight frames
+# per worker) above which sessions step down and below which they may step up
+CAPTURE_HOLD_FRAMES = 20
+NODE_LOAD_HIGH = 1.0
+NODE_LOAD_LOW = 0.75
+
+
+class CaptureController:
+    """Per-session position on the capture ladder."""
+
+    def __init__(self, latency_budget_ms: float, initial_level: int = 1):
+        self.level = min(max(initial_level, 0), len(CAPTURE_PROFILES) - 1)
+        self.ladder = LatencyLadder(latency_budget_ms, CAPTURE_HOLD_FRAMES)
+        self.changes = 0
+
+    @property
+    def profile(self) -> dict:
+        return CAPTURE_PROFILES[self.level]
+
+    def message(self) -> dict:
+        return {"type": "capture", **self.profile}
+
+    def update(self, latency_ms: float, node_load: float) -> dict | None:
+        """
+        Record one frame's processing latency and the node load. Returns the
+        control message to send when the profile changes, else None.
+        """
+        step = self.ladder.observe(
+            latency_ms,
+            pressure=node_load > NODE_LOAD_HIGH,
+            slack=node_load < NODE_LOAD_LOW,
+        )
+        if step == LIGHTER and self.level < len(CAPTURE_PROFILES) - 1:
+            return self._set_level(self.level + 1)
+        if step == HEAVIER and self.level > 0:
+            return self._set_level(self.level - 1)
+        return None
+
+    def _set_level(self, level: int) -> dict:
+        self.level = level
+        self.ladder.restart()
+        self.changes += 1
+        return self.message()
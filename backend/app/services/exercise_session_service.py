@@ -10,7 +10,7 @@ from bson import ObjectId
 import structlog
 
 from app.db.mongodb import get_database
-from app.models.exercise import ExerciseSessionResponse
+from app.models.exercise import ExerciseSegment, ExerciseSessionResponse
 from app.services.kafka_service import publish_event, TOPICS
 
 logger = structlog.get_logger()
@@ -20,7 +20,7 @@ class ExerciseSessionService:
     COLLECTION = "exercise_sessions"
 
     @staticmethod
-    async def save_session(
+    def _document(
         member_id: str,
         exercise: str,
         total_reps: int,
@@ -28,8 +28,8 @@ class ExerciseSessionService:
         rep_details: list[dict],
         duration_seconds: int,
         started_at: datetime,
-    ) -> ExerciseSessionResponse:
-        db = get_database()
+        performance: dict | None = None,
+    ) -> dict:
         doc = {
             "member_id": member_id,
             "exercise": exercise,
@@ -40,32 +40,111 @@ class ExerciseSessionService:
             "started_at": started_at,
             "ended_at": datetime.utcnow(),
         }
-        result = await db[ExerciseSessionService.COLLECTION].insert_one(doc)
-        doc["_id"] = result.inserted_id
+        if performance is not None:
+            doc["performance"] = performance
+        return doc
 
+    @staticmethod
+    async def _publish_completed(doc: dict) -> None:
+        data = {
+            "session_id": str(doc["_id"]),
+            "member_id": doc["member_id"],
+            "exercise": doc["exercise"],
+            "total_reps": doc["total_reps"],
+            "avg_form_score": doc["avg_form_score"],
+            "duration_seconds": doc["duration_seconds"],
+        }
+        if "circuit_id" in doc:
+            data["circuit_id"] = doc["circuit_id"]
+            data["segment"] = doc["segment"]
         await publish_event(
             topic=TOPICS["exercise_events"],
             event_type="exercise.session_completed",
-            data={
-                "session_id": str(result.inserted_id),
-                "member_id": member_id,
-                "exercise": exercise,
-                "total_reps": total_reps,
-                "avg_form_score": avg_form_score,
-                "duration_seconds": duration_seconds,
-            },
-            key=member_id,
+            data=data,
+            key=doc["member_id"],
         )
 
         logger.info(
             "exercise_session_saved",
-            session_id=str(result.inserted_id),
-            exercise=exercise,
-            reps=total_reps,
+            session_id=str(doc["_id"]),
+            exercise=doc["exercise"],
+            reps=doc["total_reps"],
+        )
+
+    @staticmethod
+    async def save_session(
+        member_id: str,
+        exercise: str,
+        total_reps: int,
+        avg_form_score: float | None,
+        rep_details: list[dict],
+        duration_seconds: int,
+        started_at: datetime,
+        performance: dict | None = None,
+    ) -> ExerciseSessionResponse:
+        db = get_database()
+        doc = ExerciseSessionService._document(
+            member_id,
+            exercise,
+            total_reps,
+            avg_form_score,
+            rep_details,
+            duration_seconds,
+            started_at,
+            performance,
         )
+        result = await db[ExerciseSessionService.COLLECTION].insert_one(doc)
+        doc["_id"] = result.inserted_id
+
+        await ExerciseSessionService._publish_completed(doc)
 
         return ExerciseSessionResponse.from_mongo(doc)
 
+    @staticmethod
+    async def save_segments(
+        member_id: str,
+        segments: list[ExerciseSegment],
+        performance: dict | None = None,
+    ) -> list[ExerciseSessionResponse]:
+        """
+        Save the exercise blocks of one socket session in a single write, one
+        document per block with reps. Blocks of a circuit share a circuit_id;
+        `performance` covers the whole socket session.
+        """
+        docs = []
+        for segment in segments:
+            tracker = segment.tracker
+            if tracker["rep_count"] == 0:
+                continue
+            scores = tracker["form_scores"]
+            docs.append(
+                ExerciseSessionService._document(
+                    member_id,
+                    segment.exercise,
+                    tracker["rep_count"],
+                    round(sum(scores) / len(scores), 1) if scores else None,
+                    segment.rep_details,
+                    segment.duration_seconds,
+                    segment.started_at,
+                    performance,
+                )
+            )
+        if not docs:
+            return []
+        if len(docs) > 1:
+            circuit_id = str(ObjectId())
+            for number, doc in enumerate(docs, start=1):
+                doc["circuit_id"] = circuit_id
+                doc["segment"] = number
+
+        db = get_database()
+        result = await db[ExerciseSessionService.COLLECTION].insert_many(docs)
+        for doc, inserted_id in zip(docs, result.inserted_ids):
+            doc["_id"] = inserted_id
+            await ExerciseSessionService._publish_completed(doc)
+
+        return [ExerciseSessionResponse.from_mongo(doc) for doc in docs]
+
     @staticmethod
     async def list_sessions(
         member_id: str | None = None, exercise: str | None = None, limit: int = 20
@@ -15,6 +15,18 @@ import structlog
 logger = structlog.get_logger()
 
 
+# Angle change between consecutive frames that counts as moving down or up,
+# and as turning back while going down, at the nominal frame interval. With
+# frame timestamps the thresholds grow with the time since the last frame
+# (up to MAX_FRAME_GAP), so a gap of dropped frames is not mistaken for a
+# fast movement; they never shrink below the per-frame values, which are
+# also the angle estimate's noise floor.
+MOVE_DEGREES = 2
+REVERSE_DEGREES = 5
+NOMINAL_FRAME_INTERVAL = 0.1
+MAX_FRAME_GAP = 1.0
+
+
 class ExerciseState(str, Enum):
     IDLE = "IDLE"
     GOING_DOWN = "GOING_DOWN"
@@ -32,6 +44,7 @@ class BaseTracker(ABC):
         self.form_scores: list[float] = []
         self._rep_angles: list[float] = []  # angles collected during current rep
         self._prev_angle: float | None = None
+        self._prev_time: float | None = None
 
     @property
     @abstractmethod
@@ -59,9 +72,19 @@ class BaseTracker(ABC):
         """Generate real-time coaching feedback."""
         ...
 
-    def update(self, primary_angle: float | None) -> dict:
+    def _motion_scale(self, timestamp: float | None) -> float:
+        """How many nominal frame intervals passed since the last reading."""
+        if timestamp is None or self._prev_time is None:
+            return 1.0
+        elapsed = min(timestamp - self._prev_time, MAX_FRAME_GAP)
+        return max(elapsed / NOMINAL_FRAME_INTERVAL, 1.0)
+
+    def update(
+        self, primary_angle: float | None, timestamp: float | None = None
+    ) -> dict:
         """
-        Update the state machine with a new angle reading.
+        Update the state machine with a new angle reading, taken at
+        `timestamp` seconds (any clock) when known.
         Returns the current state, rep count, and any completed rep info.
         """
         if primary_angle is None:
@@ -72,21 +95,24 @@ class BaseTracker(ABC):
         rep_score = None
 
         prev_state = self.state
+        scale = self._motion_scale(timestamp)
+        move = MOVE_DEGREES * scale
+        reverse = REVERSE_DEGREES * scale
 
         if self.state == ExerciseState.IDLE:
-            if self._prev_angle and primary_angle < self._prev_angle - 2:
+            if self._prev_angle and primary_angle < self._prev_angle - move:
                 self.state = ExerciseState.GOING_DOWN
 
         elif self.state == ExerciseState.GOING_DOWN:
             if primary_angle <= self.down_threshold:
                 self.state = ExerciseState.DOWN
-            elif self._prev_angle and primary_angle > self._prev_angle + 5:
+            elif self._prev_angle and primary_angle > self._prev_angle + reverse:
                 # Changed direction without reaching bottom — reset
                 self.state = ExerciseState.IDLE
                 self._rep_angles.clear()
 
         elif self.state == ExerciseState.DOWN:
-            if self._prev_angle and primary_angle > self._prev_angle + 2:
+            if self._prev_angle and primary_angle > self._prev_angle + move:
                 self.state = ExerciseState.GOING_UP
 
         elif self.state == ExerciseState.GOING_UP:
@@ -103,6 +129,7 @@ class BaseTracker(ABC):
             self.state = ExerciseState.IDLE
 
         self._prev_angle = primary_angle
+        self._prev_time = timestamp
 
         if prev_state != self.state:
             logger.info(
@@ -121,6 +148,21 @@ class BaseTracker(ABC):
             feedback=feedback,
         )
 
+    def near_key_moment(self, margin: float) -> bool:
+        """
+        Whether the next frame matters most for scoring: the rep is at its
+        bottom or top (the next frame completes it), or the last angle was
+        within `margin` degrees of the DOWN or UP threshold.
+        """
+        if self.state in (ExerciseState.DOWN, ExerciseState.UP):
+            return True
+        if self._prev_angle is None:
+            return False
+        return (
+            abs(self._prev_angle - self.down_threshold) <= margin
+            or abs(self._prev_angle - self.up_threshold) <= margin
+        )
+
     def _build_result(
         self,
         completed_rep: bool = False,
@@ -147,6 +189,29 @@ class BaseTracker(ABC):
         self.form_scores.clear()
         self._rep_angles.clear()
         self._prev_angle = None
+        self._prev_time = None
+
+    def snapshot(self) -> dict:
+        """JSON-ready state, enough for restore() to continue the same set."""
+        return {
+            "exercise": self.exercise_name,
+            "state": self.state.value,
+            "rep_count": self.rep_count,
+            "form_scores": list(self.form_scores),
+            "rep_angles": list(self._rep_angles),
+            "prev_angle": self._prev_angle,
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        if snapshot["exercise"] != self.exercise_name:
+            raise ValueError(
+                f"Snapshot is for {snapshot['exercise']}, not {self.exercise_name}"
+            )
+        self.state = ExerciseState(snapshot["state"])
+        self.rep_count = snapshot["rep_count"]
+        self.form_scores = list(snapshot["form_scores"])
+        self._rep_angles = list(snapshot["rep_angles"])
+        self._prev_angle = snapshot["prev_angle"]
 
 
 class SquatTracker(BaseTracker):
@@ -211,7 +276,9 @@ class BicepCurlTracker(BaseTracker):
     down_threshold = 40  # curled position (low angle = top of curl)
     up_threshold = 160  # extended position
 
-    def update(self, primary_angle: float | None) -> dict:
+    def update(
+        self, primary_angle: float | None, timestamp: float | None = None
+    ) -> dict:
         """
         Override: bicep curl has inverted motion.
         Angle decreases going UP (curling), increases going DOWN (extending).
@@ -223,9 +290,10 @@ class BicepCurlTracker(BaseTracker):
         completed_rep = False
         rep_score = None
         prev_state = self.state
+        move = MOVE_DEGREES * self._motion_scale(timestamp)
 
         if self.state == ExerciseState.IDLE:
-            if self._prev_angle and primary_angle < self._prev_angle - 2:
+            if self._prev_angle and primary_angle < self._prev_angle - move:
                 self.state = ExerciseState.GOING_DOWN  # curling up (angle decreasing)
 
         elif self.state == ExerciseState.GOING_DOWN:
@@ -233,7 +301,7 @@ class BicepCurlTracker(BaseTracker):
                 self.state = ExerciseState.DOWN  # fully curled
 
         elif self.state == ExerciseState.DOWN:
-            if self._prev_angle and primary_angle > self._prev_angle + 2:
+            if self._prev_angle and primary_angle > self._prev_angle + move:
                 self.state = ExerciseState.GOING_UP  # extending
 
         elif self.state == ExerciseState.GOING_UP:
@@ -249,6 +317,7 @@ class BicepCurlTracker(BaseTracker):
             self.state = ExerciseState.IDLE
 
         self._prev_angle = primary_angle
+        self._prev_time = timestamp
 
         if prev_state != self.state:
             logger.info(
@@ -0,0 +1,68 @@
+"""
+Frame Decoder — turns client JPEG frames into RGB arrays for the pose engine.
+
+JPEG frames are downscaled in the DCT domain while decoding (libjpeg only
+computes the coefficients it needs for a 1/2, 1/4 or 1/8 size image), so a
+640x480 frame never exists at full resolution when the target is 320x240.
+With simplejpeg installed the pixels are decoded straight into a buffer that
+the session reuses for every frame; otherwise Pillow's draft mode provides
+the same downscaling at the cost of one extra copy.
+"""
+
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+try:
+    import simplejpeg
+
+    SIMPLEJPEG_AVAILABLE = True
+except ImportError:
+    SIMPLEJPEG_AVAILABLE = False
+    simplejpeg = None
+
+
+class FrameDecoder:
+    """Per-session decoder that reuses one output buffer across frames."""
+
+    def __init__(self, target_width: int, target_height: int):
+        # The decoded frame is the smallest DCT scale that is at least this big
+        self.target_width = target_width
+        self.target_height = target_height
+        self._buffer = np.empty(0, dtype=np.uint8)
+
+    def decode_b64(self, frame_b64: str) -> np.ndarray:
+        return self.decode(base64.b64decode(frame_b64))
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """
+        Decode a JPEG to an (H, W, 3) uint8 RGB array. The result may be a
+        view of the session buffer, valid only until the next decode call.
+        """
+        if SIMPLEJPEG_AVAILABLE and simplejpeg.is_jpeg(data):
+            return self._decode_turbo(data)
+        return self._decode_pillow(data)
+
+    def _decode_turbo(self, data: bytes) -> np.ndarray:
+        height, width, _, _ = simplejpeg.decode_jpeg_header(
+            data, min_height=self.target_height, min_width=self.target_width
+        )
+        needed = height * width * 3
+        if self._buffer.size < needed:
+            self._buffer = np.empty(needed, dtype=np.uint8)
+        return simplejpeg.decode_jpeg(
+            data,
+            colorspace="RGB",
+            min_height=self.target_height,
+            min_width=self.target_width,
+            buffer=self._buffer,
+        )
+
+    def _decode_pillow(self, data: bytes) -> np.ndarray:
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", (self.target_width, self.target_height))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return np.asarray(img)
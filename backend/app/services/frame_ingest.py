@@ -0,0 +1,190 @@
+"""
+Frame ingestion for the exercise socket.
+
+Each socket runs three stages concurrently: a receive task, the processing
+loop and a send task, so network time on either side overlaps with decode and
+inference.
+
+    receive  reads client messages as fast as they arrive into a FrameMailbox
+    process  takes them out at inference speed and queues the responses
+    send     writes queued responses to the socket in order (ResponseOutbox)
+
+In "latest" mode the mailbox holds a single frame, so a newer frame replaces
+a stale one that was never processed and the replaced frame is counted as
+dropped; control messages are never replaced. In "ordered" mode it holds up
+to `maxsize` messages and the receive task stops reading once it is full,
+which pushes back on the client through the socket. The outbox is bounded
+too: when the client reads slowly, the processing loop waits for it instead
+of piling up responses.
+"""
+
+import asyncio
+import time
+import weakref
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from fastapi import WebSocketDisconnect
+
+from app.services.frame_protocol import is_control
+
+FRAME_POLICIES = ("latest", "ordered")
+
+# Queues of every open socket, reported at /health/pose
+_mailboxes: "weakref.WeakSet[FrameMailbox]" = weakref.WeakSet()
+_outboxes: "weakref.WeakSet[ResponseOutbox]" = weakref.WeakSet()
+
+
+def _depths(queues) -> dict:
+    pending = [queue.pending for queue in queues]
+    return {
+        "pending": sum(pending),
+        "max_pending": max(pending, default=0),
+        "waits": sum(queue.waits for queue in queues),
+    }
+
+
+def queue_stats() -> dict:
+    """Node-wide queue depths of the receive and send stages."""
+    mailboxes, outboxes = list(_mailboxes), list(_outboxes)
+    return {
+        "sockets": len(mailboxes),
+        "receive": {
+            **_depths(mailboxes),
+            "dropped": sum(mailbox.dropped for mailbox in mailboxes),
+        },
+        "send": _depths(outboxes),
+    }
+
+
+class FrameMailbox:
+    """Hand-off between the socket receive task and the processing loop."""
+
+    def __init__(self, latest_only: bool = True, maxsize: int = 0):
+        self.latest_only = latest_only
+        self.maxsize = 1 if latest_only else maxsize
+        self.dropped = 0
+        # Close code the client disconnected with, once it has
+        self.close_code: int | None = None
+        # Times the receive task stopped reading because the mailbox was full
+        self.waits = 0
+        # When the message get() last returned arrived (time.monotonic)
+        self.received_at: float | None = None
+        self._items: deque = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._closed = False
+        _mailboxes.add(self)
+
+    def put(self, item, droppable: bool = True) -> None:
+        if self.latest_only and droppable and self._items:
+            # Replace the pending frame, keeping any control messages
+            kept = deque(entry for entry in self._items if not entry[1])
+            self.dropped += len(self._items) - len(kept)
+            self._items = kept
+        self._items.append((item, droppable, time.monotonic()))
+        self._ready.set()
+
+    async def get(self):
+        """
+        Wait for the next message. Raises WebSocketDisconnect once the
+        receiver has closed the mailbox and nothing is left to process.
+        """
+        while not self._items:
+            if self._closed:
+                raise WebSocketDisconnect()
+            self._ready.clear()
+            await self._ready.wait()
+        item, _, self.received_at = self._items.popleft()
+        self._space.set()
+        return item
+
+    async def wait_for_space(self) -> None:
+        """
+        Wait until an ordered mailbox has room for another message. A latest
+        mailbox always has room, since put() replaces the pending frame.
+        """
+        if self.latest_only or not self.maxsize or len(self._items) < self.maxsize:
+            return
+        self.waits += 1
+        while len(self._items) >= self.maxsize and not self._closed:
+            self._space.clear()
+            await self._space.wait()
+
+    def close(self) -> None:
+        self._closed = True
+        self._ready.set()
+        self._space.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._items)
+
+
+async def receive_into(websocket, mailbox: FrameMailbox) -> None:
+    """
+    Receive messages, text as str and binary as bytes, until the client goes
+    away, then close the mailbox.
+    """
+    try:
+        while True:
+            await mailbox.wait_for_space()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            text = message.get("text")
+            item = text if text is not None else message.get("bytes")
+            mailbox.put(item, droppable=not is_control(item))
+    except WebSocketDisconnect as e:
+        mailbox.close_code = e.code
+    finally:
+        mailbox.close()
+
+
+class ResponseOutbox:
+    """Bounded hand-off between the processing loop and the socket send task."""
+
+    def __init__(self, maxsize: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._closed = False
+        # Times the processing loop waited for the send task to catch up
+        self.waits = 0
+        _outboxes.add(self)
+
+    async def put(self, send: Callable[[], Awaitable[None]]) -> None:
+        """
+        Queue a send (a coroutine function with no arguments), waiting while
+        the outbox is full. Raises WebSocketDisconnect once the send task has
+        stopped.
+        """
+        if self._closed:
+            raise WebSocketDisconnect()
+        if self._queue.full():
+            self.waits += 1
+        await self._queue.put(send)
+
+    async def get(self) -> Callable[[], Awaitable[None]]:
+        return await self._queue.get()
+
+    def close(self) -> None:
+        """Refuse further sends and drop the queued ones, freeing any waiter."""
+        self._closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+
+async def send_from(outbox: ResponseOutbox) -> None:
+    """Run queued sends in order until one fails, then close the outbox."""
+    try:
+        while True:
+            send = await outbox.get()
+            await send()
+    except Exception:
+        # The client is gone (disconnect or a send on a closed socket)
+        pass
+    finally:
+        outbox.close()
@@ -0,0 +1,275 @@
+"""
+Wire formats for client frames on the exercise socket.
+
+The format is negotiated with the WebSocket subprotocol:
+
+    fithub.binary.v1  one binary message per frame: a 16-byte little-endian
+                      header (uint32 sequence number, float64 client capture
+                      timestamp in ms or 0, uint16 flags, 2 reserved bytes)
+                      followed by the raw JPEG bytes
+    fithub.compact.v1 binary frames as above, answered with compact msgpack
+                      deltas instead of JSON (see response_codec)
+    fithub.json.v1    {"frame": "<base64-encoded-jpeg>", "seq": 812,
+                      "ts": 1767258000123.4} text messages (seq and ts are
+                      optional), also used when the client asks for no
+                      subprotocol at all
+
+The client timestamp is the capture time in ms on the client's clock (epoch
+based in browsers); the server translates it with a clock offset estimate to
+expire stale frames and measure end-to-end latency, and feeds the tracker
+real time deltas.
+
+Header flags:
+
+    FLAG_OVERLAY      the client draws the landmark overlay for this frame, so
+                      compact responses include the landmarks
+    FLAG_LANDMARKS    the payload is landmarks the client computed itself
+                      (see below) instead of a JPEG
+
+Control messages are JSON text in every mode, so binary clients can send them
+between frames:
+
+    {"type": "exercise", "exercise": "bicep_curl"}
+                      switch the session to another exercise (a circuit);
+                      the socket and its pose engine stay as they are
+
+Binary frames skip the base64 inflation (a third more bytes on the wire) and
+the JSON and base64 parse passes on the server.
+
+Clients that run BlazePose in the browser send landmarks instead of frames,
+which skips server decode and inference entirely: rows of (x, y, z,
+visibility), either all 33 BlazePose landmarks or the 13 tracked ones in
+LANDMARK_NAMES order, with x and y normalised to the image. In binary mode
+they are little-endian float32 behind the header (an empty payload means no
+pose); in JSON mode {"landmarks": [[x, y, z, visibility], ...]} or
+{"landmarks": null}. parse_landmarks() validates them before they reach the
+tracker.
+"""
+
+import base64
+import binascii
+import json
+import math
+import struct
+
+import numpy as np
+
+from app.services.pose_engine import LANDMARK_NAMES, LANDMARKS, Landmarks
+
+SUBPROTOCOL_COMPACT = "fithub.compact.v1"
+SUBPROTOCOL_BINARY = "fithub.binary.v1"
+SUBPROTOCOL_JSON = "fithub.json.v1"
+# In order of preference
+SUBPROTOCOLS = (SUBPROTOCOL_COMPACT, SUBPROTOCOL_BINARY, SUBPROTOCOL_JSON)
+BINARY_SUBPROTOCOLS = (SUBPROTOCOL_COMPACT, SUBPROTOCOL_BINARY)
+
+FRAME_HEADER = struct.Struct("<IdH2x")
+
+FLAG_OVERLAY = 0x1
+FLAG_LANDMARKS = 0x2
+
+CONTROL_TYPES = ("exercise",)
+
+# Where a session's landmarks come from (the socket's "pose" query param)
+POSE_SOURCES = ("server", "client")
+
+# Landmark rows accepted from clients: the full BlazePose set or ours
+BLAZEPOSE_LANDMARKS = 33
+_BLAZEPOSE_ROWS = [LANDMARKS[name] for name in LANDMARK_NAMES]
+# How far outside the image x and y may lie (BlazePose extrapolates joints
+# that leave the frame) before a payload is rejected as not normalised
+COORDINATE_MARGIN = 1.0
+
+
+class FrameProtocolError(ValueError):
+    """A client message that is not a well-formed frame."""
+
+
+class FramePacket:
+    """
+    One client frame plus the header fields that came with it: JPEG bytes, or
+    for client-side landmark messages jpeg None and `landmarks` (None when
+    the client found no pose). JSON frames keep their base64 text in
+    `frame_b64` until decode_frame(), so expired ones never pay for it.
+    """
+
+    __slots__ = ("jpeg", "frame_b64", "seq", "client_ts", "flags", "landmarks")
+
+    def __init__(
+        self,
+        jpeg: bytes | None,
+        seq: int | None = None,
+        client_ts: float | None = None,
+        flags: int = 0,
+        landmarks: Landmarks | None = None,
+        frame_b64: str | None = None,
+    ):
+        self.jpeg = jpeg
+        self.frame_b64 = frame_b64
+        self.seq = seq
+        self.client_ts = client_ts
+        self.flags = flags
+        self.landmarks = landmarks
+
+    @property
+    def client_landmarks(self) -> bool:
+        return self.jpeg is None and self.frame_b64 is None
+
+    def decode_frame(self) -> None:
+        """Decode a JSON frame's base64 into jpeg. Raises FrameProtocolError."""
+        if self.frame_b64 is None:
+            return
+        try:
+            self.jpeg = base64.b64decode(self.frame_b64)
+        except (binascii.Error, ValueError):
+            raise FrameProtocolError("Invalid base64 frame")
+        self.frame_b64 = None
+
+
+class ControlMessage:
+    """A client control message: its type and the rest of its fields."""
+
+    __slots__ = ("type", "data")
+
+    def __init__(self, type: str, data: dict):
+        self.type = type
+        self.data = data
+
+
+def is_control(message: str | bytes) -> bool:
+    """
+    Whether a raw message may be a control message, without parsing it.
+    Frames never contain the key: base64 has no quotes and landmark payloads
+    are numbers.
+    """
+    return isinstance(message, str) and '"type"' in message
+
+
+def negotiate(requested: list[str], compact: bool = True) -> str | None:
+    """
+    The most compact subprotocol the client offered, or None. `compact` is
+    False when the server cannot encode compact responses.
+    """
+    for subprotocol in SUBPROTOCOLS:
+        if subprotocol in requested and (compact or subprotocol != SUBPROTOCOL_COMPACT):
+            return subprotocol
+    return None
+
+
+def parse_landmarks(rows) -> Landmarks:
+    """
+    Validate client landmarks (33 BlazePose or 13 tracked rows of x, y, z,
+    visibility) and keep the tracked ones. Raises FrameProtocolError.
+    """
+    try:
+        data = np.asarray(rows, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise FrameProtocolError("Landmarks must be rows of 4 numbers")
+    if data.ndim != 2 or data.shape[1] != 4:
+        raise FrameProtocolError("Landmarks must be rows of 4 numbers")
+    if data.shape[0] == BLAZEPOSE_LANDMARKS:
+        data = data[_BLAZEPOSE_ROWS]
+    elif data.shape[0] != len(LANDMARK_NAMES):
+        raise FrameProtocolError(
+            f"Expected {BLAZEPOSE_LANDMARKS} or {len(LANDMARK_NAMES)} landmarks, "
+            f"got {data.shape[0]}"
+        )
+    if not np.isfinite(data).all():
+        raise FrameProtocolError("Landmarks must be finite")
+    xy = data[:, [Landmarks.X, Landmarks.Y]]
+    if (np.abs(xy - 0.5) > 0.5 + COORDINATE_MARGIN).any():
+        raise FrameProtocolError("Landmark coordinates must be normalised")
+    visibility = data[:, Landmarks.VISIBILITY]
+    if ((visibility < 0.0) | (visibility > 1.0)).any():
+        raise FrameProtocolError("Landmark visibility must be within [0, 1]")
+    return Landmarks(np.ascontiguousarray(data))
+
+
+def encode_binary(
+    jpeg: bytes, seq: int = 0, client_ts: float = 0.0, flags: int = 0
+) -> bytes:
+    return FRAME_HEADER.pack(seq, client_ts, flags) + jpeg
+
+
+def encode_landmarks(
+    rows: np.ndarray | None, seq: int = 0, client_ts: float = 0.0, flags: int = 0
+) -> bytes:
+    """A binary landmark message; rows None when the client found no pose."""
+    payload = b"" if rows is None else np.asarray(rows, dtype="<f4").tobytes()
+    return encode_binary(payload, seq, client_ts, flags | FLAG_LANDMARKS)
+
+
+def _valid_ts(ts) -> bool:
+    """Whether a client timestamp is a finite, non-negative number of ms."""
+    try:
+        return type(ts) in (int, float) and math.isfinite(float(ts)) and ts >= 0
+    except OverflowError:
+        return False
+
+
+def parse_binary(message: bytes) -> FramePacket:
+    if len(message) < FRAME_HEADER.size:
+        raise FrameProtocolError("Frame shorter than its header")
+    seq, client_ts, flags = FRAME_HEADER.unpack_from(message)
+    if not _valid_ts(client_ts):
+        raise FrameProtocolError("Header timestamp must be a timestamp in ms")
+    payload = memoryview(message)[FRAME_HEADER.size :]
+    if flags & FLAG_LANDMARKS:
+        if len(payload) % 16:
+            raise FrameProtocolError("Landmarks must be rows of 4 float32")
+        landmarks = (
+            parse_landmarks(np.frombuffer(payload, dtype="<f4").reshape(-1, 4))
+            if len(payload)
+            else None
+        )
+        return FramePacket(
+            None, seq=seq, client_ts=client_ts, flags=flags, landmarks=landmarks
+        )
+    if not len(payload):
+        raise FrameProtocolError("Frame shorter than its header")
+    return FramePacket(payload, seq=seq, client_ts=client_ts, flags=flags)
+
+
+def _stamp(data: dict) -> tuple[int | None, float | None]:
+    """The optional seq and ts fields of a JSON frame."""
+    seq, ts = data.get("seq"), data.get("ts")
+    if seq is not None and (type(seq) is not int or seq < 0):
+        raise FrameProtocolError("'seq' must be a non-negative integer")
+    if ts is not None:
+        if not _valid_ts(ts):
+            raise FrameProtocolError("'ts' must be a timestamp in ms")
+        ts = float(ts)
+    return seq, ts
+
+
+def parse_json(message: str | bytes) -> FramePacket | ControlMessage:
+    if not isinstance(message, str):
+        # json.loads would try to decode the JPEG as UTF-8
+        raise FrameProtocolError(
+            f"Binary frames need the {SUBPROTOCOL_BINARY} subprotocol"
+        )
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError:
+        raise FrameProtocolError("Invalid JSON")
+    if isinstance(data, dict) and "type" in data:
+        if data["type"] not in CONTROL_TYPES:
+            raise FrameProtocolError(f"Unknown control message: {data['type']}")
+        return ControlMessage(data["type"], data)
+    if isinstance(data, dict) and "landmarks" in data:
+        rows = data["landmarks"]
+        seq, ts = _stamp(data)
+        return FramePacket(
+            None,
+            seq=seq,
+            client_ts=ts,
+            landmarks=None if rows is None else parse_landmarks(rows),
+        )
+    frame_b64 = data.get("frame") if isinstance(data, dict) else None
+    if not frame_b64:
+        raise FrameProtocolError("Missing 'frame' field")
+    seq, ts = _stamp(data)
+    if not isinstance(frame_b64, str):
+        raise FrameProtocolError("Invalid base64 frame")
+    # Decoded by the caller once the frame is known not to have expired
+    return FramePacket(None, seq=seq, client_ts=ts, frame_b64=frame_b64)
@@ -0,0 +1,141 @@
+"""
+Frame sampling — decides which frames need a full pose inference.
+
+FrameChangeDetector compares a tiny grayscale thumbnail of each decoded frame
+with the thumbnail of the last frame that was actually inferred. While the
+scene stays the same (a member resting between sets), the previous landmarks
+and angles are reused instead of running MediaPipe again.
+
+KeyframeScheduler decimates inference instead: only every Nth frame (or every
+frame while the athlete moves fast) is a keyframe, and the landmarks of the
+frames in between are extrapolated from the velocity between the last two
+keyframes, so the rep tracker still sees an angle at the client frame rate.
+"""
+
+import numpy as np
+
+from app.services.pose_engine import Landmarks
+
+# Thumbnail grid used for change detection
+THUMB_WIDTH = 32
+THUMB_HEIGHT = 24
+
+# ITU-R 601 luma weights
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# Node-wide totals across all sessions, reported at /health/pose
+_skip_totals = {"checked": 0, "skipped": 0}
+
+
+def skip_stats() -> dict:
+    checked = _skip_totals["checked"]
+    return {
+        **_skip_totals,
+        "skip_rate": round(_skip_totals["skipped"] / checked, 3) if checked else 0.0,
+    }
+
+
+def thumbnail(frame: np.ndarray) -> np.ndarray:
+    """Nearest-neighbour (THUMB_HEIGHT, THUMB_WIDTH) grayscale thumbnail."""
+    height, width = frame.shape[:2]
+    rows = np.linspace(0, height - 1, THUMB_HEIGHT).astype(np.intp)
+    cols = np.linspace(0, width - 1, THUMB_WIDTH).astype(np.intp)
+    return frame[np.ix_(rows, cols)].astype(np.float32) @ _LUMA
+
+
+class FrameChangeDetector:
+    """Per-session detector for frames that are not worth re-inferring."""
+
+    def __init__(self, threshold: float, max_run: int):
+        # Mean absolute luma difference (0-255) below which frames count as
+        # unchanged, and the longest run of frames that may be skipped
+        self.threshold = threshold
+        self.max_run = max_run
+        self._reference: np.ndarray | None = None
+        self._run = 0
+        self.checked = 0
+        self.skipped = 0
+
+    def changed(self, frame: np.ndarray) -> bool:
+        """True if the frame needs inference; it then becomes the new reference."""
+        thumb = thumbnail(frame)
+        self.checked += 1
+        _skip_totals["checked"] += 1
+
+        if (
+            self._reference is not None
+            and self._run < self.max_run
+            and float(np.abs(thumb - self._reference).mean()) < self.threshold
+        ):
+            self._run += 1
+            self.skipped += 1
+            _skip_totals["skipped"] += 1
+            return False
+
+        self._reference = thumb
+        self._run = 0
+        return True
+
+    def reset(self) -> None:
+        self._reference = None
+        self._run = 0
+
+
+class KeyframeScheduler:
+    """Per-session keyframe decision and landmark extrapolation."""
+
+    def __init__(self, interval: int, max_speed: float, min_visibility: float = 0.3):
+        # Infer at least every `interval` frames, and on every frame while a
+        # visible landmark moves faster than max_speed (normalised units/frame)
+        self.interval = interval
+        self.max_speed = max_speed
+        self.min_visibility = min_visibility
+        self._index: int | None = None
+        self._data: np.ndarray | None = None
+        self._velocity: np.ndarray | None = None
+        self._speed = 0.0
+        self.keyframes = 0
+        self.interpolated = 0
+
+    def due(self, frame_index: int) -> bool:
+        """True if the frame must be inferred rather than extrapolated."""
+        if self.interval <= 1 or self._velocity is None:
+            return True
+        return (
+            frame_index - self._index >= self.interval or self._speed > self.max_speed
+        )
+
+    def observe(self, frame_index: int, landmarks: Landmarks | None) -> None:
+        """Record an inferred frame; a lost pose restarts velocity estimation."""
+        self.keyframes += 1
+        if landmarks is None:
+            self.reset()
+            return
+
+        data = landmarks.data
+        if self._data is not None and frame_index > self._index:
+            velocity = (data[:, :3] - self._data[:, :3]) / (frame_index - self._index)
+            visible = (data[:, Landmarks.VISIBILITY] >= self.min_visibility) & (
+                self._data[:, Landmarks.VISIBILITY] >= self.min_visibility
+            )
+            self._velocity = np.where(visible[:, None], velocity, 0.0)
+            self._speed = (
+                float(np.hypot(*self._velocity[visible, :2].T).max())
+                if visible.any()
+                else 0.0
+            )
+        self._index = frame_index
+        self._data = data
+
+    def predict(self, frame_index: int) -> Landmarks:
+        """Landmarks extrapolated from the last keyframe; visibility is carried over."""
+        data = self._data.copy()
+        data[:, :3] += self._velocity * (frame_index - self._index)
+        self.interpolated += 1
+        return Landmarks(data)
+
+    def reset(self) -> None:
+        self._index = None
+        self._data = None
+        self._velocity = None
+        self._speed = 0.0
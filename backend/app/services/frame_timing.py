@@ -0,0 +1,238 @@
+"""
+Frame timing — where each exercise socket frame spends its time.
+
+Every frame is timed stage by stage with the monotonic perf counter:
+
+    parse      binary header or JSON/base64 parse
+    decode     JPEG decode and downscale, and the frame change check
+    ipc        executor round trip outside the model: batching, ring copy,
+               queueing in the worker and returning the result
+    inference  pose model in the worker (the whole batch the frame ran in)
+    angles     exercise angles, in the worker or for client landmarks here
+    tracker    rep state machine
+    send       writing the response to the socket (in the send task)
+    frame      from taking the frame off the mailbox to its queued response
+    age        from client capture to taking the frame off the mailbox
+    e2e        from client capture to its response written to the socket
+
+age and e2e need the client's capture timestamp, translated to the server
+clock by ClockOffset; they exclude the fastest network delivery seen, so
+they measure the time frames spend in buffers and queues on the way.
+
+Stages a frame skips (no decode for client landmarks, no inference for a
+reused pose) are not recorded for it. Durations go into fixed log-scale
+histograms per session and per node; sessions save a p50/p95 summary with
+their MongoDB document and the node totals are reported at /health/pose.
+"""
+
+import bisect
+import time
+from collections import deque
+
+STAGES = (
+    "parse",
+    "decode",
+    "ipc",
+    "inference",
+    "angles",
+    "tracker",
+    "send",
+    "frame",
+    "age",
+    "e2e",
+)
+
+# Upper bucket bounds in ms: 0.05 ms to ~10 s in steps of 25%, so percentiles
+# are accurate to about a tenth of their value
+BUCKET_BOUNDS_MS = tuple(0.05 * 1.25**i for i in range(56))
+
+
+class LatencyHistogram:
+    """Counts of durations per log-scale bucket."""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        # One extra bucket for anything above the last bound
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th percentile (0-100)."""
+        if not self.count:
+            return None
+        rank = max(1, round(self.count * q / 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2),
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "counts": self.counts,
+            "total_ms": self.total_ms,
+            "max_ms": self.max_ms,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.count = sum(histogram.counts)
+        histogram.total_ms = data["total_ms"]
+        histogram.max_ms = data["max_ms"]
+        return histogram
+
+
+# Node-wide histograms across all sessions, reported at /health/pose
+_node_stages = {stage: LatencyHistogram() for stage in STAGES}
+
+
+def node_timing_stats() -> dict:
+    return {stage: histogram.summary() for stage, histogram in _node_stages.items()}
+
+
+class FrameTimer:
+    """
+    Stage durations of one frame. Each lap() charges the time since the
+    previous lap (or since the timer started) to a stage.
+    """
+
+    __slots__ = ("stages", "_started", "_mark")
+
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+        self._started = self._mark = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._mark) * 1000
+        self._mark = now
+
+    def lap_remote(self, stage: str, parts: dict[str, float]) -> None:
+        """
+        lap() for a call that ran partly elsewhere: `parts` (stage → ms, as
+        measured by the worker) go to their own stages, the rest to `stage`.
+        """
+        self.lap(stage)
+        for part, ms in parts.items():
+            self.stages[part] = self.stages.get(part, 0.0) + ms
+            self.stages[stage] = max(self.stages[stage] - ms, 0.0)
+
+    def skip(self) -> None:
+        """Start the next lap now, charging the time since the last to nothing."""
+        self._mark = time.perf_counter()
+
+    def finish(self) -> None:
+        self.stages["frame"] = (time.perf_counter() - self._started) * 1000
+
+    def rounded(self) -> dict:
+        return {stage: round(ms, 2) for stage, ms in self.stages.items()}
+
+
+class SessionTimings:
+    """One session's stage histograms; every sample also counts for the node."""
+
+    def __init__(self):
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+
+    def record(self, stage: str, ms: float) -> None:
+        self.stages[stage].record(ms)
+        _node_stages[stage].record(ms)
+
+    def add(self, timer: FrameTimer) -> None:
+        for stage, ms in timer.stages.items():
+            self.record(stage, ms)
+
+    def summary(
+        self, frames: int, duration_seconds: float, dropped: int, expired: int = 0
+    ) -> dict:
+        """Performance summary saved with the session document."""
+        return {
+            "frames": frames,
+            "fps": round(frames / duration_seconds, 1) if duration_seconds else 0.0,
+            "dropped_frames": dropped,
+            "expired_frames": expired,
+            "stages": {
+                stage: {
+                    "p50_ms": round(histogram.percentile(50), 2),
+                    "p95_ms": round(histogram.percentile(95), 2),
+                }
+                for stage, histogram in self.stages.items()
+                if histogram.count
+            },
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            stage: histogram.to_dict()
+            for stage, histogram in self.stages.items()
+            if histogram.count
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        """Continue a resumed session's histograms (the node's are not touched)."""
+        for stage, data in snapshot.items():
+            if stage in self.stages:
+                self.stages[stage].merge(LatencyHistogram.from_dict(data))
+
+
+class ClockOffset:
+    """
+    Offset of a client's capture clock from ours (time.monotonic, in ms).
+
+    Every frame gives arrival - capture = offset + its delivery time; the
+    smallest such sample within the last `window` seconds stands for the
+    offset plus the fastest delivery, so translated capture times exclude
+    only that. The window follows clock drift between the two.
+    """
+
+    def __init__(self, window: float):
+        self.window_ms = window * 1000
+        # (arrival, sample) with samples increasing; the first is the minimum
+        self._samples: deque[tuple[float, float]] = deque()
+
+    def observe(self, client_ts: float, arrived_ms: float) -> None:
+        sample = arrived_ms - client_ts
+        while self._samples and self._samples[-1][1] >= sample:
+            self._samples.pop()
+        self._samples.append((arrived_ms, sample))
+        while self._samples[0][0] < arrived_ms - self.window_ms:
+            self._samples.popleft()
+
+    @property
+    def offset_ms(self) -> float | None:
+        return self._samples[0][1] if self._samples else None
+
+    def to_server(self, client_ts: float) -> float:
+        """A client timestamp on the server clock; observe() it first."""
+        return client_ts + self._samples[0][1]
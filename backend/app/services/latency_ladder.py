@@ -0,0 +1,57 @@
+"""
+Latency ladder — the step rule shared by capture profiles and adaptive model
+complexity.
+
+Both walk a ladder of settings from heavier to lighter work. Each frame's
+latency feeds an exponentially weighted average; once a step has been held
+for a number of frames, work gets lighter when the average runs over budget
+or the caller reports pressure, and heavier again only when the average stays
+well under budget and the caller reports slack.
+"""
+
+# Smoothing of the latency average, and the fraction of the budget latency
+# must stay under before stepping to heavier work
+LATENCY_EWMA_ALPHA = 0.2
+STEP_UP_HEADROOM = 0.5
+
+# observe() verdicts
+HOLD = 0
+LIGHTER = 1
+HEAVIER = -1
+
+
+class LatencyLadder:
+    """Smoothed latency and hold count for the current step of one ladder."""
+
+    def __init__(self, budget_ms: float, hold_frames: int):
+        self.budget_ms = budget_ms
+        self.hold_frames = hold_frames
+        self.latency_ms: float | None = None
+        self.frames = 0
+
+    def observe(
+        self, latency_ms: float, pressure: bool = False, slack: bool = True
+    ) -> int:
+        """
+        Record one frame's latency. After hold_frames at this step, returns
+        LIGHTER when latency is over budget or there is pressure, HEAVIER
+        when it is under the headroom fraction and there is slack, else HOLD.
+        """
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += LATENCY_EWMA_ALPHA * (latency_ms - self.latency_ms)
+        self.frames += 1
+        if self.frames < self.hold_frames:
+            return HOLD
+
+        if pressure or self.latency_ms > self.budget_ms:
+            return LIGHTER
+        if slack and self.latency_ms < self.budget_ms * STEP_UP_HEADROOM:
+            return HEAVIER
+        return HOLD
+
+    def restart(self) -> None:
+        """Start the next step afresh: no average, hold count from zero."""
+        self.latency_ms = None
+        self.frames = 0
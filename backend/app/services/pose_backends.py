@@ -0,0 +1,348 @@
+"""
+Pose backends — the model runtimes behind PoseEngine.
+
+A backend runs one model on an RGB image and returns the tracked landmarks
+(rows in LANDMARK_NAMES order, coordinates normalised to that image) or None.
+PoseEngine keeps everything around it: ROI cropping, mapping crops back to
+the full frame and adaptive complexity, which it passes in as a tier from 0
+(fastest) up to the backend's max_complexity.
+
+    mediapipe        legacy mp.solutions.pose graph (lite / full / heavy)
+    mediapipe_tasks  Tasks PoseLandmarker in VIDEO mode (.task model files)
+    movenet          MoveNet SinglePose on onnxruntime CPU (lightning / thunder)
+
+The backend is chosen per deployment with the pose_backend setting; model
+files for the file-based backends are read from pose_model_dir. Each backend
+carries a rough resident-memory estimate per model tier, which sizes the
+engine pool against pose_memory_budget_mb.
+
+A backend that keeps no per-session state and shares its model between all
+engines of a process is `batchable`: frames from several sessions can then go
+through detect_batch as one model call. The MediaPipe backends track across
+frames, so they run per engine.
+"""
+
+import os
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+
+try:
+    import mediapipe as mp
+    from mediapipe.tasks.python import BaseOptions
+    from mediapipe.tasks.python import vision as mp_vision
+
+    mp_pose = mp.solutions.pose
+    MEDIAPIPE_AVAILABLE = True
+except ImportError:
+    MEDIAPIPE_AVAILABLE = False
+    mp = mp_pose = mp_vision = BaseOptions = None
+
+try:
+    import onnxruntime as ort
+
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+    ort = None
+
+from app.services.pose_engine import LANDMARK_NAMES, Landmarks
+
+# COCO keypoint indices (MoveNet output order) of the tracked landmarks
+COCO_KEYPOINTS = {
+    "NOSE": 0,
+    "LEFT_SHOULDER": 5,
+    "RIGHT_SHOULDER": 6,
+    "LEFT_ELBOW": 7,
+    "RIGHT_ELBOW": 8,
+    "LEFT_WRIST": 9,
+    "RIGHT_WRIST": 10,
+    "LEFT_HIP": 11,
+    "RIGHT_HIP": 12,
+    "LEFT_KNEE": 13,
+    "RIGHT_KNEE": 14,
+    "LEFT_ANKLE": 15,
+    "RIGHT_ANKLE": 16,
+}
+_COCO_INDICES = [COCO_KEYPOINTS[name] for name in LANDMARK_NAMES]
+
+
+class PoseBackend(ABC):
+    """One pose model runtime, owned by a single PoseEngine."""
+
+    name: str
+    max_complexity: int
+    batchable = False
+    # Estimated resident MB of one loaded model per tier (graph, weights and
+    # interpreter arenas); per engine, or per process for batchable backends
+    # whose models are shared
+    MEMORY_MB: dict[int, float]
+
+    def __init__(self, model_dir: str):
+        self.model_dir = model_dir
+
+    @classmethod
+    @abstractmethod
+    def available(cls) -> bool:
+        """Whether the runtime this backend needs is installed."""
+        ...
+
+    @abstractmethod
+    def load(self, complexity: int) -> None:
+        """Build the model for a tier now, so its first frame does not wait."""
+        ...
+
+    @abstractmethod
+    def detect(self, image: np.ndarray, complexity: int) -> Landmarks | None:
+        """Landmarks normalised to `image`, or None if no pose was found."""
+        ...
+
+    def detect_batch(
+        self, images: list[np.ndarray], complexity: int
+    ) -> list[Landmarks | None]:
+        """detect() for several images; batchable backends run them as one call."""
+        return [self.detect(image, complexity) for image in images]
+
+    def reset(self, complexity: int | None = None) -> None:
+        """Drop tracking state between sessions, or for one tier that sat idle."""
+
+    def close(self) -> None:
+        """Release the models."""
+
+
+class MediaPipeBackend(PoseBackend):
+    """Legacy mp.solutions.pose graphs, one per model complexity."""
+
+    name = "mediapipe"
+    max_complexity = 2
+    MEMORY_MB = {0: 30.0, 1: 45.0, 2: 110.0}
+
+    def __init__(self, model_dir: str):
+        super().__init__(model_dir)
+        if not MEDIAPIPE_AVAILABLE:
+            raise RuntimeError("mediapipe is not installed")
+        # Graphs are built per complexity on load or first use, then kept warm
+        self._graphs: dict[int, object] = {}
+
+    @classmethod
+    def available(cls) -> bool:
+        return MEDIAPIPE_AVAILABLE
+
+    def _graph(self, complexity: int):
+        if complexity not in self._graphs:
+            self._graphs[complexity] = mp_pose.Pose(
+                static_image_mode=False,
+                model_complexity=complexity,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5,
+            )
+        return self._graphs[complexity]
+
+    def load(self, complexity: int) -> None:
+        self._graph(complexity)
+
+    def detect(self, image: np.ndarray, complexity: int) -> Landmarks | None:
+        results = self._graph(complexity).process(image)
+        if not results.pose_landmarks:
+            return None
+        return Landmarks.from_mediapipe(results.pose_landmarks.landmark)
+
+    def reset(self, complexity: int | None = None) -> None:
+        for tier, graph in self._graphs.items():
+            if complexity is None or tier == complexity:
+                graph.reset()
+
+    def close(self) -> None:
+        for graph in self._graphs.values():
+            graph.close()
+        self._graphs.clear()
+
+
+class MediaPipeTasksBackend(PoseBackend):
+    """MediaPipe Tasks PoseLandmarker in VIDEO mode (tracks across frames)."""
+
+    name = "mediapipe_tasks"
+    max_complexity = 2
+    MEMORY_MB = {0: 30.0, 1: 45.0, 2: 110.0}
+    MODELS = {
+        0: "pose_landmarker_lite.task",
+        1: "pose_landmarker_full.task",
+        2: "pose_landmarker_heavy.task",
+    }
+
+    def __init__(self, model_dir: str):
+        super().__init__(model_dir)
+        if not MEDIAPIPE_AVAILABLE:
+            raise RuntimeError("mediapipe is not installed")
+        self._landmarkers: dict[int, object] = {}
+        self._timestamp_ms = 0
+
+    @classmethod
+    def available(cls) -> bool:
+        return MEDIAPIPE_AVAILABLE
+
+    def _landmarker(self, complexity: int):
+        if complexity not in self._landmarkers:
+            options = mp_vision.PoseLandmarkerOptions(
+                base_options=BaseOptions(
+                    model_asset_path=os.path.join(
+                        self.model_dir, self.MODELS[complexity]
+                    )
+                ),
+                running_mode=mp_vision.RunningMode.VIDEO,
+                num_poses=1,
+                min_pose_detection_confidence=0.5,
+                min_tracking_confidence=0.5,
+            )
+            self._landmarkers[complexity] = (
+                mp_vision.PoseLandmarker.create_from_options(options)
+            )
+        return self._landmarkers[complexity]
+
+    def load(self, complexity: int) -> None:
+        self._landmarker(complexity)
+
+    def detect(self, image: np.ndarray, complexity: int) -> Landmarks | None:
+        # VIDEO mode needs strictly increasing timestamps per landmarker
+        self._timestamp_ms = max(self._timestamp_ms + 1, int(time.monotonic() * 1000))
+        result = self._landmarker(complexity).detect_for_video(
+            mp.Image(image_format=mp.ImageFormat.SRGB, data=image),
+            self._timestamp_ms,
+        )
+        if not result.pose_landmarks:
+            return None
+        return Landmarks.from_mediapipe(result.pose_landmarks[0])
+
+    def reset(self, complexity: int | None = None) -> None:
+        # VIDEO-mode landmarkers have no reset, but none is needed: timestamps
+        # stay monotonic across sessions and tracking re-detects after a gap,
+        # so the landmarkers are kept rather than rebuilt from disk
+        pass
+
+    def close(self) -> None:
+        for landmarker in self._landmarkers.values():
+            landmarker.close()
+        self._landmarkers.clear()
+
+
+# MoveNet sessions per model path, shared by every engine in the process
+_onnx_sessions: dict[str, object] = {}
+
+
+class MoveNetBackend(PoseBackend):
+    """MoveNet SinglePose ONNX models on the onnxruntime CPU provider."""
+
+    name = "movenet"
+    max_complexity = 1
+    batchable = True
+    MEMORY_MB = {0: 25.0, 1: 60.0}
+    # Model file and square input size per tier
+    MODELS = {
+        0: ("movenet_singlepose_lightning.onnx", 192),
+        1: ("movenet_singlepose_thunder.onnx", 256),
+    }
+    # Fewer confident keypoints than this counts as no pose
+    MIN_KEYPOINTS = 4
+
+    def __init__(self, model_dir: str, min_score: float = 0.2):
+        super().__init__(model_dir)
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed")
+        self.min_score = min_score
+
+    @classmethod
+    def available(cls) -> bool:
+        return ONNXRUNTIME_AVAILABLE
+
+    def _session(self, complexity: int):
+        path = os.path.join(self.model_dir, self.MODELS[complexity][0])
+        if path not in _onnx_sessions:
+            options = ort.SessionOptions()
+            # The executor already runs one worker process per core
+            options.intra_op_num_threads = 1
+            _onnx_sessions[path] = ort.InferenceSession(
+                path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+        return _onnx_sessions[path]
+
+    def load(self, complexity: int) -> None:
+        self._session(complexity)
+
+    def detect(self, image: np.ndarray, complexity: int) -> Landmarks | None:
+        return self.detect_batch([image], complexity)[0]
+
+    def detect_batch(
+        self, images: list[np.ndarray], complexity: int
+    ) -> list[Landmarks | None]:
+        session = self._session(complexity)
+        size = self.MODELS[complexity][1]
+        model_input = session.get_inputs()[0]
+        dtype = np.int32 if model_input.type == "tensor(int32)" else np.float32
+
+        # Pad bottom/right to a square so the aspect ratio survives the resize
+        scales, tensors = [], []
+        for image in images:
+            height, width = image.shape[:2]
+            side = max(height, width)
+            square = np.zeros((side, side, 3), dtype=np.uint8)
+            square[:height, :width] = image
+            resized = Image.fromarray(square).resize((size, size), Image.BILINEAR)
+            tensors.append(np.asarray(resized))
+            scales.append((side / width, side / height))
+        batch = np.stack(tensors).astype(dtype)
+
+        if isinstance(model_input.shape[0], int):
+            # Exported with a fixed batch of one — run the frames in turn
+            outputs = [
+                session.run(None, {model_input.name: batch[i : i + 1]})[0]
+                for i in range(len(images))
+            ]
+        else:
+            outputs = session.run(None, {model_input.name: batch})[0]
+        keypoints = np.asarray(outputs, dtype=np.float32).reshape(len(images), -1, 3)
+
+        results = []
+        for (scale_x, scale_y), points in zip(scales, keypoints[:, _COCO_INDICES]):
+            # Rows of (y, x, score)
+            if (points[:, 2] >= self.min_score).sum() < self.MIN_KEYPOINTS:
+                results.append(None)
+                continue
+            data = np.zeros((len(LANDMARK_NAMES), 4), dtype=np.float32)
+            data[:, Landmarks.X] = points[:, 1] * scale_x
+            data[:, Landmarks.Y] = points[:, 0] * scale_y
+            data[:, Landmarks.VISIBILITY] = points[:, 2]
+            results.append(Landmarks(data))
+        return results
+
+
+BACKENDS: dict[str, type[PoseBackend]] = {
+    backend.name: backend
+    for backend in (MediaPipeBackend, MediaPipeTasksBackend, MoveNetBackend)
+}
+
+
+def create_backend(name: str, model_dir: str = "models") -> PoseBackend:
+    backend_cls = BACKENDS.get(name)
+    if backend_cls is None:
+        raise ValueError(
+            f"Unknown pose backend: {name}. Available: {list(BACKENDS.keys())}"
+        )
+    return backend_cls(model_dir)
+
+
+def estimate_memory_mb(name: str, complexity: int, engines: int, workers: int) -> float:
+    """
+    Estimated model memory of a pool: every engine may load its top tier and
+    the tiers below it (adaptive complexity and the cascade step down).
+    """
+    backend_cls = BACKENDS[name]
+    top = min(complexity, backend_cls.max_complexity)
+    per_model = sum(backend_cls.MEMORY_MB[tier] for tier in range(top + 1))
+    return per_model * (min(workers, engines) if backend_cls.batchable else engines)
+
+
+def backend_available(name: str) -> bool:
+    backend_cls = BACKENDS.get(name)
+    return backend_cls is not None and backend_cls.available()
@@ -1,25 +1,33 @@
 """
-MediaPipe Pose Engine — extracts body landmarks and calculates joint angles.
+Pose Engine — extracts body landmarks and calculates joint angles.
 
-Uses MediaPipe Pose to detect 33 body landmarks from an image frame,
-then computes angles between specified joints for exercise form analysis.
-"""
+Runs a pose model (MediaPipe Pose by default, see pose_backends for the
+alternatives) to detect body landmarks from an image frame, then computes
+angles between specified joints for exercise form analysis.
 
-import math
+Once a pose has been found, the next frame is cropped to a padded box around
+the previous landmarks before inference, and the detected landmarks are mapped
+back to full-frame coordinates. When the crop loses the athlete the engine
+retries on the full frame.
 
-import numpy as np
+With a latency budget set, the engine also times itself and steps down to a
+lighter model when it runs over budget or the node is saturated,
+and back up once there is headroom again (see latency_ladder).
 
-try:
-    import mediapipe as mp
+In cascade mode frames default to a cheap tracking tier, which is enough for
+the rep state machine; frames flagged `precise` (the caller knows the rep is
+near its bottom or top) run at the engine's current full tier.
+"""
 
-    mp_pose = mp.solutions.pose
-    MEDIAPIPE_AVAILABLE = True
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
-    mp_pose = None
+import math
+import statistics
+import time
 
+import numpy as np
 import structlog
 
+from app.services.latency_ladder import HEAVIER, LIGHTER, LatencyLadder
+
 logger = structlog.get_logger()
 
 # Landmark indices (MediaPipe Pose)
@@ -39,6 +47,71 @@ LANDMARKS = {
     "RIGHT_ANKLE": 28,
 }
 
+# Row order of the Landmarks array
+LANDMARK_NAMES = tuple(LANDMARKS)
+LANDMARK_INDEX = {name: row for row, name in enumerate(LANDMARK_NAMES)}
+_MP_INDICES = tuple(LANDMARKS.values())
+
+
+class Landmarks:
+    """
+    The tracked landmarks of one frame as a float32 (13, 4) array.
+
+    Rows follow LANDMARK_NAMES, columns are x, y, z, visibility. Coordinates
+    stay unrounded floats until to_dict() builds the JSON form for the wire.
+    """
+
+    __slots__ = ("data",)
+
+    X, Y, Z, VISIBILITY = range(4)
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    @classmethod
+    def from_mediapipe(cls, landmark_list) -> "Landmarks":
+        return cls(
+            np.array(
+                [
+                    (lm.x, lm.y, lm.z, lm.visibility)
+                    for lm in (landmark_list[idx] for idx in _MP_INDICES)
+                ],
+                dtype=np.float32,
+            )
+        )
+
+    @classmethod
+    def from_dict(cls, landmarks: dict) -> "Landmarks":
+        data = np.zeros((len(LANDMARK_NAMES), 4), dtype=np.float32)
+        for name, lm in landmarks.items():
+            data[LANDMARK_INDEX[name]] = (lm["x"], lm["y"], lm["z"], lm["visibility"])
+        return cls(data)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Row view (x, y, z, visibility) for a landmark name."""
+        return self.data[LANDMARK_INDEX[name]]
+
+    @property
+    def xy(self) -> np.ndarray:
+        return self.data[:, :2]
+
+    @property
+    def visibility(self) -> np.ndarray:
+        return self.data[:, self.VISIBILITY]
+
+    def to_dict(self) -> dict:
+        """JSON-ready form: {name: {x, y, z, visibility}} with wire rounding."""
+        rows = self.data.tolist()
+        return {
+            name: {
+                "x": round(x, 4),
+                "y": round(y, 4),
+                "z": round(z, 4),
+                "visibility": round(v, 2),
+            }
+            for name, (x, y, z, v) in zip(LANDMARK_NAMES, rows)
+        }
+
 
 def calculate_angle(a: tuple, b: tuple, c: tuple) -> float:
     """
@@ -61,98 +134,401 @@ def calculate_angle(a: tuple, b: tuple, c: tuple) -> float:
     return round(angle, 1)
 
 
+# Angles tracked per exercise: joint triplets (A, vertex B, C), the minimum
+# visibility for all three points, and how the "primary" angle driving the
+# state machine is reduced from the visible joints.
+EXERCISE_ANGLES = {
+    "squat": {
+        "joints": {
+            "left_knee": ("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
+            "right_knee": ("RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE"),
+        },
+        "min_visibility": 0.3,
+        "primary": "mean",
+    },
+    "bicep_curl": {
+        "joints": {
+            "left_elbow": ("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
+            "right_elbow": ("RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST"),
+        },
+        "min_visibility": 0.3,
+        "primary": "mean",
+    },
+    "shoulder_press": {
+        "joints": {
+            "left_shoulder": ("LEFT_HIP", "LEFT_SHOULDER", "LEFT_ELBOW"),
+            "right_shoulder": ("RIGHT_HIP", "RIGHT_SHOULDER", "RIGHT_ELBOW"),
+        },
+        "min_visibility": 0.3,
+        "primary": "mean",
+    },
+}
+
+_REDUCERS = {"mean": statistics.fmean, "min": min, "max": max}
+_NAN_REDUCERS = {"mean": np.nanmean, "min": np.nanmin, "max": np.nanmax}
+
+
+def _vertex_angles(points: np.ndarray) -> np.ndarray:
+    """Unchecked kernel behind calculate_angles for (..., 3, 2) triplets."""
+    ba = points[..., 0, :] - points[..., 1, :]
+    bc = points[..., 2, :] - points[..., 1, :]
+    cosine = (ba[..., 0] * bc[..., 0] + ba[..., 1] * bc[..., 1]) / (
+        np.hypot(ba[..., 0], ba[..., 1]) * np.hypot(bc[..., 0], bc[..., 1]) + 1e-6
+    )
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def calculate_angles(
+    points: np.ndarray,
+    visibility: np.ndarray | None = None,
+    min_visibility: float = 0.3,
+) -> np.ndarray:
+    """
+    Batched calculate_angle: angles at B for every (A, B, C) triplet at once.
+
+    Args:
+        points: (N, 3, 2) or (N, joints, 3, 2) array of x, y coordinates
+        visibility: optional (N, 3) or (N, joints, 3) landmark visibilities;
+            any point below min_visibility makes that angle NaN
+        min_visibility: visibility threshold for every point of a triplet
+
+    Returns:
+        (N,) or (N, joints) float64 angles in degrees (0-180), unrounded
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim not in (3, 4) or points.shape[-2:] != (3, 2):
+        raise ValueError(
+            f"Expected points of shape (N, 3, 2) or (N, joints, 3, 2), got {points.shape}"
+        )
+
+    angles = _vertex_angles(points)
+    if visibility is not None:
+        hidden = (np.asarray(visibility) < min_visibility).any(axis=-1)
+        angles[hidden] = np.nan
+    return angles
+
+
+class AnglePlan:
+    """One exercise's angle definitions, compiled to landmark row indices."""
+
+    def __init__(self, spec: dict):
+        self.names = tuple(spec["joints"])
+        self.rows = np.array(
+            [
+                [LANDMARK_INDEX[point] for point in triplet]
+                for triplet in spec["joints"].values()
+            ],
+            dtype=np.intp,
+        )
+        self.min_visibility = spec["min_visibility"]
+        self.reduce = _REDUCERS[spec["primary"]]
+        self.nan_reduce = _NAN_REDUCERS[spec["primary"]]
+
+    def compute(self, landmarks: Landmarks) -> dict:
+        """All angles for one frame from a single gather; None where hidden."""
+        points = landmarks.data[self.rows].astype(np.float64)
+        angles = _vertex_angles(points[..., :2]).tolist()
+        visible = points[..., Landmarks.VISIBILITY].min(axis=1) >= self.min_visibility
+
+        result = {}
+        valid = []
+        for name, angle, ok in zip(self.names, angles, visible.tolist()):
+            if ok:
+                angle = round(angle, 1)
+                valid.append(angle)
+            result[name] = angle if ok else None
+        result["primary"] = round(self.reduce(valid), 1) if valid else None
+        return result
+
+    def compute_series(self, frames: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        Angles for a whole (N, 13, 4) stack of Landmarks arrays in one pass.
+        Hidden joints are NaN; "primary" ignores them like compute() does.
+        """
+        data = np.asarray(frames)
+        angles = calculate_angles(
+            data[:, self.rows, :2],
+            data[:, self.rows, Landmarks.VISIBILITY],
+            self.min_visibility,
+        )
+        result = dict(zip(self.names, angles.T))
+        any_visible = ~np.isnan(angles).all(axis=1)
+        primary = np.full(len(data), np.nan)
+        primary[any_visible] = self.nan_reduce(angles[any_visible], axis=1)
+        result["primary"] = primary
+        return result
+
+
+ANGLE_PLANS = {name: AnglePlan(spec) for name, spec in EXERCISE_ANGLES.items()}
+
+
+def landmark_roi(
+    landmarks: Landmarks,
+    width: int,
+    height: int,
+    padding: float,
+    min_size: int = 64,
+) -> tuple[int, int, int, int] | None:
+    """
+    Pixel box (x0, y0, x1, y1) around the visible landmarks, grown by
+    `padding` times the box size on every side and clamped to the frame.
+    Returns None when too few landmarks are visible to place a box.
+    """
+    points = landmarks.xy[landmarks.visibility >= 0.3]
+    if len(points) < 4:
+        return None
+
+    (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+    box_w = float(max_x - min_x) * width
+    box_h = float(max_y - min_y) * height
+    pad_x = max(box_w * padding, min_size / 2)
+    pad_y = max(box_h * padding, min_size / 2)
+
+    x0 = max(0, int(min_x * width - pad_x))
+    y0 = max(0, int(min_y * height - pad_y))
+    x1 = min(width, int(max_x * width + pad_x))
+    y1 = min(height, int(max_y * height + pad_y))
+    if x1 - x0 < min_size or y1 - y0 < min_size:
+        return None
+    return x0, y0, x1, y1
+
+
+def _map_to_frame(
+    landmarks: Landmarks,
+    roi: tuple[int, int, int, int] | None,
+    width: int,
+    height: int,
+) -> Landmarks:
+    """Map landmarks detected in the `roi` crop back to the full frame, in place."""
+    if roi is not None:
+        x0, y0, x1, y1 = roi
+        scale_x = (x1 - x0) / width
+        data = landmarks.data
+        data[:, Landmarks.X] = x0 / width + data[:, Landmarks.X] * scale_x
+        data[:, Landmarks.Y] = y0 / height + data[:, Landmarks.Y] * ((y1 - y0) / height)
+        data[:, Landmarks.Z] *= scale_x
+    return landmarks
+
+
+# Adaptive model complexity: frames to hold a tier after switching
+COMPLEXITY_HOLD_FRAMES = 30
+
+
 class PoseEngine:
-    """Wraps MediaPipe Pose for landmark detection and angle computation."""
-
-    def __init__(self):
-        if not MEDIAPIPE_AVAILABLE:
-            raise RuntimeError("mediapipe is not installed")
-        self.pose = mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
+    """Wraps a pose backend for landmark detection and angle computation."""
+
+    def __init__(
+        self,
+        roi_padding: float | None = 0.25,
+        model_complexity: int = 1,
+        latency_budget_ms: float | None = None,
+        backend: str = "mediapipe",
+        model_dir: str = "models",
+        cascade_tier: int | None = None,
+    ):
+        # Imported here: the backends build on the Landmarks type above
+        from app.services.pose_backends import create_backend
+
+        self.backend = create_backend(backend, model_dir)
+        self.max_complexity = min(model_complexity, self.backend.max_complexity)
+        self.model_complexity = self.max_complexity
+        # Tier for frames not flagged precise; None runs every frame at
+        # model_complexity. active_complexity is the tier of the last frame.
+        self.cascade_tier = cascade_tier
+        self.active_complexity = self.model_complexity
+        # Build the configured tiers while the pool warms up, not on the
+        # engine's first frame
+        self.backend.load(self.model_complexity)
+        if cascade_tier is not None:
+            self.backend.load(min(cascade_tier, self.model_complexity))
+        # None disables cropping; otherwise padding around the last pose
+        self.roi_padding = roi_padding
+        self._roi: tuple[int, int, int, int] | None = None
+        self.roi_frames = 0
+        self.full_frames = 0
+        # None disables adaptive complexity
+        self._ladder = (
+            LatencyLadder(latency_budget_ms, COMPLEXITY_HOLD_FRAMES)
+            if latency_budget_ms is not None
+            else None
         )
 
-    def process_frame(self, frame: np.ndarray) -> dict | None:
+    def process_frame(
+        self, frame: np.ndarray, saturated: bool = False, precise: bool = True
+    ) -> Landmarks | None:
         """
         Process an RGB image frame and extract pose landmarks.
 
-        Returns dict with landmark positions and visibility, or None if no pose detected.
+        Returns landmark positions (normalized to the full frame) and
+        visibility, or None if no pose detected. `saturated` tells the engine
+        the node has more work queued than it has cores; `precise` is ignored
+        unless the engine runs a cascade.
         """
-        results = self.pose.process(frame)
-        if not results.pose_landmarks:
-            return None
-
-        landmarks = {}
-        for name, idx in LANDMARKS.items():
-            lm = results.pose_landmarks.landmark[idx]
-            landmarks[name] = {
-                "x": round(lm.x, 4),
-                "y": round(lm.y, 4),
-                "z": round(lm.z, 4),
-                "visibility": round(lm.visibility, 2),
-            }
+        return PoseEngine.process_batch([(self, frame)], saturated, [precise])[0]
+
+    @staticmethod
+    def process_batch(
+        items: list[tuple["PoseEngine", np.ndarray]],
+        saturated: bool = False,
+        precise: list[bool] | None = None,
+    ) -> list[Landmarks | None]:
+        """
+        Process one frame for each of several engines in a single pass.
+
+        Engines whose backend shares its model across engines (`batchable`)
+        and run the same tier go through one backend call; every other
+        engine runs its own model. Each engine keeps its own ROI and adapts
+        to the latency of the whole batch, which is what its frame waited.
+        Only frames run at the full tier feed the adaptive latency average.
+        An engine switching tiers resets that tier's tracking first, so a
+        model idle since its last frames re-detects instead of following a
+        stale pose.
+        """
+        for index, (engine, _) in enumerate(items):
+            tier = (
+                engine.model_complexity
+                if engine.cascade_tier is None or precise is None or precise[index]
+                else min(engine.cascade_tier, engine.model_complexity)
+            )
+            if tier != engine.active_complexity:
+                # The tier's model last tracked frames ago (a cascade burst
+                # starting or ending, or a complexity step); re-detect
+                engine.backend.reset(tier)
+            engine.active_complexity = tier
+
+        started = time.perf_counter()
+        results = PoseEngine._process_batch(items)
+        latency_ms = (time.perf_counter() - started) * 1000
+        for engine, _ in items:
+            if engine.active_complexity == engine.model_complexity:
+                engine._adapt(latency_ms, saturated)
+        return results
+
+    @staticmethod
+    def _process_batch(
+        items: list[tuple["PoseEngine", np.ndarray]],
+    ) -> list[Landmarks | None]:
+        jobs = []
+        for index, (engine, frame) in enumerate(items):
+            if engine._roi is not None:
+                x0, y0, x1, y1 = engine._roi
+                crop = np.ascontiguousarray(frame[y0:y1, x0:x1])
+                engine.roi_frames += 1
+                jobs.append((index, crop, engine._roi))
+            else:
+                engine.full_frames += 1
+                jobs.append((index, frame, None))
+        found = PoseEngine._detect_batch(items, jobs)
+
+        # No previous pose, or the crop lost it — search the whole frame
+        retry = [
+            (index, items[index][1], None)
+            for index, _, roi in jobs
+            if roi is not None and found[index] is None
+        ]
+        for index, _, _ in retry:
+            items[index][0].full_frames += 1
+        if retry:
+            found.update(PoseEngine._detect_batch(items, retry))
+
+        results = []
+        for index, (engine, frame) in enumerate(items):
+            landmarks = found[index]
+            height, width = frame.shape[:2]
+            if landmarks is None or engine.roi_padding is None:
+                engine._roi = None
+            else:
+                engine._roi = landmark_roi(landmarks, width, height, engine.roi_padding)
+            results.append(landmarks)
+        return results
+
+    @staticmethod
+    def _detect_batch(
+        items: list[tuple["PoseEngine", np.ndarray]], jobs: list[tuple]
+    ) -> dict[int, Landmarks | None]:
+        """Run (index, image, roi) jobs on their backends, mapped to full frames."""
+        groups: dict[object, list[tuple]] = {}
+        for job in jobs:
+            engine = items[job[0]][0]
+            key = (
+                (type(engine.backend), engine.active_complexity)
+                if engine.backend.batchable
+                else id(engine)
+            )
+            groups.setdefault(key, []).append(job)
+
+        found = {}
+        for group in groups.values():
+            engine = items[group[0][0]][0]
+            detected = engine.backend.detect_batch(
+                [image for _, image, _ in group], engine.active_complexity
+            )
+            for (index, _, roi), landmarks in zip(group, detected):
+                height, width = items[index][1].shape[:2]
+                found[index] = (
+                    _map_to_frame(landmarks, roi, width, height)
+                    if landmarks is not None
+                    else None
+                )
+        return found
 
-        return landmarks
+    @property
+    def latency_ms(self) -> float | None:
+        """Smoothed latency at the current tier, when adapting."""
+        return self._ladder.latency_ms if self._ladder else None
+
+    def _adapt(self, latency_ms: float, saturated: bool) -> None:
+        """Step model complexity down under pressure and up with headroom."""
+        if self._ladder is None:
+            return
+        step = self._ladder.observe(latency_ms, pressure=saturated, slack=not saturated)
+        if step == LIGHTER and self.model_complexity > 0:
+            self._set_complexity(self.model_complexity - 1)
+        elif step == HEAVIER and self.model_complexity < self.max_complexity:
+            self._set_complexity(self.model_complexity + 1)
+
+    def _set_complexity(self, complexity: int) -> None:
+        logger.info(
+            "pose_complexity_changed",
+            from_complexity=self.model_complexity,
+            to_complexity=complexity,
+            latency_ms=round(self.latency_ms or 0, 1),
+        )
+        self.model_complexity = complexity
+        self._ladder.restart()
 
     def get_angle(
-        self, landmarks: dict, point_a: str, point_b: str, point_c: str
+        self, landmarks: Landmarks, point_a: str, point_b: str, point_c: str
     ) -> float | None:
         """
         Calculate angle at point_b between point_a and point_c.
         Returns None if any landmark has low visibility.
         """
+        rows = []
         for name in (point_a, point_b, point_c):
-            if name not in landmarks:
+            row = LANDMARK_INDEX.get(name)
+            if row is None or landmarks.visibility[row] < 0.3:
                 return None
-            if landmarks[name]["visibility"] < 0.3:
-                return None
-
-        a = (landmarks[point_a]["x"], landmarks[point_a]["y"])
-        b = (landmarks[point_b]["x"], landmarks[point_b]["y"])
-        c = (landmarks[point_c]["x"], landmarks[point_c]["y"])
+            rows.append(row)
 
+        a, b, c = landmarks.xy[rows]
         return calculate_angle(a, b, c)
 
-    def get_exercise_angles(self, landmarks: dict, exercise: str) -> dict:
+    def get_exercise_angles(self, landmarks: Landmarks, exercise: str) -> dict:
         """Calculate relevant angles for a given exercise, using both sides."""
-        angles = {}
-
-        if exercise == "squat":
-            angles["left_knee"] = self.get_angle(
-                landmarks, "LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"
-            )
-            angles["right_knee"] = self.get_angle(
-                landmarks, "RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE"
-            )
-            # Use the average of both knees for state machine
-            valid = [v for v in [angles["left_knee"], angles["right_knee"]] if v]
-            angles["primary"] = round(sum(valid) / len(valid), 1) if valid else None
-
-        elif exercise == "bicep_curl":
-            angles["left_elbow"] = self.get_angle(
-                landmarks, "LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"
-            )
-            angles["right_elbow"] = self.get_angle(
-                landmarks, "RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST"
-            )
-            valid = [v for v in [angles["left_elbow"], angles["right_elbow"]] if v]
-            angles["primary"] = round(sum(valid) / len(valid), 1) if valid else None
-
-        elif exercise == "shoulder_press":
-            angles["left_shoulder"] = self.get_angle(
-                landmarks, "LEFT_HIP", "LEFT_SHOULDER", "LEFT_ELBOW"
-            )
-            angles["right_shoulder"] = self.get_angle(
-                landmarks, "RIGHT_HIP", "RIGHT_SHOULDER", "RIGHT_ELBOW"
-            )
-            valid = [
-                v for v in [angles["left_shoulder"], angles["right_shoulder"]] if v
-            ]
-            angles["primary"] = round(sum(valid) / len(valid), 1) if valid else None
+        plan = ANGLE_PLANS.get(exercise)
+        if plan is None:
+            return {}
+        return plan.compute(landmarks)
 
-        return angles
+    def reset(self):
+        """Drop tracking state so the engine can serve a new session."""
+        self.backend.reset()
+        self._roi = None
+        self.model_complexity = self.max_complexity
+        self.active_complexity = self.max_complexity
+        if self._ladder:
+            self._ladder.restart()
 
     def close(self):
-        self.pose.close()
+        self.backend.close()
@@ -0,0 +1,717 @@
+"""
+Pose Executor — runs PoseEngine inference in worker processes.
+
+Each worker process owns a share of a warm PoseEngine pool and a shared-memory
+ring of frame slots. Sessions check out a lease on one engine for their whole
+lifetime (MediaPipe tracks across frames), and the engine is reset rather than
+rebuilt when the lease is released. The API process copies a decoded frame
+into a free slot and sends only the slot index and frame shape over the
+request queue, so pixels are never pickled. Results come back on a per-worker
+pipe and are resolved onto asyncio futures, so the event loop only awaits
+inference.
+
+With micro-batching enabled, requests for a worker are held for up to
+batch_wait_ms (or until batch_size are waiting) and sent as one message, and
+the worker runs them through PoseEngine.process_batch so a batchable backend
+sees them as a single model call. Batches are filled round-robin across
+sessions: every waiting session gets a frame in before any gets a second, and
+sessions served last go to the back of the line for the next batch.
+
+The result reader also watches each worker's process sentinel. When a worker
+dies, its in-flight frames fail, its leases leave the pool and a replacement
+process is started; sessions holding a lost lease get PoseWorkerLost and
+check out a fresh engine. Each worker writes to its own pipe, so one killed
+mid-write cannot wedge the others' results.
+"""
+
+import asyncio
+import contextlib
+import functools
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, deque
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+import structlog
+
+from app.config import settings
+from app.services.pose_backends import backend_available, estimate_memory_mb
+from app.services.pose_engine import Landmarks, PoseEngine
+
+logger = structlog.get_logger()
+
+# How long a replacement worker may take to build its engines (seconds)
+WORKER_RESPAWN_TIMEOUT = 60.0
+
+
+class PoseWorkerLost(RuntimeError):
+    """The worker process behind a lease died; check out another engine."""
+
+
+class FrameRing:
+    """Fixed number of equally sized uint8 frame slots in one shared-memory block."""
+
+    def __init__(self, slots: int, slot_bytes: int, name: str | None = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def view(self, slot: int, shape: tuple) -> np.ndarray:
+        """Return a numpy view over a slot, without copying."""
+        if not 0 <= slot < self.slots:
+            raise IndexError(f"Ring slot {slot} out of range")
+        if int(np.prod(shape)) > self.slot_bytes:
+            raise ValueError(
+                f"Frame of shape {shape} does not fit a {self.slot_bytes}-byte slot"
+            )
+        return np.ndarray(
+            shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes
+        )
+
+    def close(self) -> None:
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _worker_main(
+    worker_id: int,
+    ring_name: str,
+    slots: int,
+    slot_bytes: int,
+    engine_count: int,
+    requests,
+    results,
+    engine_factory,
+) -> None:
+    """Worker process loop: attach to the ring, build the engines, serve requests."""
+    ring = FrameRing(slots, slot_bytes, name=ring_name)
+    try:
+        engines = [engine_factory() for _ in range(engine_count)]
+    except Exception as e:
+        results.send(("ready", worker_id, str(e)))
+        ring.close()
+        return
+    results.send(("ready", worker_id, None))
+
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        if msg[0] == "reset":
+            engines[msg[1]].reset()
+            continue
+        if msg[0] == "infer_batch":
+            _, batch, saturated = msg
+        else:
+            _, *request, saturated = msg
+            batch = [tuple(request)]
+        try:
+            items = [
+                (engines[engine_slot], ring.view(slot, shape))
+                for _, engine_slot, slot, shape, _, _ in batch
+            ]
+            precise = [request[5] for request in batch]
+            started = time.perf_counter()
+            detected = engines[0].process_batch(items, saturated, precise)
+            inference_ms = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            for request_id, *_ in batch:
+                results.send(("result", request_id, None, str(e)))
+            continue
+
+        for (request_id, engine_slot, _, _, exercise, _), landmarks in zip(
+            batch, detected
+        ):
+            engine = engines[engine_slot]
+            try:
+                started = time.perf_counter()
+                angles = (
+                    engine.get_exercise_angles(landmarks, exercise) if landmarks else {}
+                )
+                info = {
+                    "model_complexity": engine.active_complexity,
+                    "inference_ms": inference_ms,
+                    "angles_ms": (time.perf_counter() - started) * 1000,
+                }
+                results.send(("result", request_id, (landmarks, angles, info), None))
+            except Exception as e:
+                results.send(("result", request_id, None, str(e)))
+
+    for engine in engines:
+        engine.close()
+    ring.close()
+
+
+class _Worker:
+    """Parent-side handle for one worker process and its ring."""
+
+    def __init__(
+        self,
+        worker_id: int,
+        ring: FrameRing,
+        engine_count: int,
+        requests,
+        results,
+        process,
+    ):
+        self.worker_id = worker_id
+        self.ring = ring
+        self.engine_count = engine_count
+        self.requests = requests
+        self.results = results
+        self.process = process
+        self.free_slots: asyncio.Queue[int] = asyncio.Queue()
+        for slot in range(ring.slots):
+            self.free_slots.put_nowait(slot)
+        self.in_flight = 0
+        # Requests waiting for the next batch, per engine slot (session)
+        self.queued: dict[int, deque[tuple]] = {}
+        self.queued_count = 0
+        self.flush_handle: asyncio.TimerHandle | None = None
+        self.alive = True
+
+
+class PoseLease:
+    """A session's exclusive hold on one pooled engine."""
+
+    def __init__(self, worker: _Worker, engine_slot: int):
+        self.worker = worker
+        self.engine_slot = engine_slot
+
+
+class PoseExecutor:
+    """Pool of pose worker processes fed through shared-memory frame rings."""
+
+    def __init__(
+        self,
+        workers: int,
+        ring_slots: int,
+        max_frame_width: int,
+        max_frame_height: int,
+        pool_size: int,
+        engine_factory=PoseEngine,
+        batch_size: int = 1,
+        batch_wait_ms: float = 0.0,
+    ):
+        self.num_workers = min(workers, pool_size)
+        self.pool_size = pool_size
+        # Batches never outgrow the ring they are staged in
+        self.ring_slots = max(ring_slots, batch_size)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.slot_bytes = max_frame_width * max_frame_height * 3
+        self.engine_factory = engine_factory
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: list[_Worker] = []
+        self._pending: dict[int, tuple[asyncio.Future, _Worker, int]] = {}
+        self._ready: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reader: threading.Thread | None = None
+        self._leases: asyncio.Queue[PoseLease] | None = None
+        self._respawns: set[asyncio.Task] = set()
+        self._stopping = False
+        # Workers whose pipe and sentinel the reader thread listens on
+        self._watched: list[_Worker] = []
+        self._watch_lock = threading.Lock()
+        self._wakeup, self._wakeup_sender = self._ctx.Pipe(duplex=False)
+        self.frames_processed = 0
+        self.errors = 0
+        self.checkouts = 0
+        self.checkout_waits = 0
+        self.checkout_wait_seconds = 0.0
+        self.complexity_frames: Counter[int] = Counter()
+        self.batches = 0
+        self.batched_frames = 0
+        self.worker_deaths = 0
+        self.respawns = 0
+
+    def _spawn(self, worker_id: int, engine_count: int) -> _Worker:
+        """Start one worker process; its ready future resolves once engines load."""
+        # At least one ring slot per engine so no session starves another
+        ring = FrameRing(max(self.ring_slots, engine_count), self.slot_bytes)
+        requests = self._ctx.Queue()
+        results, results_sender = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                worker_id,
+                ring.name,
+                ring.slots,
+                self.slot_bytes,
+                engine_count,
+                requests,
+                results_sender,
+                self.engine_factory,
+            ),
+            name=f"pose-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        results_sender.close()
+        self._ready[worker_id] = self._loop.create_future()
+        worker = _Worker(worker_id, ring, engine_count, requests, results, process)
+        with self._watch_lock:
+            self._watched.append(worker)
+        self._wakeup_sender.send("watch")
+        return worker
+
+    async def start(self, timeout: float = 60.0) -> None:
+        self._loop = asyncio.get_running_loop()
+        for worker_id in range(self.num_workers):
+            engine_count = self.pool_size // self.num_workers + (
+                worker_id < self.pool_size % self.num_workers
+            )
+            self._workers.append(self._spawn(worker_id, engine_count))
+
+        self._reader = threading.Thread(
+            target=self._read_results, name="pose-results", daemon=True
+        )
+        self._reader.start()
+
+        errors = await asyncio.wait_for(
+            asyncio.gather(*self._ready.values()), timeout=timeout
+        )
+        failed = [e for e in errors if e]
+        if len(failed) == len(self._workers):
+            await self.stop()
+            raise RuntimeError(f"No pose worker could start: {failed[0]}")
+        if failed:
+            logger.warning("pose_workers_degraded", failed=len(failed))
+            for worker, error in zip(self._workers, errors):
+                if error:
+                    worker.ring.close()
+        self._workers = [w for w, e in zip(self._workers, errors) if not e]
+
+        self._leases = asyncio.Queue()
+        for worker in self._workers:
+            for engine_slot in range(worker.engine_count):
+                self._leases.put_nowait(PoseLease(worker, engine_slot))
+        logger.info(
+            "pose_executor_started",
+            workers=len(self._workers),
+            engines=self._leases.qsize(),
+        )
+
+    def _worker_exited(self, worker: _Worker) -> None:
+        """A worker process ended: fail its startup, or replace it if it was serving."""
+        ready = self._ready.get(worker.worker_id)
+        if ready and not ready.done():
+            ready.set_result(f"worker exited with code {worker.process.exitcode}")
+            return
+        if self._stopping or self._leases is None or worker not in self._workers:
+            return
+        self._worker_died(worker)
+
+    def _worker_died(self, worker: _Worker) -> None:
+        """Fail a dead worker's frames, drop its leases and start a replacement."""
+        self.worker_deaths += 1
+        logger.error(
+            "pose_worker_died",
+            worker=worker.worker_id,
+            exitcode=worker.process.exitcode,
+        )
+        worker.alive = False
+        self._workers.remove(worker)
+        if worker.flush_handle is not None:
+            worker.flush_handle.cancel()
+            worker.flush_handle = None
+        worker.queued.clear()
+        worker.queued_count = 0
+
+        for request_id, (future, owner, slot) in list(self._pending.items()):
+            if owner is not worker:
+                continue
+            del self._pending[request_id]
+            # Hand the slot back so infer() calls waiting on one wake and bail
+            worker.free_slots.put_nowait(slot)
+            if not future.done():
+                self.errors += 1
+                future.set_exception(PoseWorkerLost("Pose worker died"))
+        worker.in_flight = 0
+
+        # Idle leases on the dead worker leave the pool; checked-out ones are
+        # refused by infer() and ignored by release()
+        idle = []
+        while not self._leases.empty():
+            lease = self._leases.get_nowait()
+            if lease.worker is not worker:
+                idle.append(lease)
+        for lease in idle:
+            self._leases.put_nowait(lease)
+        worker.ring.close()
+
+        task = asyncio.create_task(self._respawn(worker))
+        self._respawns.add(task)
+        task.add_done_callback(self._respawns.discard)
+
+    async def _respawn(self, dead: _Worker) -> None:
+        """Replace a dead worker and put its engines back in the pool."""
+        worker = self._spawn(dead.worker_id, dead.engine_count)
+        try:
+            error = await asyncio.wait_for(
+                self._ready[worker.worker_id], timeout=WORKER_RESPAWN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            error = "timed out building engines"
+        except BaseException:
+            worker.process.terminate()
+            worker.ring.close()
+            raise
+        if error:
+            logger.error(
+                "pose_worker_respawn_failed", worker=dead.worker_id, error=error
+            )
+            worker.process.terminate()
+            worker.ring.close()
+            return
+        self.respawns += 1
+        self._workers.append(worker)
+        for engine_slot in range(worker.engine_count):
+            self._leases.put_nowait(PoseLease(worker, engine_slot))
+        logger.info("pose_worker_respawned", worker=worker.worker_id)
+
+    def _read_results(self) -> None:
+        """Drain worker pipes on a thread and hand results and exits to the loop."""
+        while True:
+            with self._watch_lock:
+                channels = {}
+                for worker in self._watched:
+                    channels[worker.results] = worker
+                    channels[worker.process.sentinel] = worker
+            for ready in connection.wait([self._wakeup, *channels]):
+                if ready is self._wakeup:
+                    if self._wakeup.recv() is None:
+                        return
+                    continue
+                worker = channels[ready]
+                if ready is worker.results:
+                    try:
+                        msg = ready.recv()
+                    except (EOFError, OSError):
+                        # Closed pipe; the sentinel reports the exit
+                        continue
+                    self._loop.call_soon_threadsafe(self._dispatch, msg)
+                    continue
+                # Process exited: deliver what it sent last, then the exit
+                with self._watch_lock:
+                    if worker not in self._watched:
+                        continue
+                    self._watched.remove(worker)
+                try:
+                    while worker.results.poll():
+                        self._loop.call_soon_threadsafe(
+                            self._dispatch, worker.results.recv()
+                        )
+                except (EOFError, OSError):
+                    pass
+                worker.results.close()
+                # Reap it so the exit code is known
+                worker.process.join(1)
+                self._loop.call_soon_threadsafe(self._worker_exited, worker)
+
+    def _dispatch(self, msg: tuple) -> None:
+        kind, key, payload_or_error, *rest = msg
+        if kind == "ready":
+            future = self._ready.get(key)
+            if future and not future.done():
+                future.set_result(payload_or_error)
+            return
+
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        future, worker, slot = pending
+        worker.in_flight -= 1
+        worker.free_slots.put_nowait(slot)
+        error = rest[0]
+        if future.done():
+            return
+        if error:
+            self.errors += 1
+            future.set_exception(RuntimeError(error))
+        else:
+            self.frames_processed += 1
+            self.complexity_frames[payload_or_error[2]["model_complexity"]] += 1
+            future.set_result(payload_or_error)
+
+    async def checkout(self, timeout: float) -> PoseLease:
+        """
+        Take a warm engine from the pool, waiting up to `timeout` seconds.
+        Raises asyncio.TimeoutError when the pool stays exhausted.
+        """
+        self.checkouts += 1
+        try:
+            return self._leases.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+
+        self.checkout_waits += 1
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(self._leases.get(), timeout=timeout)
+        finally:
+            self.checkout_wait_seconds += time.monotonic() - started
+
+    def release(self, lease: PoseLease) -> None:
+        """Reset the leased engine's tracking state and return it to the pool."""
+        if lease.worker not in self._workers:
+            return
+        lease.worker.requests.put(("reset", lease.engine_slot))
+        self._leases.put_nowait(lease)
+
+    @property
+    def saturated(self) -> bool:
+        """More frames queued or running than there are worker processes."""
+        return sum(w.in_flight for w in self._workers) > len(self._workers)
+
+    @property
+    def load(self) -> float:
+        """Frames queued or running per worker process."""
+        if not self._workers:
+            return 0.0
+        return sum(w.in_flight for w in self._workers) / len(self._workers)
+
+    async def infer(
+        self,
+        lease: PoseLease,
+        frame: np.ndarray,
+        exercise: str,
+        precise: bool = True,
+    ) -> tuple[Landmarks | None, dict, dict]:
+        """
+        Run pose detection and angle computation for one RGB frame.
+        Returns (landmarks, angles, info) where info holds engine details
+        such as the model complexity that served the frame. With a cascade
+        configured, only `precise` frames run the full model.
+        """
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(
+                f"Frame of shape {frame.shape} exceeds the configured maximum size"
+            )
+        worker = lease.worker
+        if not worker.alive:
+            raise PoseWorkerLost("Pose worker died")
+        deadline = self._loop.time() + settings.pose_infer_timeout
+        worker.in_flight += 1
+        try:
+            slot = await asyncio.wait_for(
+                worker.free_slots.get(), timeout=settings.pose_infer_timeout
+            )
+        except BaseException:
+            worker.in_flight -= 1
+            raise
+        if not worker.alive:
+            # Woken by the worker's death; pass the slot on to the next waiter
+            worker.free_slots.put_nowait(slot)
+            raise PoseWorkerLost("Pose worker died")
+
+        np.copyto(worker.ring.view(slot, frame.shape), frame)
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = (future, worker, slot)
+        request = (request_id, lease.engine_slot, slot, frame.shape, exercise, precise)
+        if self.batch_size > 1:
+            self._enqueue(worker, request)
+        else:
+            worker.requests.put(("infer", *request, self.saturated))
+
+        return await asyncio.wait_for(
+            asyncio.shield(future), timeout=max(deadline - self._loop.time(), 0)
+        )
+
+    def _enqueue(self, worker: _Worker, request: tuple) -> None:
+        """Hold a request for the worker's next batch."""
+        worker.queued.setdefault(request[1], deque()).append(request)
+        worker.queued_count += 1
+        if worker.queued_count >= self.batch_size:
+            self._flush(worker)
+        elif worker.flush_handle is None:
+            worker.flush_handle = self._loop.call_later(
+                self.batch_wait, self._flush, worker
+            )
+
+    def _flush(self, worker: _Worker) -> None:
+        """Send everything queued for a worker, in fair batches of batch_size."""
+        if worker.flush_handle is not None:
+            worker.flush_handle.cancel()
+            worker.flush_handle = None
+        while worker.queued:
+            batch: list[tuple] = []
+            while worker.queued and len(batch) < self.batch_size:
+                # One frame per session per pass; served sessions move to the back
+                for engine_slot in list(worker.queued):
+                    if len(batch) == self.batch_size:
+                        break
+                    queue = worker.queued.pop(engine_slot)
+                    batch.append(queue.popleft())
+                    if queue:
+                        worker.queued[engine_slot] = queue
+            worker.queued_count -= len(batch)
+            self.batches += 1
+            self.batched_frames += len(batch)
+            worker.requests.put(("infer_batch", batch, self.saturated))
+
+    @property
+    def stats(self) -> dict:
+        engines = sum(w.engine_count for w in self._workers)
+        available = self._leases.qsize() if self._leases else 0
+        return {
+            "workers": len(self._workers),
+            "worker_deaths": self.worker_deaths,
+            "respawns": self.respawns,
+            "in_flight": sum(w.in_flight for w in self._workers),
+            "frames_processed": self.frames_processed,
+            "errors": self.errors,
+            "saturated": self.saturated,
+            "load": round(self.load, 2),
+            "frames_by_model_complexity": dict(self.complexity_frames),
+            "batching": {
+                "batch_size": self.batch_size,
+                "wait_ms": round(self.batch_wait * 1000, 1),
+                "batches": self.batches,
+                "avg_batch_size": (
+                    round(self.batched_frames / self.batches, 2)
+                    if self.batches
+                    else 0.0
+                ),
+            },
+            "pool": {
+                "size": engines,
+                "in_use": engines - available,
+                "checkouts": self.checkouts,
+                "waits": self.checkout_waits,
+                "wait_ratio": (
+                    round(self.checkout_waits / self.checkouts, 3)
+                    if self.checkouts
+                    else 0.0
+                ),
+                "avg_wait_ms": (
+                    round(self.checkout_wait_seconds / self.checkout_waits * 1000, 1)
+                    if self.checkout_waits
+                    else 0.0
+                ),
+            },
+        }
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in list(self._respawns):
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        for worker in self._workers:
+            if worker.flush_handle is not None:
+                worker.flush_handle.cancel()
+            worker.requests.put(None)
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, 5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.ring.close()
+        self._workers.clear()
+        if self._reader:
+            self._wakeup_sender.send(None)
+            await asyncio.to_thread(self._reader.join, 5)
+            self._reader = None
+        for future, _, _ in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+
+_executor: PoseExecutor | None = None
+
+
+def fit_pool_size(pool_size: int, workers: int) -> int:
+    """The largest pool up to `pool_size` whose memory estimate fits the budget."""
+    budget = settings.pose_memory_budget_mb
+    if not budget:
+        return pool_size
+    fitted = pool_size
+    while fitted and (
+        estimate_memory_mb(
+            settings.pose_backend, settings.pose_model_complexity, fitted, workers
+        )
+        > budget
+    ):
+        fitted -= 1
+    if fitted < pool_size:
+        logger.warning(
+            "pose_pool_shrunk_to_budget",
+            requested=pool_size,
+            size=fitted,
+            budget_mb=budget,
+        )
+    return fitted
+
+
+async def start_pose_executor() -> None:
+    global _executor
+    if not backend_available(settings.pose_backend):
+        logger.warning(
+            "pose_executor_skipped",
+            reason=f"pose backend {settings.pose_backend!r} is not available",
+        )
+        return
+    workers = settings.pose_workers or os.cpu_count() or 1
+    pool_size = fit_pool_size(settings.pose_pool_size, workers)
+    if pool_size == 0:
+        logger.warning(
+            "pose_executor_skipped",
+            reason="no pose engine fits pose_memory_budget_mb",
+        )
+        return
+    executor = PoseExecutor(
+        workers=workers,
+        ring_slots=settings.pose_ring_slots,
+        max_frame_width=settings.pose_max_frame_width,
+        max_frame_height=settings.pose_max_frame_height,
+        pool_size=pool_size,
+        engine_factory=functools.partial(
+            PoseEngine,
+            roi_padding=settings.pose_roi_padding
+            if settings.pose_roi_enabled
+            else None,
+            model_complexity=settings.pose_model_complexity,
+            backend=settings.pose_backend,
+            model_dir=settings.pose_model_dir,
+            cascade_tier=(
+                settings.pose_cascade_tier if settings.pose_cascade_enabled else None
+            ),
+            latency_budget_ms=(
+                settings.pose_latency_budget_ms
+                if settings.pose_adaptive_complexity
+                else None
+            ),
+        ),
+        batch_size=settings.pose_batch_size,
+        batch_wait_ms=settings.pose_batch_wait_ms,
+    )
+    await executor.start()
+    _executor = executor
+
+
+async def stop_pose_executor() -> None:
+    global _executor
+    if _executor:
+        await _executor.stop()
+        _executor = None
+        logger.info("pose_executor_stopped")
+
+
+def get_pose_executor() -> PoseExecutor | None:
+    return _executor
@@ -5,6 +5,37 @@ from app.db.redis import get_redis
 
 logger = structlog.get_logger()
 
+# GETDEL of a JSON value, only if its field ARGV[1] equals ARGV[2] (or, with
+# ARGV[2] empty, is present at all); ARGV[3], when given, is left in its
+# place for ARGV[4] seconds
+_TAKE_IF_SCRIPT = """
+local data = redis.call('GET', KEYS[1])
+if not data then
+    return nil
+end
+local found = cjson.decode(data)[ARGV[1]]
+if found == nil or (ARGV[2] ~= '' and found ~= ARGV[2]) then
+    return nil
+end
+if ARGV[3] == '' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+end
+return data
+"""
+
+# SET with expiry, unless the key holds a JSON value whose field ARGV[1] is
+# not ARGV[2]
+_SET_IF_SCRIPT = """
+local data = redis.call('GET', KEYS[1])
+if data and cjson.decode(data)[ARGV[1]] ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+return 1
+"""
+
 
 class RedisService:
     """Centralized Redis operations for caching, counters, and session state."""
@@ -24,6 +55,54 @@ class RedisService:
         redis = get_redis()
         await redis.set(key, json.dumps(value, default=str), ex=ttl)
 
+    @staticmethod
+    async def take_cached_if(
+        key: str,
+        field: str,
+        value: str | None = None,
+        leave: dict | None = None,
+        ttl: int = 0,
+    ) -> dict | None:
+        """
+        Get and delete in one step, so only one caller ever receives it, and
+        only while the stored `field` equals `value` (or is set at all, when
+        value is None). `leave` takes the value's place for `ttl` seconds, so
+        a writer using set_cached_if cannot recreate it.
+        """
+        redis = get_redis()
+        data = await redis.eval(
+            _TAKE_IF_SCRIPT,
+            1,
+            key,
+            field,
+            value or "",
+            json.dumps(leave) if leave is not None else "",
+            ttl,
+        )
+        if data:
+            return json.loads(data)
+        return None
+
+    @staticmethod
+    async def set_cached_if(
+        key: str, value: dict, ttl: int, field: str, expected: str
+    ) -> bool:
+        """
+        set_cached, unless the key holds a value whose `field` is not
+        `expected`. False when the write was refused.
+        """
+        redis = get_redis()
+        written = await redis.eval(
+            _SET_IF_SCRIPT,
+            1,
+            key,
+            field,
+            expected,
+            json.dumps(value, default=str),
+            ttl,
+        )
+        return bool(written)
+
     @staticmethod
     async def invalidate(key: str) -> None:
         redis = get_redis()
@@ -0,0 +1,137 @@
+"""
+Response encodings for the exercise socket.
+
+JsonResponder sends every frame's full result as JSON text, as the socket
+always has. CompactResponder is used by clients that negotiate the
+fithub.compact.v1 subprotocol: every server message is a msgpack binary
+message, and frame results are deltas with short keys.
+
+    f   frame number, always sent
+    q   client sequence number, always sent when the client sent one
+    s r a fb d x m k i qd t
+        state, rep count, avg form score, feedback, dropped and expired
+        frames, model complexity, skipped and interpolated frames, queue
+        depths, stage timings: only when changed
+    c rs
+        completed_rep and rep_score: only on the frame that completes a rep
+    an  angles in tenths of a degree (int), changed entries only; None
+        marks an angle that is no longer available
+    l   landmarks, only for frames whose header carries FLAG_OVERLAY: uint16
+        little-endian bytes, rows in LANDMARK_NAMES order, columns x, y,
+        visibility scaled from [0, 1] to [0, 65535]; None when no pose
+
+Control and error messages are msgpack maps with the same keys as in JSON.
+"""
+
+import numpy as np
+
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+    msgpack = None
+
+from app.services.pose_engine import Landmarks
+
+# Result fields sent only when they change, by short key
+DELTA_FIELDS = {
+    "state": "s",
+    "rep_count": "r",
+    "avg_form_score": "a",
+    "feedback": "fb",
+    "dropped_frames": "d",
+    "expired_frames": "x",
+    "model_complexity": "m",
+    "skipped_frames": "k",
+    "interpolated_frames": "i",
+    "queue_depths": "qd",
+    "timings": "t",
+}
+
+_LANDMARK_COLUMNS = [Landmarks.X, Landmarks.Y, Landmarks.VISIBILITY]
+
+
+def quantize_landmarks(landmarks: Landmarks) -> bytes:
+    """x, y and visibility of every landmark as little-endian uint16."""
+    values = np.clip(landmarks.data[:, _LANDMARK_COLUMNS], 0.0, 1.0)
+    return np.round(values * 65535).astype("<u2").tobytes()
+
+
+def dequantize_landmarks(payload: bytes) -> np.ndarray:
+    """Inverse of quantize_landmarks: an (N, 3) float32 array of x, y, visibility."""
+    values = np.frombuffer(payload, dtype="<u2").reshape(-1, 3)
+    return values.astype(np.float32) / 65535
+
+
+class JsonResponder:
+    """Full JSON results, landmarks always included."""
+
+    async def send(self, websocket, message: dict) -> None:
+        await websocket.send_json(message)
+
+    async def send_frame(
+        self, websocket, response: dict, landmarks: Landmarks | None, overlay: bool
+    ) -> None:
+        response["landmarks"] = landmarks.to_dict() if landmarks else None
+        await websocket.send_json(response)
+
+
+class CompactResponder:
+    """Delta-encoded msgpack results; one instance per session."""
+
+    def __init__(self):
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack is not installed")
+        self._last: dict = {}
+        self._angles: dict = {}
+        self._had_landmarks = False
+
+    async def send(self, websocket, message: dict) -> None:
+        await websocket.send_bytes(msgpack.packb(message))
+
+    async def send_frame(
+        self, websocket, response: dict, landmarks: Landmarks | None, overlay: bool
+    ) -> None:
+        await websocket.send_bytes(self.encode_frame(response, landmarks, overlay))
+
+    def encode_frame(
+        self, response: dict, landmarks: Landmarks | None, overlay: bool
+    ) -> bytes:
+        message = {"f": response["frame_number"]}
+        if response.get("seq") is not None:
+            message["q"] = response["seq"]
+
+        for field, key in DELTA_FIELDS.items():
+            value = response.get(field)
+            if field not in self._last or self._last[field] != value:
+                message[key] = value
+                self._last[field] = value
+
+        if response.get("completed_rep"):
+            message["c"] = True
+            message["rs"] = response.get("rep_score")
+
+        angles = {
+            name: None if value is None else round(value * 10)
+            for name, value in response.get("angles", {}).items()
+        }
+        changed = {
+            name: value
+            for name, value in angles.items()
+            if name not in self._angles or self._angles[name] != value
+        }
+        changed.update({name: None for name in self._angles.keys() - angles.keys()})
+        if changed:
+            message["an"] = changed
+        self._angles = angles
+
+        if overlay:
+            if landmarks is not None:
+                message["l"] = quantize_landmarks(landmarks)
+            elif self._had_landmarks:
+                message["l"] = None
+            self._had_landmarks = landmarks is not None
+
+        return msgpack.packb(message)
@@ -0,0 +1,180 @@
+"""
+Session Checkpoint Service — keeps live exercise socket state in Redis so a
+session survives a dropped connection or a node restart.
+
+Each socket gets a session token on connect. Its tracker state, rep details
+and counters are written under that token at a bounded rate, and a client that
+reconnects with ?session=<token> (to any node) picks up the same set.
+
+A checkpoint has exactly one owner, the socket serving the set, and every
+write is an owner-checked compare-and-set. A resuming socket claims it by
+swapping in its own id, and the end-of-session finalizer by swapping in a
+short-lived tombstone, both atomically; a superseded socket that is still
+half-open can then neither overwrite the new owner nor recreate a finished
+set. So a set is either resumed or saved to MongoDB, never both:
+
+    client closes normally    the session is saved right away
+    connection drops          the checkpoint is kept; unless a socket resumes
+                              it within ws_resume_grace seconds, the node that
+                              lost the socket saves it as ended
+"""
+
+import asyncio
+import secrets
+import time
+
+import structlog
+
+from app.config import settings
+from app.models.exercise import ExerciseSessionCheckpoint
+from app.services.exercise_session_service import ExerciseSessionService
+from app.services.frame_timing import SessionTimings
+from app.services.redis_service import RedisService
+
+logger = structlog.get_logger()
+
+# Pending finalizers, kept referenced until they finish
+_tasks: set[asyncio.Task] = set()
+
+# Left in place of a finished checkpoint; it has no owner, so no write matches
+_FINISHED = {"finished": True}
+
+
+class SessionCheckpointService:
+    @staticmethod
+    def _key(token: str) -> str:
+        return f"exercise_session:{token}"
+
+    @staticmethod
+    def new_token() -> str:
+        return secrets.token_urlsafe(16)
+
+    @staticmethod
+    def _ttl() -> int:
+        # Outlives the grace period so the finalizer always finds it
+        return settings.ws_resume_grace * 2
+
+    @staticmethod
+    async def save(
+        checkpoint: ExerciseSessionCheckpoint, owner: str | None = None
+    ) -> bool:
+        """
+        Write a checkpoint while `owner` (by default the checkpoint's own)
+        still serves the session, or nobody does. False when refused.
+        """
+        return await RedisService.set_cached_if(
+            SessionCheckpointService._key(checkpoint.token),
+            checkpoint.model_dump(mode="json"),
+            ttl=SessionCheckpointService._ttl(),
+            field="owner",
+            expected=owner or checkpoint.owner,
+        )
+
+    @staticmethod
+    async def claim(token: str, owner: str) -> ExerciseSessionCheckpoint | None:
+        """
+        Take over a checkpoint for the resuming socket `owner`; None if it is
+        gone, finished or being resumed. Only `owner` may write it afterwards.
+        """
+        data = await RedisService.take_cached_if(
+            SessionCheckpointService._key(token),
+            "token",
+            leave={"owner": owner},
+            ttl=SessionCheckpointService._ttl(),
+        )
+        if not data:
+            return None
+        return ExerciseSessionCheckpoint(**data)
+
+    @staticmethod
+    async def claim_owned(token: str, owner: str) -> ExerciseSessionCheckpoint | None:
+        """
+        Take a checkpoint to finish it, but only while `owner` still serves
+        the session; a tombstone stays behind so it cannot be written again.
+        """
+        data = await RedisService.take_cached_if(
+            SessionCheckpointService._key(token),
+            "owner",
+            owner,
+            leave=_FINISHED,
+            ttl=SessionCheckpointService._ttl(),
+        )
+        if not data:
+            return None
+        return ExerciseSessionCheckpoint(**data)
+
+    @staticmethod
+    async def owned_by(token: str, owner: str) -> bool:
+        """
+        Whether `owner` still serves the session: False once another socket
+        has resumed it or it was finished. A checkpoint that expired is nobody
+        else's either.
+        """
+        data = await RedisService.get_cached(SessionCheckpointService._key(token))
+        return not data or data.get("owner") == owner
+
+    @staticmethod
+    async def finish(checkpoint: ExerciseSessionCheckpoint) -> None:
+        """Save a claimed checkpoint's exercise blocks as ended sessions."""
+        if checkpoint.member_id == "anonymous":
+            return
+        timings = SessionTimings()
+        timings.restore(checkpoint.timings)
+        await ExerciseSessionService.save_segments(
+            checkpoint.member_id,
+            checkpoint.all_segments(),
+            performance=timings.summary(
+                checkpoint.frame_count,
+                checkpoint.duration_seconds,
+                checkpoint.dropped_frames,
+                checkpoint.expired_frames,
+            ),
+        )
+
+    @staticmethod
+    async def finish_after(token: str, owner: str, delay: float) -> None:
+        """
+        Save the session as ended unless a socket resumes it within `delay`.
+        A resumed session belongs to its new socket, so only the checkpoint
+        `owner` (the dropped socket) left is taken.
+        """
+        await asyncio.sleep(delay)
+        try:
+            checkpoint = await SessionCheckpointService.claim_owned(token, owner)
+            if checkpoint:
+                logger.info(
+                    "exercise_session_not_resumed", exercise=checkpoint.exercise
+                )
+                await SessionCheckpointService.finish(checkpoint)
+        except Exception as e:
+            logger.error("session_finalize_failed", error=str(e))
+
+    @staticmethod
+    def schedule_finish(token: str, owner: str) -> None:
+        task = asyncio.create_task(
+            SessionCheckpointService.finish_after(
+                token, owner, settings.ws_resume_grace
+            )
+        )
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+
+class SessionCheckpointer:
+    """Writes one socket's checkpoints, at most once per `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.writes = 0
+        self._next = 0.0
+
+    def due(self) -> bool:
+        return time.monotonic() >= self._next
+
+    async def save(self, checkpoint: ExerciseSessionCheckpoint) -> bool:
+        """Write a checkpoint; False once another socket owns the session."""
+        self._next = time.monotonic() + self.interval
+        saved = await SessionCheckpointService.save(checkpoint)
+        if saved:
+            self.writes += 1
+        return saved
@@ -0,0 +1,367 @@
+"""
+Video Analysis Service — offline rep counting for uploaded exercise videos.
+
+An upload is saved to a temp file and analysed by a background task. The
+video is split into contiguous chunks, one per leased pose engine; each chunk
+is decoded on its own thread and runs through its engine in order, so
+tracking sees consecutive frames while inference uses several cores at once.
+Video jobs share a node-wide cap on leased engines and queue for it, leaving
+the rest of the pool to live sockets. The stacked landmarks then go through
+the batch angle kernel and the same trackers as the live socket. Job progress
+lives in Redis, so any API node can answer a poll.
+"""
+
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+import uuid
+from collections.abc import Iterator
+from datetime import datetime
+
+import numpy as np
+import structlog
+
+try:
+    import cv2
+
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    cv2 = None
+
+from app.config import settings
+from app.models.exercise import VideoAnalysisJob, VideoAnalysisStatus
+from app.services.exercise_session_service import ExerciseSessionService
+from app.services.exercise_tracker import create_tracker
+from app.services.pose_engine import ANGLE_PLANS, LANDMARK_NAMES
+from app.services.pose_executor import PoseExecutor, PoseLease, get_pose_executor
+from app.services.redis_service import RedisService
+
+logger = structlog.get_logger()
+
+# Progress is written to Redis every this many frames
+PROGRESS_EVERY = 30
+
+# Background jobs, referenced so they are not garbage collected mid-run
+_tasks: set[asyncio.Task] = set()
+
+# Engines leased by all video jobs on this node (video_analysis_max_engines)
+_engine_slots: asyncio.Semaphore | None = None
+
+
+def _video_engine_slots() -> asyncio.Semaphore:
+    global _engine_slots
+    if _engine_slots is None:
+        _engine_slots = asyncio.Semaphore(settings.video_analysis_max_engines)
+    return _engine_slots
+
+
+def iter_video_frames(
+    path: str,
+    target_width: int,
+    target_height: int,
+    start: int = 0,
+    stop: int | None = None,
+) -> Iterator:
+    """
+    Yield RGB frames [start, stop), downscaled (never below the target size)
+    the same way FrameDecoder treats live frames. Blocking — iterate it from
+    a thread.
+    """
+    capture = cv2.VideoCapture(path)
+    try:
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for _ in itertools.count(start) if stop is None else range(start, stop):
+            ok, bgr = capture.read()
+            if not ok:
+                break
+            height, width = bgr.shape[:2]
+            scale = max(target_width / width, target_height / height)
+            if scale < 1:
+                bgr = cv2.resize(
+                    bgr,
+                    (round(width * scale), round(height * scale)),
+                    interpolation=cv2.INTER_AREA,
+                )
+            yield cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    finally:
+        capture.release()
+
+
+def probe_video(path: str) -> tuple[int | None, float | None]:
+    """Frame count and frame rate from the container, when it reports them."""
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError("Unreadable video file")
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        fps = capture.get(cv2.CAP_PROP_FPS) or None
+        return frames, fps
+    finally:
+        capture.release()
+
+
+# Copy size for uploads; an oversized one is abandoned within a chunk
+_UPLOAD_CHUNK = 1024 * 1024
+
+
+def _save_upload(source, suffix: str, max_bytes: int) -> str:
+    """
+    Copy the spooled upload to a temp file we own, stopping as soon as it
+    passes the size limit.
+    """
+    fd, path = tempfile.mkstemp(prefix="fithub-video-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as target:
+            size = 0
+            while chunk := source.read(_UPLOAD_CHUNK):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(
+                        f"Video exceeds {max_bytes // (1024 * 1024)} MB limit"
+                    )
+                target.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+class VideoAnalysisService:
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"video_job:{job_id}"
+
+    @staticmethod
+    async def _save(job: VideoAnalysisJob) -> None:
+        await RedisService.set_cached(
+            VideoAnalysisService._key(job.job_id),
+            job.model_dump(mode="json"),
+            ttl=settings.video_job_ttl,
+        )
+
+    @staticmethod
+    async def create_job(upload, exercise: str, member_id: str) -> VideoAnalysisJob:
+        """Store the upload and start analysing it in the background."""
+        create_tracker(exercise)  # raises ValueError for unknown exercises
+
+        suffix = os.path.splitext(upload.filename or "")[1] or ".mp4"
+        path = await asyncio.to_thread(
+            _save_upload,
+            upload.file,
+            suffix,
+            settings.video_max_upload_mb * 1024 * 1024,
+        )
+
+        job = VideoAnalysisJob(
+            job_id=uuid.uuid4().hex,
+            status=VideoAnalysisStatus.QUEUED,
+            exercise=exercise,
+            member_id=member_id,
+            created_at=datetime.utcnow(),
+        )
+        await VideoAnalysisService._save(job)
+
+        task = asyncio.create_task(VideoAnalysisService.run_job(job, path))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+        logger.info("video_analysis_queued", job_id=job.job_id, exercise=exercise)
+        return job
+
+    @staticmethod
+    async def get_job(job_id: str) -> VideoAnalysisJob | None:
+        data = await RedisService.get_cached(VideoAnalysisService._key(job_id))
+        if not data:
+            return None
+        return VideoAnalysisJob(**data)
+
+    @staticmethod
+    async def run_job(job: VideoAnalysisJob, path: str) -> None:
+        try:
+            await VideoAnalysisService._analyze(job, path)
+        except Exception as e:
+            job.status = VideoAnalysisStatus.FAILED
+            job.error = str(e)
+            logger.error("video_analysis_failed", job_id=job.job_id, error=str(e))
+        finally:
+            await VideoAnalysisService._save(job)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    async def _analyze(job: VideoAnalysisJob, path: str) -> None:
+        executor = get_pose_executor()
+        if executor is None:
+            raise RuntimeError("Pose engine is not available")
+        if not CV2_AVAILABLE:
+            raise RuntimeError("opencv is not installed")
+
+        job.total_frames, video_fps = await asyncio.to_thread(probe_video, path)
+        # Chunks need a frame count; without one the video runs as one lane
+        lanes = settings.video_analysis_parallelism if job.total_frames else 1
+
+        # Wait for the first engine under the video cap, then take more only
+        # while they are free; carry on with fewer if the pool is busy
+        slots = _video_engine_slots()
+        await slots.acquire()
+        held = 1
+        leases: list[PoseLease] = []
+        try:
+            while held < lanes and not slots.locked():
+                await slots.acquire()
+                held += 1
+            for _ in range(held):
+                try:
+                    leases.append(
+                        await executor.checkout(
+                            timeout=settings.pose_pool_checkout_timeout
+                        )
+                    )
+                except asyncio.TimeoutError:
+                    if leases:
+                        break
+                    raise RuntimeError("No pose engine free for video analysis")
+
+            job.status = VideoAnalysisStatus.PROCESSING
+            await VideoAnalysisService._save(job)
+            started = time.monotonic()
+            landmarks = await VideoAnalysisService._pose_stage(
+                executor, leases, path, job
+            )
+            elapsed = max(time.monotonic() - started, 1e-6)
+            cores = len({lease.worker.worker_id for lease in leases})
+        finally:
+            for lease in leases:
+                executor.release(lease)
+            for _ in range(held):
+                slots.release()
+
+        job.fps = round(len(landmarks) / elapsed, 1)
+        job.fps_per_core = round(job.fps / cores, 1)
+        duration = len(landmarks) / video_fps if video_fps else elapsed
+        await VideoAnalysisService._count_reps(job, landmarks, int(duration))
+
+        job.status = VideoAnalysisStatus.COMPLETED
+        job.progress = 1.0
+        logger.info(
+            "video_analysis_completed",
+            job_id=job.job_id,
+            frames=len(landmarks),
+            reps=job.total_reps,
+            fps=job.fps,
+            fps_per_core=job.fps_per_core,
+        )
+
+    @staticmethod
+    async def _pose_stage(
+        executor: PoseExecutor,
+        leases: list[PoseLease],
+        path: str,
+        job: VideoAnalysisJob,
+    ) -> np.ndarray:
+        """
+        Run the video through the leased engines, one contiguous chunk per
+        lease, so each engine tracks consecutive frames. Within a chunk the
+        next frame decodes while the current one is inferred.
+        Returns an (N, 13, 4) landmark stack; undetected frames have zero visibility.
+        """
+        if job.total_frames:
+            size = -(-job.total_frames // len(leases))
+            # The last chunk reads to the end, in case the count was short
+            chunks = [
+                (i * size, (i + 1) * size if i < len(leases) - 1 else None)
+                for i in range(len(leases))
+            ]
+        else:
+            chunks = [(0, None)]
+        done = 0
+
+        async def lane(lease: PoseLease, start: int, stop: int | None) -> list:
+            frames = iter_video_frames(
+                path,
+                settings.frame_target_width,
+                settings.frame_target_height,
+                start,
+                stop,
+            )
+            rows: list[np.ndarray | None] = []
+            pending: asyncio.Task | None = None
+
+            async def collect(task: asyncio.Task) -> None:
+                nonlocal done
+                try:
+                    landmarks, _, _ = await task
+                except Exception:
+                    landmarks = None
+                rows.append(landmarks.data if landmarks is not None else None)
+                done += 1
+                if done % PROGRESS_EVERY == 0:
+                    job.frames_processed = done
+                    if job.total_frames:
+                        job.progress = round(min(done / job.total_frames, 0.99), 3)
+                    await VideoAnalysisService._save(job)
+
+            while (frame := await asyncio.to_thread(next, frames, None)) is not None:
+                if pending is not None:
+                    await collect(pending)
+                pending = asyncio.create_task(
+                    executor.infer(lease, frame, job.exercise)
+                )
+            if pending is not None:
+                await collect(pending)
+            return rows
+
+        chunk_rows = await asyncio.gather(
+            *(lane(lease, *chunk) for lease, chunk in zip(leases, chunks))
+        )
+        rows = [data for chunk in chunk_rows for data in chunk]
+
+        stack = np.zeros((len(rows), len(LANDMARK_NAMES), 4), dtype=np.float32)
+        for i, data in enumerate(rows):
+            if data is not None:
+                stack[i] = data
+        job.frames_processed = len(rows)
+        return stack
+
+    @staticmethod
+    async def _count_reps(
+        job: VideoAnalysisJob, landmarks: np.ndarray, duration_seconds: int
+    ) -> None:
+        """Feed the primary angle series to the tracker and persist the session."""
+        primary = ANGLE_PLANS[job.exercise].compute_series(landmarks)["primary"]
+        tracker = create_tracker(job.exercise)
+        rep_details: list[dict] = []
+        for angle in primary.tolist():
+            result = tracker.update(None if np.isnan(angle) else round(angle, 1))
+            if result["completed_rep"]:
+                rep_details.append(
+                    {
+                        "rep_number": result["rep_count"],
+                        "score": result["rep_score"],
+                        "feedback": result["feedback"],
+                    }
+                )
+
+        job.total_reps = tracker.rep_count
+        job.avg_form_score = (
+            round(sum(tracker.form_scores) / len(tracker.form_scores), 1)
+            if tracker.form_scores
+            else None
+        )
+        if tracker.rep_count > 0:
+            session = await ExerciseSessionService.save_session(
+                member_id=job.member_id,
+                exercise=job.exercise,
+                total_reps=tracker.rep_count,
+                avg_form_score=job.avg_form_score,
+                rep_details=rep_details,
+                duration_seconds=duration_seconds,
+                started_at=job.created_at,
+            )
+            job.session_id = session.id
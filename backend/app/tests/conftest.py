@@ -1,8 +1,10 @@
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 from httpx import AsyncClient, ASGITransport
 
 from app.main import app
+from app.services.redis_service import _SET_IF_SCRIPT
 
 
 @pytest.fixture
@@ -43,6 +45,7 @@ def mock_redis():
     """Mock Redis client."""
     redis = AsyncMock()
     redis.get = AsyncMock(return_value=None)
+    redis.getdel = AsyncMock(return_value=None)
     redis.set = AsyncMock()
     redis.delete = AsyncMock()
     redis.incr = AsyncMock(return_value=1)
@@ -52,6 +55,47 @@ def mock_redis():
     return redis
 
 
+class FakeRedis:
+    """The string commands used for session state, on a dict."""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def eval(self, script, numkeys, key, field, expected, value, ttl):
+        """The compare-and-swap scripts of RedisService, on the dict."""
+        data = self.data.get(key)
+        found = json.loads(data).get(field) if data else None
+        if script == _SET_IF_SCRIPT:
+            if data is not None and found != expected:
+                return 0
+            self.data[key] = value
+            return 1
+        if found is None or (expected and found != expected):
+            return None
+        if value:
+            self.data[key] = value
+        else:
+            del self.data[key]
+        return data
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def fake_redis():
+    """In-memory Redis behind RedisService."""
+    redis = FakeRedis()
+    with patch("app.services.redis_service.get_redis", return_value=redis):
+        yield redis
+
+
 @pytest.fixture
 def mock_kafka():
     """Mock Kafka producer."""
@@ -82,6 +126,8 @@ async def client(mock_db, mock_redis, mock_kafka):
         patch("app.main.close_redis", new_callable=AsyncMock),
         patch("app.main.start_producer", new_callable=AsyncMock),
         patch("app.main.stop_producer", new_callable=AsyncMock),
+        patch("app.main.start_pose_executor", new_callable=AsyncMock),
+        patch("app.main.stop_pose_executor", new_callable=AsyncMock),
         # Patch health check imports
         patch("app.db.mongodb.get_database", return_value=mock_db),
         patch("app.db.redis.get_redis", return_value=mock_redis),
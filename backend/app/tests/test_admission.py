@@ -0,0 +1,70 @@
+"""Tests for exercise socket admission control."""
+
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController
+
+
+class TestAdmissionController:
+    @pytest.mark.asyncio
+    async def test_admits_up_to_the_limit(self):
+        admission = AdmissionController(max_sessions=2, queue_size=0, queue_timeout=1)
+        assert await admission.admit()
+        assert await admission.admit()
+        assert admission.full
+        assert not await admission.admit()
+        assert admission.stats["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_limit(self):
+        admission = AdmissionController(max_sessions=0, queue_size=0, queue_timeout=1)
+        for _ in range(100):
+            assert await admission.admit()
+        assert not admission.full
+
+    @pytest.mark.asyncio
+    async def test_released_slot_goes_to_longest_waiter(self):
+        admission = AdmissionController(max_sessions=1, queue_size=2, queue_timeout=1)
+        await admission.admit()
+        first = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        assert admission.waiting == 2
+
+        admission.release()
+        assert await first
+        assert not second.done()
+        assert admission.live == 1
+
+        admission.release()
+        assert await second
+        admission.release()
+        assert admission.live == 0
+
+    @pytest.mark.asyncio
+    async def test_newcomer_does_not_jump_the_queue(self):
+        admission = AdmissionController(max_sessions=1, queue_size=1, queue_timeout=1)
+        await admission.admit()
+        waiter = asyncio.create_task(admission.admit())
+        await asyncio.sleep(0)
+        # Queue full: the newcomer is turned away rather than racing the waiter
+        assert not await admission.admit()
+        admission.release()
+        assert await waiter
+
+    @pytest.mark.asyncio
+    async def test_wait_times_out(self):
+        admission = AdmissionController(
+            max_sessions=1, queue_size=1, queue_timeout=0.01
+        )
+        await admission.admit()
+        assert not await admission.admit()
+        assert admission.waiting == 0
+        assert admission.stats["queued"] == 1
+        assert admission.stats["rejected"] == 1
+        # The timed-out waiter no longer holds a place in line
+        admission.release()
+        assert admission.live == 0
@@ -0,0 +1,55 @@
+"""Tests for server-driven capture profile negotiation."""
+
+from app.services.capture_control import (
+    CAPTURE_HOLD_FRAMES,
+    CAPTURE_PROFILES,
+    CaptureController,
+)
+
+
+def feed(controller: CaptureController, latency_ms: float, load: float, frames: int):
+    messages = [controller.update(latency_ms, load) for _ in range(frames)]
+    return [m for m in messages if m]
+
+
+class TestCaptureController:
+    def test_initial_message(self):
+        controller = CaptureController(100, initial_level=1)
+        assert controller.message() == {"type": "capture", **CAPTURE_PROFILES[1]}
+
+    def test_initial_level_clamped(self):
+        assert (
+            CaptureController(100, initial_level=99).level == len(CAPTURE_PROFILES) - 1
+        )
+
+    def test_steps_down_when_slow(self):
+        controller = CaptureController(100)
+        messages = feed(controller, 150, 0.2, CAPTURE_HOLD_FRAMES)
+        assert messages == [{"type": "capture", **CAPTURE_PROFILES[2]}]
+
+    def test_steps_down_when_node_loaded(self):
+        controller = CaptureController(100)
+        assert feed(controller, 20, 1.5, CAPTURE_HOLD_FRAMES)
+        assert controller.level == 2
+
+    def test_holds_before_changing(self):
+        controller = CaptureController(100)
+        assert feed(controller, 150, 0.2, CAPTURE_HOLD_FRAMES - 1) == []
+
+    def test_steps_up_with_headroom(self):
+        controller = CaptureController(100, initial_level=3)
+        feed(controller, 20, 0.1, CAPTURE_HOLD_FRAMES)
+        assert controller.level == 2
+
+    def test_no_step_up_while_node_busy(self):
+        controller = CaptureController(100, initial_level=3)
+        feed(controller, 20, 0.9, CAPTURE_HOLD_FRAMES * 2)
+        assert controller.level == 3
+
+    def test_stays_within_ladder(self):
+        controller = CaptureController(100, initial_level=0)
+        feed(controller, 1, 0.0, CAPTURE_HOLD_FRAMES * 3)
+        assert controller.level == 0
+        feed(controller, 500, 2.0, CAPTURE_HOLD_FRAMES * 10)
+        assert controller.level == len(CAPTURE_PROFILES) - 1
+        assert controller.changes == len(CAPTURE_PROFILES) - 1
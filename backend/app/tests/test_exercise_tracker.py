@@ -1,5 +1,7 @@
 """Tests for the exercise tracker state machine."""
 
+import json
+
 import pytest
 
 from app.services.exercise_tracker import (
@@ -117,6 +119,26 @@ class TestSquatTracker:
         fb = tracker.generate_feedback(96, ExerciseState.DOWN)
         assert any("deeper" in f for f in fb)
 
+    def test_timestamps_scale_direction_checks(self):
+        # 4° in 0.1 s is moving down; 4° over 0.5 s (frames lost) is not
+        tracker = SquatTracker()
+        tracker.update(170, timestamp=10.0)
+        tracker.update(166, timestamp=10.1)
+        assert tracker.state == ExerciseState.GOING_DOWN
+
+        tracker = SquatTracker()
+        tracker.update(170, timestamp=10.0)
+        tracker.update(166, timestamp=10.5)
+        assert tracker.state == ExerciseState.IDLE
+        tracker.update(150, timestamp=11.0)
+        assert tracker.state == ExerciseState.GOING_DOWN
+
+    def test_faster_frames_keep_per_frame_threshold(self):
+        tracker = SquatTracker()
+        tracker.update(170, timestamp=10.0)
+        tracker.update(169, timestamp=10.03)
+        assert tracker.state == ExerciseState.IDLE
+
     def test_direction_change_resets(self):
         """If user changes direction before reaching bottom, state resets."""
         tracker = SquatTracker()
@@ -262,3 +284,63 @@ class TestBuildResult:
         tracker = SquatTracker()
         result = tracker._build_result()
         assert result["avg_form_score"] is None
+
+
+class TestNearKeyMoment:
+    def test_no_angle_yet(self):
+        assert not SquatTracker().near_key_moment(15)
+
+    def test_mid_range_is_not_key(self):
+        tracker = SquatTracker()
+        tracker.update(125)
+        assert not tracker.near_key_moment(15)
+
+    def test_near_thresholds(self):
+        tracker = SquatTracker()
+        tracker.update(100)
+        assert tracker.near_key_moment(15)
+        tracker.update(150)
+        assert tracker.near_key_moment(15)
+
+    def test_bottom_and_top_of_rep(self):
+        tracker = SquatTracker()
+        for angle in [170, 150, 120, 85]:
+            tracker.update(angle)
+        assert tracker.state == ExerciseState.DOWN
+        assert tracker.near_key_moment(0)
+        for angle in [100, 130, 165]:
+            tracker.update(angle)
+        assert tracker.state == ExerciseState.UP
+        assert tracker.near_key_moment(0)
+
+
+class TestSnapshot:
+    SQUAT_REP = [170, 165, 140, 110, 85, 88, 120, 150, 162, 165]
+
+    def test_restore_continues_the_set(self):
+        tracker = SquatTracker()
+        for angle in self.SQUAT_REP + [170, 165, 140]:
+            tracker.update(angle)
+
+        resumed = SquatTracker()
+        resumed.restore(tracker.snapshot())
+        assert resumed.rep_count == 1
+        assert resumed.state == tracker.state
+        assert resumed.form_scores == tracker.form_scores
+
+        for angle in [110, 85, 88, 120, 150, 162, 165]:
+            result = resumed.update(angle)
+        assert result["completed_rep"] is True
+        assert resumed.rep_count == 2
+
+    def test_snapshot_is_json_ready(self):
+        tracker = BicepCurlTracker()
+        tracker.update(150)
+        snapshot = json.loads(json.dumps(tracker.snapshot()))
+        restored = BicepCurlTracker()
+        restored.restore(snapshot)
+        assert restored.snapshot() == tracker.snapshot()
+
+    def test_other_exercise_rejected(self):
+        with pytest.raises(ValueError, match="squat"):
+            ShoulderPressTracker().restore(SquatTracker().snapshot())
@@ -0,0 +1,55 @@
+"""Tests for JPEG frame decoding with DCT-domain downscaling."""
+
+import base64
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.frame_decoder import SIMPLEJPEG_AVAILABLE, FrameDecoder
+
+
+def make_jpeg(width: int, height: int, color=(200, 40, 40)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+class TestFrameDecoder:
+    def test_downscales_to_target(self):
+        decoder = FrameDecoder(320, 240)
+        frame = decoder.decode(make_jpeg(640, 480))
+        assert frame.shape == (240, 320, 3)
+        assert frame.dtype == np.uint8
+        # Solid colour survives the scaled decode
+        assert abs(int(frame[..., 0].mean()) - 200) < 5
+
+    def test_never_smaller_than_target(self):
+        decoder = FrameDecoder(320, 240)
+        frame = decoder.decode(make_jpeg(1280, 720))
+        assert frame.shape[0] >= 240
+        assert frame.shape[1] >= 320
+        assert frame.shape[1] < 1280
+
+    def test_small_frame_kept_as_is(self):
+        decoder = FrameDecoder(320, 240)
+        assert decoder.decode(make_jpeg(160, 120)).shape == (120, 160, 3)
+
+    def test_decode_b64(self):
+        decoder = FrameDecoder(320, 240)
+        frame_b64 = base64.b64encode(make_jpeg(640, 480)).decode()
+        assert decoder.decode_b64(frame_b64).shape == (240, 320, 3)
+
+    def test_pillow_fallback_handles_non_jpeg(self):
+        buf = io.BytesIO()
+        Image.new("L", (64, 48), 128).save(buf, "PNG")
+        frame = FrameDecoder(320, 240).decode(buf.getvalue())
+        assert frame.shape == (48, 64, 3)
+
+    @pytest.mark.skipif(not SIMPLEJPEG_AVAILABLE, reason="simplejpeg not installed")
+    def test_reuses_session_buffer(self):
+        decoder = FrameDecoder(320, 240)
+        first = decoder.decode(make_jpeg(640, 480))
+        second = decoder.decode(make_jpeg(640, 480, color=(10, 10, 10)))
+        assert np.shares_memory(first, second)
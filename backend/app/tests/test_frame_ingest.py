@@ -0,0 +1,165 @@
+"""Tests for the exercise socket frame mailbox."""
+
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from app.services.frame_ingest import (
+    FrameMailbox,
+    ResponseOutbox,
+    queue_stats,
+    send_from,
+)
+
+
+class TestFrameMailbox:
+    @pytest.mark.asyncio
+    async def test_latest_only_drops_stale_frames(self):
+        mailbox = FrameMailbox(latest_only=True)
+        for i in range(5):
+            mailbox.put(i)
+        assert await mailbox.get() == 4
+        assert mailbox.dropped == 4
+        assert mailbox.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_latest_only_keeps_control_messages(self):
+        mailbox = FrameMailbox(latest_only=True)
+        mailbox.put("frame 1")
+        mailbox.put("switch", droppable=False)
+        mailbox.put("frame 2")
+        mailbox.put("frame 3")
+        assert [await mailbox.get() for _ in range(2)] == ["switch", "frame 3"]
+        assert mailbox.dropped == 2
+
+    @pytest.mark.asyncio
+    async def test_control_message_does_not_replace_frame(self):
+        mailbox = FrameMailbox(latest_only=True)
+        mailbox.put("frame")
+        mailbox.put("switch", droppable=False)
+        assert [await mailbox.get() for _ in range(2)] == ["frame", "switch"]
+        assert mailbox.dropped == 0
+        assert mailbox.received_at is not None
+
+    @pytest.mark.asyncio
+    async def test_ordered_keeps_every_frame(self):
+        mailbox = FrameMailbox(latest_only=False)
+        for i in range(3):
+            mailbox.put(i)
+        assert [await mailbox.get() for _ in range(3)] == [0, 1, 2]
+        assert mailbox.dropped == 0
+
+    @pytest.mark.asyncio
+    async def test_get_waits_for_put(self):
+        mailbox = FrameMailbox()
+        getter = asyncio.create_task(mailbox.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        mailbox.put("frame")
+        assert await getter == "frame"
+
+    @pytest.mark.asyncio
+    async def test_close_drains_then_disconnects(self):
+        mailbox = FrameMailbox(latest_only=False)
+        mailbox.put("last")
+        mailbox.close()
+        assert await mailbox.get() == "last"
+        with pytest.raises(WebSocketDisconnect):
+            await mailbox.get()
+
+    @pytest.mark.asyncio
+    async def test_ordered_full_mailbox_holds_receiver(self):
+        mailbox = FrameMailbox(latest_only=False, maxsize=2)
+        mailbox.put(0)
+        mailbox.put(1)
+        waiter = asyncio.create_task(mailbox.wait_for_space())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        assert mailbox.waits == 1
+
+        assert await mailbox.get() == 0
+        await asyncio.wait_for(waiter, timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_latest_mailbox_never_waits(self):
+        mailbox = FrameMailbox(latest_only=True, maxsize=8)
+        mailbox.put(0)
+        await asyncio.wait_for(mailbox.wait_for_space(), timeout=1)
+        assert mailbox.waits == 0
+
+    @pytest.mark.asyncio
+    async def test_close_frees_waiting_receiver(self):
+        mailbox = FrameMailbox(latest_only=False, maxsize=1)
+        mailbox.put(0)
+        waiter = asyncio.create_task(mailbox.wait_for_space())
+        await asyncio.sleep(0)
+        mailbox.close()
+        await asyncio.wait_for(waiter, timeout=1)
+
+
+class TestResponseOutbox:
+    @pytest.mark.asyncio
+    async def test_sends_in_order(self):
+        outbox = ResponseOutbox(maxsize=4)
+        sent = []
+
+        async def send(i):
+            sent.append(i)
+
+        for i in range(3):
+            await outbox.put(lambda i=i: send(i))
+        sender = asyncio.create_task(send_from(outbox))
+        while outbox.pending:
+            await asyncio.sleep(0)
+        sender.cancel()
+        assert sent == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_full_outbox_holds_processing(self):
+        outbox = ResponseOutbox(maxsize=1)
+        release = asyncio.Event()
+
+        async def slow_send():
+            await release.wait()
+
+        sender = asyncio.create_task(send_from(outbox))
+        await outbox.put(slow_send)  # taken by the sender, blocks on release
+        await asyncio.sleep(0)
+        await outbox.put(slow_send)  # fills the queue
+        putter = asyncio.create_task(outbox.put(slow_send))
+        await asyncio.sleep(0)
+        assert not putter.done()
+        assert outbox.waits == 1
+
+        release.set()
+        await asyncio.wait_for(putter, timeout=1)
+        sender.cancel()
+
+    @pytest.mark.asyncio
+    async def test_failed_send_disconnects(self):
+        outbox = ResponseOutbox(maxsize=4)
+
+        async def broken_send():
+            raise RuntimeError("socket closed")
+
+        await outbox.put(broken_send)
+        await send_from(outbox)
+        with pytest.raises(WebSocketDisconnect):
+            await outbox.put(broken_send)
+
+
+class TestQueueStats:
+    @pytest.mark.asyncio
+    async def test_reports_live_queues(self):
+        before = queue_stats()
+        mailbox = FrameMailbox(latest_only=False, maxsize=4)
+        outbox = ResponseOutbox(maxsize=4)
+        mailbox.put("frame")
+        await outbox.put(lambda: None)
+
+        stats = queue_stats()
+        assert stats["sockets"] == before["sockets"] + 1
+        assert stats["receive"]["pending"] == before["receive"]["pending"] + 1
+        assert stats["send"]["pending"] == before["send"]["pending"] + 1
+        assert stats["send"]["max_pending"] >= 1
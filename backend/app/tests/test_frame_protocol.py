@@ -0,0 +1,213 @@
+"""Tests for the exercise socket frame wire formats."""
+
+import base64
+import json
+import math
+
+import numpy as np
+import pytest
+
+from app.services.frame_protocol import (
+    FLAG_LANDMARKS,
+    FLAG_OVERLAY,
+    FRAME_HEADER,
+    SUBPROTOCOL_BINARY,
+    SUBPROTOCOL_COMPACT,
+    SUBPROTOCOL_JSON,
+    ControlMessage,
+    FrameProtocolError,
+    encode_binary,
+    encode_landmarks,
+    is_control,
+    negotiate,
+    parse_binary,
+    parse_json,
+    parse_landmarks,
+)
+from app.services.pose_engine import LANDMARK_NAMES, LANDMARKS, Landmarks
+
+
+def blazepose_rows() -> np.ndarray:
+    """33 BlazePose rows whose x encodes the BlazePose index."""
+    rows = np.zeros((33, 4), dtype=np.float32)
+    rows[:, 0] = np.arange(33) / 33
+    rows[:, 1] = 0.5
+    rows[:, 3] = 0.9
+    return rows
+
+
+class TestNegotiate:
+    def test_prefers_binary(self):
+        assert negotiate([SUBPROTOCOL_JSON, SUBPROTOCOL_BINARY]) == SUBPROTOCOL_BINARY
+
+    def test_prefers_compact(self):
+        offered = [SUBPROTOCOL_COMPACT, SUBPROTOCOL_BINARY, SUBPROTOCOL_JSON]
+        assert negotiate(offered) == SUBPROTOCOL_COMPACT
+
+    def test_compact_unavailable(self):
+        offered = [SUBPROTOCOL_COMPACT, SUBPROTOCOL_BINARY]
+        assert negotiate(offered, compact=False) == SUBPROTOCOL_BINARY
+
+    def test_json_only(self):
+        assert negotiate([SUBPROTOCOL_JSON]) == SUBPROTOCOL_JSON
+
+    def test_none_requested(self):
+        assert negotiate([]) is None
+        assert negotiate(["chat"]) is None
+
+
+class TestBinaryFrames:
+    def test_header_is_16_bytes(self):
+        assert FRAME_HEADER.size == 16
+
+    def test_round_trip(self):
+        packet = parse_binary(encode_binary(b"\xff\xd8jpeg", 7, 1234.5, FLAG_OVERLAY))
+        assert bytes(packet.jpeg) == b"\xff\xd8jpeg"
+        assert (packet.seq, packet.client_ts, packet.flags) == (7, 1234.5, 1)
+        assert not packet.client_landmarks
+
+    def test_header_only_rejected(self):
+        with pytest.raises(FrameProtocolError):
+            parse_binary(encode_binary(b""))
+
+
+class TestJsonFrames:
+    def test_decodes_base64(self):
+        message = json.dumps({"frame": base64.b64encode(b"jpeg").decode()})
+        packet = parse_json(message)
+        assert not packet.client_landmarks
+        packet.decode_frame()
+        assert packet.jpeg == b"jpeg"
+        assert packet.seq is None
+
+    def test_invalid_base64_found_on_decode(self):
+        packet = parse_json('{"frame": "abc"}')
+        with pytest.raises(FrameProtocolError, match="Invalid base64 frame"):
+            packet.decode_frame()
+
+    @pytest.mark.parametrize(
+        "message,error",
+        [
+            ("not json", "Invalid JSON"),
+            ('{"hello": "world"}', "Missing 'frame' field"),
+            ("[1, 2]", "Missing 'frame' field"),
+            ('{"frame": 123}', "Invalid base64 frame"),
+            ('{"frame": ["a"]}', "Invalid base64 frame"),
+            ('{"frame": {"a": 1}}', "Invalid base64 frame"),
+            (b"\xff\xd8jpeg", "subprotocol"),
+        ],
+    )
+    def test_errors(self, message, error):
+        with pytest.raises(FrameProtocolError, match=error):
+            parse_json(message)
+
+
+class TestClientLandmarks:
+    def test_blazepose_rows_reduced_to_tracked(self):
+        landmarks = parse_landmarks(blazepose_rows())
+        assert isinstance(landmarks, Landmarks)
+        assert landmarks.data.shape == (len(LANDMARK_NAMES), 4)
+        for name in LANDMARK_NAMES:
+            assert landmarks[name][0] == pytest.approx(LANDMARKS[name] / 33)
+
+    def test_tracked_rows_kept(self):
+        rows = blazepose_rows()[: len(LANDMARK_NAMES)]
+        np.testing.assert_array_equal(parse_landmarks(rows).data, rows)
+
+    @pytest.mark.parametrize(
+        "rows,error",
+        [
+            ("nope", "rows of 4"),
+            ([[0.5, 0.5, 0.0]] * 13, "rows of 4"),
+            ([[0.5, 0.5, 0.0, 1.0]] * 20, "Expected 33 or 13"),
+            ([[float("nan"), 0.5, 0.0, 1.0]] * 13, "finite"),
+            ([[640.0, 480.0, 0.0, 1.0]] * 13, "normalised"),
+            ([[0.5, 0.5, 0.0, 1.5]] * 13, "visibility"),
+        ],
+    )
+    def test_invalid_rejected(self, rows, error):
+        with pytest.raises(FrameProtocolError, match=error):
+            parse_landmarks(rows)
+
+    def test_binary_round_trip(self):
+        packet = parse_binary(encode_landmarks(blazepose_rows(), seq=9))
+        assert packet.client_landmarks
+        assert packet.flags & FLAG_LANDMARKS
+        assert packet.seq == 9
+        assert packet.landmarks.data.shape == (len(LANDMARK_NAMES), 4)
+
+    def test_binary_no_pose(self):
+        packet = parse_binary(encode_landmarks(None))
+        assert packet.client_landmarks
+        assert packet.landmarks is None
+
+    def test_binary_partial_row_rejected(self):
+        with pytest.raises(FrameProtocolError, match="float32"):
+            parse_binary(encode_binary(b"\x00" * 10, flags=FLAG_LANDMARKS))
+
+    def test_json(self):
+        message = json.dumps({"landmarks": blazepose_rows().tolist()})
+        packet = parse_json(message)
+        assert packet.client_landmarks
+        assert packet.landmarks.data.shape == (len(LANDMARK_NAMES), 4)
+
+    def test_json_no_pose(self):
+        packet = parse_json('{"landmarks": null}')
+        assert packet.client_landmarks
+        assert packet.landmarks is None
+
+
+class TestJsonStamps:
+    def test_seq_and_ts(self):
+        packet = parse_json(json.dumps({"frame": "aGVsbG8=", "seq": 7, "ts": 1.5e12}))
+        assert packet.seq == 7
+        assert packet.client_ts == 1.5e12
+        packet = parse_json(json.dumps({"landmarks": None, "seq": 8, "ts": 2}))
+        assert (packet.seq, packet.client_ts) == (8, 2)
+
+    def test_optional(self):
+        packet = parse_json(json.dumps({"frame": "aGVsbG8="}))
+        assert packet.seq is None
+        assert packet.client_ts is None
+
+    @pytest.mark.parametrize(
+        "fields, error",
+        [
+            ({"seq": -1}, "seq"),
+            ({"seq": "7"}, "seq"),
+            ({"seq": True}, "seq"),
+            ({"ts": "now"}, "ts"),
+            ({"ts": -5}, "ts"),
+            ({"ts": 10**400}, "ts"),
+            ({"ts": True}, "ts"),
+        ],
+    )
+    def test_invalid(self, fields, error):
+        with pytest.raises(FrameProtocolError, match=error):
+            parse_json(json.dumps({"frame": "aGVsbG8=", **fields}))
+
+    @pytest.mark.parametrize("client_ts", [math.nan, math.inf, -math.inf, -5.0])
+    def test_invalid_binary(self, client_ts):
+        with pytest.raises(FrameProtocolError, match="timestamp"):
+            parse_binary(encode_binary(b"jpeg", client_ts=client_ts))
+        with pytest.raises(FrameProtocolError, match="timestamp"):
+            parse_binary(encode_landmarks(None, client_ts=client_ts))
+
+
+class TestControlMessages:
+    def test_parsed(self):
+        message = parse_json('{"type": "exercise", "exercise": "squat"}')
+        assert isinstance(message, ControlMessage)
+        assert message.type == "exercise"
+        assert message.data["exercise"] == "squat"
+
+    def test_unknown_type(self):
+        with pytest.raises(FrameProtocolError, match="Unknown control message"):
+            parse_json('{"type": "pause"}')
+
+    def test_is_control(self):
+        assert is_control('{"type": "exercise", "exercise": "squat"}')
+        frame = json.dumps({"frame": base64.b64encode(b"\xff" * 64).decode()})
+        assert not is_control(frame)
+        assert not is_control(json.dumps({"landmarks": blazepose_rows().tolist()}))
+        assert not is_control(encode_binary(b'"type"'))
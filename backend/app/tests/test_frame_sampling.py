@@ -0,0 +1,126 @@
+"""Tests for skipping inference on near-duplicate frames."""
+
+import numpy as np
+import pytest
+
+from app.services.frame_sampling import (
+    THUMB_HEIGHT,
+    THUMB_WIDTH,
+    FrameChangeDetector,
+    KeyframeScheduler,
+    skip_stats,
+    thumbnail,
+)
+from app.services.pose_engine import LANDMARK_NAMES, Landmarks
+
+
+def solid(value: int, width: int = 320, height: int = 240) -> np.ndarray:
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+class TestThumbnail:
+    def test_shape_and_luma(self):
+        thumb = thumbnail(solid(100))
+        assert thumb.shape == (THUMB_HEIGHT, THUMB_WIDTH)
+        assert np.allclose(thumb, 100, atol=0.01)
+
+
+class TestFrameChangeDetector:
+    def test_first_frame_always_inferred(self):
+        assert FrameChangeDetector(3.0, 15).changed(solid(50))
+
+    def test_identical_frames_skipped(self):
+        detector = FrameChangeDetector(3.0, 15)
+        detector.changed(solid(50))
+        assert not detector.changed(solid(51))
+        assert detector.skipped == 1
+        assert detector.checked == 2
+
+    def test_changed_frame_inferred(self):
+        detector = FrameChangeDetector(3.0, 15)
+        detector.changed(solid(50))
+        assert detector.changed(solid(80))
+        assert detector.skipped == 0
+
+    def test_slow_drift_measured_against_last_inferred(self):
+        # Small steps add up: the reference stays at the last inferred frame
+        detector = FrameChangeDetector(3.0, 15)
+        detector.changed(solid(50))
+        assert not detector.changed(solid(52))
+        assert detector.changed(solid(54))
+
+    def test_max_run_forces_inference(self):
+        detector = FrameChangeDetector(3.0, 2)
+        results = [detector.changed(solid(50)) for _ in range(4)]
+        assert results == [True, False, False, True]
+
+    def test_reset_forgets_reference(self):
+        detector = FrameChangeDetector(3.0, 15)
+        detector.changed(solid(50))
+        detector.reset()
+        assert detector.changed(solid(50))
+
+    def test_node_totals(self):
+        before = skip_stats()
+        detector = FrameChangeDetector(3.0, 15)
+        detector.changed(solid(50))
+        detector.changed(solid(50))
+        after = skip_stats()
+        assert after["checked"] == before["checked"] + 2
+        assert after["skipped"] == before["skipped"] + 1
+        assert 0.0 <= after["skip_rate"] <= 1.0
+
+
+def pose(x: float, visibility: float = 0.9) -> Landmarks:
+    data = np.zeros((len(LANDMARK_NAMES), 4), dtype=np.float32)
+    data[:, Landmarks.X] = x
+    data[:, Landmarks.Y] = 0.5
+    data[:, Landmarks.VISIBILITY] = visibility
+    return Landmarks(data)
+
+
+class TestKeyframeScheduler:
+    def test_interval_one_always_infers(self):
+        scheduler = KeyframeScheduler(1, 0.02)
+        scheduler.observe(0, pose(0.5))
+        scheduler.observe(1, pose(0.5))
+        assert scheduler.due(2)
+
+    def test_needs_two_keyframes_before_extrapolating(self):
+        scheduler = KeyframeScheduler(3, 0.02)
+        assert scheduler.due(0)
+        scheduler.observe(0, pose(0.50))
+        assert scheduler.due(1)
+        scheduler.observe(1, pose(0.51))
+        assert not scheduler.due(2)
+        assert not scheduler.due(3)
+        assert scheduler.due(4)
+
+    def test_predict_extrapolates_velocity(self):
+        scheduler = KeyframeScheduler(3, 0.02)
+        scheduler.observe(0, pose(0.50))
+        scheduler.observe(2, pose(0.52))
+        predicted = scheduler.predict(4)
+        assert np.allclose(predicted["LEFT_KNEE"][0], 0.54, atol=1e-6)
+        assert predicted["LEFT_KNEE"][3] == pytest.approx(0.9)
+        assert scheduler.interpolated == 1
+
+    def test_fast_motion_infers_every_frame(self):
+        scheduler = KeyframeScheduler(3, 0.02)
+        scheduler.observe(0, pose(0.50))
+        scheduler.observe(1, pose(0.55))
+        assert scheduler.due(2)
+
+    def test_hidden_landmarks_do_not_move(self):
+        scheduler = KeyframeScheduler(3, 0.02)
+        scheduler.observe(0, pose(0.50, visibility=0.1))
+        scheduler.observe(1, pose(0.90, visibility=0.1))
+        assert not scheduler.due(2)
+        assert np.allclose(scheduler.predict(2).data[:, Landmarks.X], 0.90)
+
+    def test_lost_pose_restarts(self):
+        scheduler = KeyframeScheduler(3, 0.02)
+        scheduler.observe(0, pose(0.50))
+        scheduler.observe(1, pose(0.51))
+        scheduler.observe(2, None)
+        assert scheduler.due(3)
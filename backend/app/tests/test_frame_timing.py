@@ -0,0 +1,130 @@
+"""Tests for per-stage frame timing histograms."""
+
+import time
+
+import pytest
+
+from app.services.frame_timing import (
+    BUCKET_BOUNDS_MS,
+    ClockOffset,
+    FrameTimer,
+    LatencyHistogram,
+    SessionTimings,
+    node_timing_stats,
+)
+
+
+class TestLatencyHistogram:
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        assert histogram.percentile(50) is None
+        assert histogram.summary() == {"count": 0}
+
+    def test_percentiles_within_a_bucket(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.record(float(ms))
+        assert histogram.percentile(50) == pytest.approx(50, rel=0.25)
+        assert histogram.percentile(95) == pytest.approx(95, rel=0.25)
+        assert histogram.percentile(50) >= 50
+        summary = histogram.summary()
+        assert summary["count"] == 100
+        assert summary["mean_ms"] == 50.5
+        assert summary["max_ms"] == 100
+
+    def test_overflow_bucket_reports_max(self):
+        histogram = LatencyHistogram()
+        histogram.record(BUCKET_BOUNDS_MS[-1] * 2)
+        assert histogram.percentile(50) == BUCKET_BOUNDS_MS[-1] * 2
+
+    def test_dict_round_trip_and_merge(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(1.0)
+        b.record(10.0)
+        b.record(20.0)
+        a.merge(LatencyHistogram.from_dict(b.to_dict()))
+        assert a.count == 3
+        assert a.total_ms == 31.0
+        assert a.max_ms == 20.0
+
+
+class TestFrameTimer:
+    def test_laps_charge_stages(self):
+        timer = FrameTimer()
+        time.sleep(0.002)
+        timer.lap("parse")
+        timer.lap("tracker")
+        timer.finish()
+        assert timer.stages["parse"] >= 2
+        assert timer.stages["tracker"] < timer.stages["parse"]
+        assert timer.stages["frame"] >= timer.stages["parse"]
+
+    def test_skip_charges_nothing(self):
+        timer = FrameTimer()
+        time.sleep(0.002)
+        timer.skip()
+        timer.lap("tracker")
+        assert timer.stages["tracker"] < 2
+
+    def test_lap_remote_splits_worker_time(self):
+        timer = FrameTimer()
+        time.sleep(0.005)
+        timer.lap_remote("ipc", {"inference": 3.0, "angles": 0.5})
+        assert timer.stages["inference"] == 3.0
+        assert timer.stages["angles"] == 0.5
+        assert timer.stages["ipc"] >= 1.5
+
+    def test_lap_remote_never_negative(self):
+        timer = FrameTimer()
+        timer.lap_remote("ipc", {"inference": 1000.0})
+        assert timer.stages["ipc"] == 0.0
+
+
+class TestSessionTimings:
+    def test_summary(self):
+        timings = SessionTimings()
+        for ms in (1.0, 2.0, 3.0):
+            timer = FrameTimer()
+            timer.stages = {"decode": ms, "frame": ms * 2}
+            timings.add(timer)
+        summary = timings.summary(frames=30, duration_seconds=3, dropped=4, expired=2)
+        assert summary["fps"] == 10.0
+        assert summary["dropped_frames"] == 4
+        assert summary["expired_frames"] == 2
+        assert set(summary["stages"]) == {"decode", "frame"}
+        assert summary["stages"]["decode"]["p50_ms"] == pytest.approx(2.0, rel=0.25)
+
+    def test_samples_count_for_the_node(self):
+        before = node_timing_stats()["tracker"].get("count", 0)
+        SessionTimings().record("tracker", 0.1)
+        assert node_timing_stats()["tracker"]["count"] == before + 1
+
+    def test_restore_leaves_node_alone(self):
+        timings = SessionTimings()
+        timings.record("send", 4.0)
+        before = node_timing_stats()["send"]["count"]
+
+        resumed = SessionTimings()
+        resumed.restore(timings.snapshot())
+        assert resumed.stages["send"].count == 1
+        assert node_timing_stats()["send"]["count"] == before
+
+
+class TestClockOffset:
+    def test_fastest_delivery_sets_the_offset(self):
+        clock = ClockOffset(window=30)
+        assert clock.offset_ms is None
+        # Client clock 1000 ms behind; deliveries take 40, 10 and 25 ms
+        for client_ts, delay in ((0, 40), (100, 10), (200, 25)):
+            clock.observe(client_ts, client_ts + 1000 + delay)
+        assert clock.offset_ms == 1010
+        assert clock.to_server(300) == 1310
+
+    def test_window_follows_drift(self):
+        clock = ClockOffset(window=1)
+        clock.observe(0, 1000)
+        clock.observe(500, 1600)
+        assert clock.offset_ms == 1000
+        # The minimum sample has left the window
+        clock.observe(2000, 3100)
+        assert clock.offset_ms == 1100
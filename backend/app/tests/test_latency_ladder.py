@@ -0,0 +1,40 @@
+"""Tests for the latency step rule shared by capture control and pose engines."""
+
+from app.services.latency_ladder import HEAVIER, HOLD, LIGHTER, LatencyLadder
+
+
+def observe(ladder: LatencyLadder, latency_ms: float, frames: int, **kwargs) -> int:
+    for _ in range(frames):
+        step = ladder.observe(latency_ms, **kwargs)
+    return step
+
+
+class TestLatencyLadder:
+    def test_holds_until_hold_frames(self):
+        ladder = LatencyLadder(budget_ms=50, hold_frames=5)
+        assert observe(ladder, 80, 4) == HOLD
+        assert ladder.observe(80) == LIGHTER
+
+    def test_pressure_means_lighter_within_budget(self):
+        ladder = LatencyLadder(budget_ms=50, hold_frames=3)
+        assert observe(ladder, 10, 3, pressure=True) == LIGHTER
+
+    def test_heavier_needs_headroom_and_slack(self):
+        ladder = LatencyLadder(budget_ms=50, hold_frames=3)
+        assert observe(ladder, 10, 3, slack=False) == HOLD
+        assert ladder.observe(10) == HEAVIER
+        # Under budget but not under the headroom fraction
+        assert observe(LatencyLadder(50, 3), 40, 3) == HOLD
+
+    def test_average_is_smoothed(self):
+        ladder = LatencyLadder(budget_ms=50, hold_frames=1)
+        ladder.observe(10)
+        ladder.observe(110)
+        assert ladder.latency_ms == 30.0
+
+    def test_restart_clears_average_and_hold(self):
+        ladder = LatencyLadder(budget_ms=50, hold_frames=3)
+        observe(ladder, 80, 3)
+        ladder.restart()
+        assert ladder.latency_ms is None
+        assert ladder.observe(80) == HOLD
@@ -0,0 +1,211 @@
+"""Tests for the pluggable pose backends."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.services.pose_backends import (
+    BACKENDS,
+    COCO_KEYPOINTS,
+    MediaPipeTasksBackend,
+    MoveNetBackend,
+    backend_available,
+    create_backend,
+    estimate_memory_mb,
+)
+from app.services.pose_engine import LANDMARK_NAMES, LANDMARKS, PoseEngine
+
+
+class FakeSession:
+    """onnxruntime session returning fixed MoveNet keypoints (y, x, score)."""
+
+    def __init__(
+        self,
+        keypoints: np.ndarray,
+        input_type: str = "tensor(int32)",
+        batch_dim: int | str = 1,
+    ):
+        self.keypoints = keypoints
+        self.input = SimpleNamespace(
+            name="input", type=input_type, shape=[batch_dim, None, None, 3]
+        )
+        self.fed = None
+        self.runs = 0
+
+    def get_inputs(self):
+        return [self.input]
+
+    def run(self, outputs, feed):
+        self.fed = feed["input"]
+        self.runs += 1
+        return [np.broadcast_to(self.keypoints, (len(self.fed), 1, 17, 3))]
+
+
+def movenet(keypoints: np.ndarray, input_type: str = "tensor(int32)", batch_dim=1):
+    session = FakeSession(keypoints, input_type, batch_dim)
+    fake_ort = MagicMock()
+    fake_ort.InferenceSession.return_value = session
+    with (
+        patch("app.services.pose_backends.ONNXRUNTIME_AVAILABLE", True),
+        patch("app.services.pose_backends.ort", fake_ort),
+    ):
+        backend = MoveNetBackend("models")
+        # Sessions are opened lazily; open both tiers while ort is faked
+        for tier in MoveNetBackend.MODELS:
+            backend._session(tier)
+    return backend, session
+
+
+@pytest.fixture(autouse=True)
+def onnx_sessions():
+    """Keep the process-wide MoveNet session cache per test."""
+    with patch.dict("app.services.pose_backends._onnx_sessions", clear=True):
+        yield
+
+
+def keypoints(score: float = 0.8) -> np.ndarray:
+    kp = np.zeros((17, 3), dtype=np.float32)
+    kp[:, 0] = np.linspace(0.1, 0.9, 17)  # y
+    kp[:, 1] = 0.25  # x
+    kp[:, 2] = score
+    return kp
+
+
+class TestRegistry:
+    def test_known_backends(self):
+        assert set(BACKENDS) == {"mediapipe", "mediapipe_tasks", "movenet"}
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError, match="Unknown pose backend"):
+            create_backend("openpose")
+        assert not backend_available("openpose")
+
+    def test_unavailable_runtime_raises(self):
+        with patch("app.services.pose_backends.ONNXRUNTIME_AVAILABLE", False):
+            assert not backend_available("movenet")
+            with pytest.raises(RuntimeError):
+                create_backend("movenet")
+
+    def test_coco_map_covers_every_landmark(self):
+        assert set(COCO_KEYPOINTS) == set(LANDMARKS)
+
+    def test_memory_estimate_covers_every_tier(self):
+        for backend_cls in BACKENDS.values():
+            assert set(backend_cls.MEMORY_MB) == set(
+                range(backend_cls.max_complexity + 1)
+            )
+
+    def test_memory_estimate(self):
+        # Per engine, the chosen tier and those below it
+        assert estimate_memory_mb("mediapipe", 1, engines=4, workers=2) == 4 * 75.0
+        # MoveNet sessions are shared per worker process; complexity is capped
+        assert estimate_memory_mb("movenet", 2, engines=8, workers=2) == 2 * 85.0
+
+
+class TestMoveNetBackend:
+    def test_maps_coco_keypoints_onto_landmark_rows(self):
+        backend, session = movenet(keypoints())
+        landmarks = backend.detect(np.zeros((480, 480, 3), dtype=np.uint8), 0)
+
+        assert session.fed.shape == (1, 192, 192, 3)
+        assert session.fed.dtype == np.int32
+        expected_y = np.linspace(0.1, 0.9, 17)[COCO_KEYPOINTS["LEFT_KNEE"]]
+        assert landmarks["LEFT_KNEE"][1] == pytest.approx(expected_y)
+        assert landmarks["LEFT_KNEE"][3] == pytest.approx(0.8)
+        assert landmarks.data.shape == (len(LANDMARK_NAMES), 4)
+
+    def test_letterbox_mapped_back_to_frame(self):
+        # A 2:1 frame is padded to a square; x=0.25 of the square is 0.5 of the frame
+        backend, _ = movenet(keypoints())
+        landmarks = backend.detect(np.zeros((240, 480, 3), dtype=np.uint8), 0)
+        assert landmarks["NOSE"][0] == pytest.approx(0.25)
+        assert landmarks["NOSE"][1] == pytest.approx(0.2)
+
+    def test_thunder_tier_and_float_input(self):
+        backend, session = movenet(keypoints(), input_type="tensor(float)")
+        backend.detect(np.zeros((100, 100, 3), dtype=np.uint8), 1)
+        assert session.fed.shape == (1, 256, 256, 3)
+        assert session.fed.dtype == np.float32
+
+    def test_batch_runs_once_with_dynamic_batch_dim(self):
+        backend, session = movenet(keypoints(), batch_dim="batch")
+        frames = [np.zeros((100, 100, 3), dtype=np.uint8)] * 3
+        results = backend.detect_batch(frames, 0)
+        assert session.runs == 1
+        assert session.fed.shape == (3, 192, 192, 3)
+        assert all(landmarks is not None for landmarks in results)
+
+    def test_batch_loops_with_fixed_batch_dim(self):
+        backend, session = movenet(keypoints())
+        backend.detect_batch([np.zeros((100, 100, 3), dtype=np.uint8)] * 3, 0)
+        assert session.runs == 3
+
+    def test_engines_share_sessions(self):
+        backend, session = movenet(keypoints())
+        with patch("app.services.pose_backends.ONNXRUNTIME_AVAILABLE", True):
+            other = MoveNetBackend("models")
+        assert other._session(0) is session
+
+    def test_low_scores_mean_no_pose(self):
+        backend, _ = movenet(keypoints(score=0.05))
+        assert backend.detect(np.zeros((100, 100, 3), dtype=np.uint8), 0) is None
+
+
+class TestMediaPipeTasksBackend:
+    @pytest.fixture
+    def tasks(self):
+        with (
+            patch("app.services.pose_backends.MEDIAPIPE_AVAILABLE", True),
+            patch("app.services.pose_backends.mp_vision", MagicMock()),
+            patch("app.services.pose_backends.BaseOptions", MagicMock()),
+        ):
+            yield MediaPipeTasksBackend("models")
+
+    def test_load_builds_landmarker(self, tasks):
+        tasks.load(1)
+        assert set(tasks._landmarkers) == {1}
+
+    def test_landmarker_kept_across_sessions(self, tasks):
+        tasks.load(1)
+        landmarker = tasks._landmarkers[1]
+        tasks.reset()
+        assert tasks._landmarker(1) is landmarker
+        landmarker.close.assert_not_called()
+
+
+class TestEngineBackend:
+    def test_complexity_capped_by_backend(self):
+        backend, _ = movenet(keypoints())
+        with patch("app.services.pose_backends.create_backend", return_value=backend):
+            engine = PoseEngine(model_complexity=2, backend="movenet")
+        assert engine.model_complexity == 1
+
+    def test_engine_loads_its_tiers_up_front(self):
+        backend = MagicMock(max_complexity=2)
+        with patch("app.services.pose_backends.create_backend", return_value=backend):
+            PoseEngine(model_complexity=2, cascade_tier=0)
+        assert [c.args for c in backend.load.call_args_list] == [(2,), (0,)]
+
+    def test_process_batch_shares_one_backend_call(self):
+        backend, session = movenet(keypoints(), batch_dim="batch")
+        engines = []
+        for _ in range(3):
+            with patch(
+                "app.services.pose_backends.create_backend", return_value=backend
+            ):
+                engines.append(PoseEngine(backend="movenet", model_complexity=0))
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        results = PoseEngine.process_batch([(engine, frame) for engine in engines])
+        assert session.runs == 1
+        assert len(results) == 3
+        # Each engine now tracks its own ROI
+        assert all(engine._roi is not None for engine in engines)
+
+    def test_engine_maps_backend_landmarks(self):
+        backend, _ = movenet(keypoints())
+        with patch("app.services.pose_backends.create_backend", return_value=backend):
+            engine = PoseEngine(roi_padding=None, backend="movenet")
+        landmarks = engine.process_frame(np.zeros((200, 200, 3), dtype=np.uint8))
+        assert landmarks["LEFT_HIP"][0] == pytest.approx(0.25)
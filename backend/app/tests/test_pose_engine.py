@@ -1,6 +1,24 @@
 """Tests for pose engine angle calculations."""
 
-from app.services.pose_engine import calculate_angle
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.services.pose_engine import (
+    ANGLE_PLANS,
+    COMPLEXITY_HOLD_FRAMES,
+    EXERCISE_ANGLES,
+    LANDMARK_NAMES,
+    LANDMARKS,
+    AnglePlan,
+    Landmarks,
+    PoseEngine,
+    calculate_angle,
+    calculate_angles,
+    landmark_roi,
+)
 
 
 class TestCalculateAngle:
@@ -52,3 +70,331 @@ class TestCalculateAngle:
         angle1 = calculate_angle(a, b, c)
         angle2 = calculate_angle(c, b, a)
         assert abs(angle1 - angle2) < 0.1
+
+
+def make_landmarks(points: dict, visibility: float = 0.9) -> Landmarks:
+    return Landmarks.from_dict(
+        {
+            name: {"x": x, "y": y, "z": 0.0, "visibility": visibility}
+            for name, (x, y) in points.items()
+        }
+    )
+
+
+BODY = {
+    "LEFT_SHOULDER": (0.4, 0.3),
+    "RIGHT_SHOULDER": (0.6, 0.3),
+    "LEFT_HIP": (0.45, 0.5),
+    "RIGHT_HIP": (0.55, 0.5),
+    "LEFT_ANKLE": (0.45, 0.8),
+    "RIGHT_ANKLE": (0.55, 0.8),
+}
+
+
+class FakeResults:
+    def __init__(self, points):
+        if points is None:
+            self.pose_landmarks = None
+            return
+        landmark = [SimpleNamespace(x=0, y=0, z=0, visibility=0)] * 33
+        for name, (x, y) in points.items():
+            landmark[LANDMARKS[name]] = SimpleNamespace(x=x, y=y, z=0.1, visibility=0.9)
+        self.pose_landmarks = SimpleNamespace(landmark=landmark)
+
+
+@pytest.fixture
+def engine():
+    with (
+        patch("app.services.pose_backends.MEDIAPIPE_AVAILABLE", True),
+        patch("app.services.pose_backends.mp_pose", MagicMock()),
+    ):
+        yield PoseEngine(roi_padding=0.25)
+
+
+def graph(engine: PoseEngine):
+    """The (mocked) MediaPipe graph the engine's backend runs at its tier."""
+    return engine.backend._graph(engine.model_complexity)
+
+
+class TestLandmarkRoi:
+    def test_padded_box(self):
+        roi = landmark_roi(make_landmarks(BODY), 1000, 1000, padding=0.25)
+        # Landmarks span x 400-600, y 300-800; padded by 25% of the span
+        assert roi == (350, 175, 650, 925)
+
+    def test_clamped_to_frame(self):
+        points = {**BODY, "NOSE": (0.5, 0.02)}
+        x0, y0, x1, y1 = landmark_roi(make_landmarks(points), 640, 480, padding=0.5)
+        assert (x0, y0) >= (0, 0)
+        assert (x1, y1) <= (640, 480)
+
+    def test_too_few_visible_landmarks(self):
+        assert landmark_roi(make_landmarks(BODY, 0.1), 640, 480, padding=0.25) is None
+
+
+class TestPoseEngineRoi:
+    def test_first_frame_uses_full_frame(self, engine):
+        graph(engine).process.return_value = FakeResults(BODY)
+        landmarks = engine.process_frame(np.zeros((1000, 1000, 3), dtype=np.uint8))
+        assert landmarks.to_dict()["LEFT_HIP"]["x"] == 0.45
+        assert engine.full_frames == 1
+        assert engine._roi == (350, 175, 650, 925)
+
+    def test_crop_landmarks_mapped_to_full_frame(self, engine):
+        engine._roi = (250, 0, 750, 1000)
+        # Centre of the crop is the centre of the frame
+        graph(engine).process.return_value = FakeResults({**BODY, "NOSE": (0.5, 0.5)})
+        landmarks = engine.process_frame(
+            np.zeros((1000, 1000, 3), dtype=np.uint8)
+        ).to_dict()
+
+        crop = graph(engine).process.call_args.args[0]
+        assert crop.shape == (1000, 500, 3)
+        assert landmarks["NOSE"]["x"] == 0.5
+        assert landmarks["LEFT_SHOULDER"]["x"] == 0.45  # 250 + 0.4 * 500
+        assert landmarks["NOSE"]["z"] == 0.05
+        assert engine.roi_frames == 1
+
+    def test_lost_crop_falls_back_to_full_frame(self, engine):
+        engine._roi = (0, 0, 100, 100)
+        graph(engine).process.side_effect = [FakeResults(None), FakeResults(BODY)]
+        landmarks = engine.process_frame(np.zeros((1000, 1000, 3), dtype=np.uint8))
+        assert landmarks is not None
+        assert graph(engine).process.call_args.args[0].shape == (1000, 1000, 3)
+        assert engine.full_frames == 1
+
+    def test_no_pose_clears_roi(self, engine):
+        engine._roi = (0, 0, 100, 100)
+        graph(engine).process.return_value = FakeResults(None)
+        assert engine.process_frame(np.zeros((200, 200, 3), dtype=np.uint8)) is None
+        assert engine._roi is None
+
+
+class TestLandmarks:
+    def test_named_views_share_the_array(self):
+        landmarks = make_landmarks(BODY)
+        assert landmarks.data.shape == (len(LANDMARK_NAMES), 4)
+        assert landmarks.data.dtype == np.float32
+        landmarks["LEFT_HIP"][0] = 0.25
+        assert landmarks.xy[LANDMARK_NAMES.index("LEFT_HIP"), 0] == 0.25
+
+    def test_dict_round_trip(self):
+        raw = {
+            name: {"x": 0.1234, "y": 0.5, "z": -0.25, "visibility": 0.75}
+            for name in LANDMARK_NAMES
+        }
+        assert Landmarks.from_dict(raw).to_dict() == raw
+
+
+class TestExerciseAngles:
+    def test_squat_knee_angles(self, engine):
+        points = {
+            "LEFT_HIP": (0.4, 0.4),
+            "LEFT_KNEE": (0.4, 0.6),
+            "LEFT_ANKLE": (0.6, 0.6),
+            "RIGHT_HIP": (0.6, 0.4),
+            "RIGHT_KNEE": (0.6, 0.6),
+            "RIGHT_ANKLE": (0.6, 0.8),
+        }
+        angles = engine.get_exercise_angles(make_landmarks(points), "squat")
+        assert abs(angles["left_knee"] - 90.0) < 0.5
+        assert abs(angles["right_knee"] - 180.0) < 0.5
+        assert abs(angles["primary"] - 135.0) < 0.5
+
+    def test_low_visibility_side_ignored(self, engine):
+        landmarks = make_landmarks(
+            {"LEFT_HIP": (0.4, 0.4), "LEFT_KNEE": (0.4, 0.6), "LEFT_ANKLE": (0.6, 0.6)}
+        )
+        angles = engine.get_exercise_angles(landmarks, "squat")
+        assert angles["right_knee"] is None
+        assert angles["primary"] == angles["left_knee"]
+
+    def test_unknown_landmark(self, engine):
+        landmarks = make_landmarks(BODY)
+        assert engine.get_angle(landmarks, "LEFT_HIP", "TAIL", "LEFT_ANKLE") is None
+
+
+class TestAnglePlans:
+    @pytest.mark.parametrize("exercise", list(EXERCISE_ANGLES))
+    def test_matches_scalar_path(self, engine, exercise):
+        rng = np.random.default_rng(7)
+        for _ in range(20):
+            data = rng.random((len(LANDMARK_NAMES), 4)).astype(np.float32)
+            landmarks = Landmarks(data)
+            angles = engine.get_exercise_angles(landmarks, exercise)
+
+            joints = EXERCISE_ANGLES[exercise]["joints"]
+            for name, (a, b, c) in joints.items():
+                expected = engine.get_angle(landmarks, a, b, c)
+                if expected is None:
+                    assert angles[name] is None
+                else:
+                    assert abs(angles[name] - expected) <= 0.1
+
+    def test_unknown_exercise(self, engine):
+        assert engine.get_exercise_angles(make_landmarks(BODY), "plank") == {}
+
+    def test_custom_plan_reducer(self):
+        plan = AnglePlan(
+            {
+                "joints": {
+                    "left_hip": ("LEFT_SHOULDER", "LEFT_HIP", "LEFT_KNEE"),
+                    "right_hip": ("RIGHT_SHOULDER", "RIGHT_HIP", "RIGHT_KNEE"),
+                },
+                "min_visibility": 0.5,
+                "primary": "min",
+            }
+        )
+        points = {
+            "LEFT_SHOULDER": (0.4, 0.2),
+            "LEFT_HIP": (0.4, 0.5),
+            "LEFT_KNEE": (0.7, 0.5),
+            "RIGHT_SHOULDER": (0.6, 0.2),
+            "RIGHT_HIP": (0.6, 0.5),
+            "RIGHT_KNEE": (0.6, 0.8),
+        }
+        angles = plan.compute(make_landmarks(points))
+        assert angles["primary"] == angles["left_hip"]
+        assert abs(angles["left_hip"] - 90.0) < 0.5
+
+
+class TestCalculateAnglesBatch:
+    def test_matches_scalar(self):
+        rng = np.random.default_rng(3)
+        points = rng.random((50, 3, 2))
+        batch = calculate_angles(points)
+        assert batch.shape == (50,)
+        for triplet, angle in zip(points, batch):
+            assert abs(calculate_angle(*triplet) - angle) <= 0.05
+
+    def test_joint_axis(self):
+        points = np.array([[[[0, 1], [0, 0], [1, 0]], [[0, 0], [1, 0], [2, 0]]]])
+        angles = calculate_angles(points)
+        assert angles.shape == (1, 2)
+        assert abs(angles[0, 0] - 90.0) < 0.01
+        assert abs(angles[0, 1] - 180.0) < 0.1
+
+    def test_visibility_mask_gives_nan(self):
+        points = np.zeros((2, 3, 2))
+        points[:, 0] = (0, 1)
+        points[:, 2] = (1, 0)
+        visibility = np.array([[1.0, 1.0, 1.0], [1.0, 0.1, 1.0]])
+        angles = calculate_angles(points, visibility)
+        assert abs(angles[0] - 90.0) < 0.01
+        assert np.isnan(angles[1])
+
+    def test_bad_shape(self):
+        with pytest.raises(ValueError):
+            calculate_angles(np.zeros((4, 2, 2)))
+
+    def test_plan_series_matches_per_frame(self, engine):
+        rng = np.random.default_rng(11)
+        frames = rng.random((30, len(LANDMARK_NAMES), 4)).astype(np.float32)
+        series = ANGLE_PLANS["squat"].compute_series(frames)
+        for i, data in enumerate(frames):
+            single = engine.get_exercise_angles(Landmarks(data), "squat")
+            if single["primary"] is None:
+                assert np.isnan(series["primary"][i])
+            else:
+                assert abs(series["primary"][i] - single["primary"]) <= 0.1
+
+
+class TestAdaptiveComplexity:
+    @pytest.fixture
+    def adaptive(self):
+        with (
+            patch("app.services.pose_backends.MEDIAPIPE_AVAILABLE", True),
+            patch("app.services.pose_backends.mp_pose", MagicMock()),
+        ):
+            yield PoseEngine(model_complexity=1, latency_budget_ms=50)
+
+    def test_steps_down_when_over_budget(self, adaptive):
+        for _ in range(COMPLEXITY_HOLD_FRAMES):
+            adaptive._adapt(80, saturated=False)
+        assert adaptive.model_complexity == 0
+
+    def test_holds_tier_before_switching(self, adaptive):
+        for _ in range(COMPLEXITY_HOLD_FRAMES - 1):
+            adaptive._adapt(80, saturated=False)
+        assert adaptive.model_complexity == 1
+
+    def test_saturation_steps_down_within_budget(self, adaptive):
+        for _ in range(COMPLEXITY_HOLD_FRAMES):
+            adaptive._adapt(20, saturated=True)
+        assert adaptive.model_complexity == 0
+
+    def test_steps_back_up_with_headroom(self, adaptive):
+        for _ in range(COMPLEXITY_HOLD_FRAMES):
+            adaptive._adapt(80, saturated=False)
+        for _ in range(COMPLEXITY_HOLD_FRAMES):
+            adaptive._adapt(10, saturated=False)
+        assert adaptive.model_complexity == 1
+
+    def test_never_above_configured_complexity(self, adaptive):
+        for _ in range(COMPLEXITY_HOLD_FRAMES * 3):
+            adaptive._adapt(1, saturated=False)
+        assert adaptive.model_complexity == 1
+
+    def test_disabled_without_budget(self, engine):
+        for _ in range(COMPLEXITY_HOLD_FRAMES * 2):
+            engine._adapt(500, saturated=True)
+        assert engine.model_complexity == 1
+
+    def test_reset_restores_full_model(self, adaptive):
+        adaptive._set_complexity(0)
+        adaptive.reset()
+        assert adaptive.model_complexity == 1
+
+
+class TestCascade:
+    @pytest.fixture
+    def cascade(self):
+        with (
+            patch("app.services.pose_backends.MEDIAPIPE_AVAILABLE", True),
+            patch("app.services.pose_backends.mp_pose", MagicMock()),
+        ):
+            yield PoseEngine(model_complexity=1, latency_budget_ms=50, cascade_tier=0)
+
+    def test_tracking_frames_use_cheap_tier(self, cascade):
+        graph(cascade).process.return_value = FakeResults(BODY)
+        cascade.process_frame(np.zeros((100, 100, 3), dtype=np.uint8), precise=False)
+        assert cascade.active_complexity == 0
+        assert 0 in cascade.backend._graphs
+
+    def test_precise_frames_use_full_tier(self, cascade):
+        graph(cascade).process.return_value = FakeResults(BODY)
+        cascade.process_frame(np.zeros((100, 100, 3), dtype=np.uint8), precise=True)
+        assert cascade.active_complexity == 1
+
+    def test_precise_burst_resets_full_graph(self):
+        # A separate mock graph per tier
+        pose = MagicMock(Pose=MagicMock(side_effect=lambda **_: MagicMock()))
+        with (
+            patch("app.services.pose_backends.MEDIAPIPE_AVAILABLE", True),
+            patch("app.services.pose_backends.mp_pose", pose),
+        ):
+            cascade = PoseEngine(model_complexity=1, cascade_tier=0)
+        graphs = cascade.backend._graphs
+        graphs[1].process.return_value = FakeResults(BODY)
+        graphs[0].process.return_value = FakeResults(BODY)
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+        cascade.process_frame(frame, precise=False)
+        graphs[1].reset.assert_not_called()
+
+        # The burst's first frame must not track from the previous burst
+        cascade.process_frame(frame, precise=True)
+        cascade.process_frame(frame, precise=True)
+        graphs[1].reset.assert_called_once()
+        graphs[0].reset.assert_called_once()
+
+    def test_cheap_frames_do_not_feed_adaptation(self, cascade):
+        graph(cascade).process.return_value = FakeResults(None)
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+        for _ in range(COMPLEXITY_HOLD_FRAMES):
+            cascade.process_frame(frame, precise=False)
+        assert cascade.latency_ms is None
+
+    def test_without_cascade_precise_is_ignored(self, engine):
+        graph(engine).process.return_value = FakeResults(BODY)
+        engine.process_frame(np.zeros((100, 100, 3), dtype=np.uint8), precise=False)
+        assert engine.active_complexity == 1
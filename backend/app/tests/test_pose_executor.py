@@ -0,0 +1,314 @@
+"""Tests for the process-based pose executor and its shared-memory rings."""
+
+import asyncio
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.pose_executor import (
+    FrameRing,
+    PoseExecutor,
+    PoseWorkerLost,
+    _Worker,
+)
+
+
+class FakeEngine:
+    """Stands in for PoseEngine inside worker processes (no mediapipe needed)."""
+
+    model_complexity = 1
+    active_complexity = 1
+
+    def process_frame(self, frame, saturated=False):
+        return {
+            "NOSE": {"x": float(frame.mean()), "y": 0.0, "z": 0.0, "visibility": 1.0}
+        }
+
+    @staticmethod
+    def process_batch(items, saturated=False, precise=None):
+        return [engine.process_frame(frame, saturated) for engine, frame in items]
+
+    def get_exercise_angles(self, landmarks, exercise):
+        return {"primary": landmarks["NOSE"]["x"], "exercise": exercise}
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class BrokenEngine:
+    def __init__(self):
+        raise RuntimeError("no model")
+
+
+class TestFrameRing:
+    def test_view_is_shared(self):
+        ring = FrameRing(slots=2, slot_bytes=12)
+        try:
+            other = FrameRing(slots=2, slot_bytes=12, name=ring.name)
+            ring.view(1, (2, 2, 3))[:] = 7
+            assert other.view(1, (2, 2, 3)).sum() == 7 * 12
+            assert other.view(0, (2, 2, 3)).sum() == 0
+            other.close()
+        finally:
+            ring.close()
+
+    def test_oversized_frame_rejected(self):
+        ring = FrameRing(slots=1, slot_bytes=12)
+        try:
+            with pytest.raises(ValueError):
+                ring.view(0, (4, 4, 3))
+        finally:
+            ring.close()
+
+
+class TestPoseExecutor:
+    @pytest.mark.asyncio
+    async def test_infer_round_trip(self):
+        executor = PoseExecutor(
+            workers=2,
+            ring_slots=2,
+            max_frame_width=8,
+            max_frame_height=8,
+            pool_size=2,
+            engine_factory=FakeEngine,
+        )
+        await executor.start()
+        try:
+            lease = await executor.checkout(timeout=1)
+            frame = np.full((8, 8, 3), 42, dtype=np.uint8)
+            landmarks, angles, info = await executor.infer(lease, frame, "squat")
+            assert landmarks["NOSE"]["x"] == 42.0
+            assert angles == {"primary": 42.0, "exercise": "squat"}
+            assert info["model_complexity"] == 1
+            assert info["inference_ms"] >= 0
+            assert info["angles_ms"] >= 0
+            assert executor.stats["frames_processed"] == 1
+            assert executor.stats["frames_by_model_complexity"] == {1: 1}
+        finally:
+            await executor.stop()
+
+    @pytest.mark.asyncio
+    async def test_frame_too_large(self):
+        executor = PoseExecutor(
+            workers=1,
+            ring_slots=1,
+            max_frame_width=4,
+            max_frame_height=4,
+            pool_size=1,
+            engine_factory=FakeEngine,
+        )
+        await executor.start()
+        try:
+            lease = await executor.checkout(timeout=1)
+            with pytest.raises(ValueError):
+                await executor.infer(
+                    lease, np.zeros((8, 8, 3), dtype=np.uint8), "squat"
+                )
+        finally:
+            await executor.stop()
+
+    @pytest.mark.asyncio
+    async def test_start_fails_when_no_engine(self):
+        executor = PoseExecutor(
+            workers=1,
+            ring_slots=1,
+            max_frame_width=4,
+            max_frame_height=4,
+            pool_size=1,
+            engine_factory=BrokenEngine,
+        )
+        with pytest.raises(RuntimeError, match="no model"):
+            await executor.start()
+
+    @pytest.mark.asyncio
+    async def test_pool_checkout_waits_and_release(self):
+        executor = PoseExecutor(
+            workers=2,
+            ring_slots=1,
+            max_frame_width=4,
+            max_frame_height=4,
+            pool_size=3,
+            engine_factory=FakeEngine,
+        )
+        await executor.start()
+        try:
+            assert executor.stats["pool"]["size"] == 3
+            leases = [await executor.checkout(timeout=1) for _ in range(3)]
+            assert executor.stats["pool"]["in_use"] == 3
+            assert executor.stats["pool"]["waits"] == 0
+
+            with pytest.raises(asyncio.TimeoutError):
+                await executor.checkout(timeout=0.05)
+
+            executor.release(leases[0])
+            lease = await executor.checkout(timeout=1)
+            assert lease is leases[0]
+            frame = np.full((4, 4, 3), 9, dtype=np.uint8)
+            landmarks, _, _ = await executor.infer(lease, frame, "squat")
+            assert landmarks["NOSE"]["x"] == 9.0
+
+            pool = executor.stats["pool"]
+            assert pool["checkouts"] == 5
+            assert pool["waits"] == 1
+            assert pool["wait_ratio"] == 0.2
+        finally:
+            await executor.stop()
+
+    @pytest.mark.asyncio
+    async def test_micro_batched_round_trip(self):
+        executor = PoseExecutor(
+            workers=1,
+            ring_slots=1,
+            max_frame_width=4,
+            max_frame_height=4,
+            pool_size=3,
+            engine_factory=FakeEngine,
+            batch_size=3,
+            batch_wait_ms=50,
+        )
+        await executor.start()
+        try:
+            leases = [await executor.checkout(timeout=1) for _ in range(3)]
+            frames = [np.full((4, 4, 3), v, dtype=np.uint8) for v in (1, 2, 3)]
+            results = await asyncio.gather(
+                *(
+                    executor.infer(lease, frame, "squat")
+                    for lease, frame in zip(leases, frames)
+                )
+            )
+            assert [landmarks["NOSE"]["x"] for landmarks, _, _ in results] == [
+                1.0,
+                2.0,
+                3.0,
+            ]
+            batching = executor.stats["batching"]
+            assert batching["batches"] == 1
+            assert batching["avg_batch_size"] == 3.0
+        finally:
+            await executor.stop()
+
+    @pytest.mark.asyncio
+    async def test_dead_worker_fails_frames_and_is_replaced(self):
+        executor = PoseExecutor(
+            workers=1,
+            ring_slots=1,
+            max_frame_width=4,
+            max_frame_height=4,
+            pool_size=2,
+            engine_factory=FakeEngine,
+        )
+        await executor.start()
+        try:
+            lease = await executor.checkout(timeout=1)
+            dead = lease.worker
+            frame = np.zeros((4, 4, 3), dtype=np.uint8)
+            # One frame in flight holds the only ring slot, two more wait for it
+            running = asyncio.get_running_loop().create_future()
+            dead.free_slots.get_nowait()
+            dead.in_flight += 1
+            executor._pending[-1] = (running, dead, 0)
+            waiting = [
+                asyncio.create_task(executor.infer(lease, frame, "squat"))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0)
+
+            dead.process.kill()
+            results = await asyncio.wait_for(
+                asyncio.gather(*waiting, return_exceptions=True), timeout=5
+            )
+            assert isinstance(running.exception(), PoseWorkerLost)
+            assert all(isinstance(r, PoseWorkerLost) for r in results)
+            assert executor._pending == {}
+            with pytest.raises(PoseWorkerLost):
+                await executor.infer(lease, frame, "squat")
+
+            # The replacement's engines come back to the pool
+            executor.release(lease)
+            fresh = [await executor.checkout(timeout=5) for _ in range(2)]
+            assert all(f.worker is not dead for f in fresh)
+            landmarks, _, _ = await executor.infer(fresh[0], frame + 3, "squat")
+            assert landmarks["NOSE"]["x"] == 3.0
+            assert executor.stats["worker_deaths"] == 1
+            assert executor.stats["respawns"] == 1
+        finally:
+            await executor.stop()
+
+    @pytest.mark.asyncio
+    async def test_slot_wait_times_out(self, monkeypatch):
+        monkeypatch.setattr(settings, "pose_infer_timeout", 0.05)
+        executor = PoseExecutor(
+            workers=1,
+            ring_slots=1,
+            max_frame_width=4,
+            max_frame_height=4,
+            pool_size=1,
+            engine_factory=FakeEngine,
+        )
+        await executor.start()
+        try:
+            lease = await executor.checkout(timeout=1)
+            lease.worker.free_slots.get_nowait()
+            with pytest.raises(asyncio.TimeoutError):
+                await executor.infer(lease, np.zeros((4, 4, 3), np.uint8), "squat")
+            assert lease.worker.in_flight == 0
+        finally:
+            await executor.stop()
+
+
+class FakeRequests:
+    def __init__(self):
+        self.sent = []
+
+    def put(self, msg):
+        self.sent.append(msg)
+
+
+class TestBatchFairness:
+    def make(self, batch_size: int):
+        executor = PoseExecutor(
+            workers=1,
+            ring_slots=1,
+            max_frame_width=4,
+            max_frame_height=4,
+            pool_size=3,
+            engine_factory=FakeEngine,
+            batch_size=batch_size,
+            batch_wait_ms=5,
+        )
+        executor._loop = asyncio.get_running_loop()
+        worker = _Worker(0, SimpleNamespace(slots=0), 3, FakeRequests(), None, None)
+        return executor, worker
+
+    @pytest.mark.asyncio
+    async def test_each_session_served_before_any_twice(self):
+        executor, worker = self.make(batch_size=4)
+        # Session 0 floods; sessions 1 and 2 send one frame each
+        worker.queued = {
+            0: deque((i, 0, 0, (1,), "squat") for i in range(3)),
+            1: deque([(10, 1, 0, (1,), "squat")]),
+            2: deque([(20, 2, 0, (1,), "squat")]),
+        }
+        worker.queued_count = 5
+        executor._flush(worker)
+
+        (kind, batch, _), (_, rest, _) = worker.requests.sent
+        assert kind == "infer_batch"
+        assert [request[1] for request in batch] == [0, 1, 2, 0]
+        assert [request[0] for request in rest] == [2]
+        assert worker.queued_count == 0
+
+    @pytest.mark.asyncio
+    async def test_partial_batch_sent_after_wait(self):
+        executor, worker = self.make(batch_size=4)
+        executor._enqueue(worker, (1, 0, 0, (1,), "squat"))
+        assert worker.requests.sent == []
+        await asyncio.sleep(0.02)
+        assert len(worker.requests.sent) == 1
+        assert worker.flush_handle is None
@@ -0,0 +1,122 @@
+"""Tests for the compact exercise socket response encoding."""
+
+import msgpack
+import numpy as np
+
+from app.services.pose_engine import LANDMARK_NAMES, Landmarks
+from app.services.response_codec import (
+    CompactResponder,
+    dequantize_landmarks,
+    quantize_landmarks,
+)
+
+
+def make_landmarks() -> Landmarks:
+    data = np.zeros((len(LANDMARK_NAMES), 4), dtype=np.float32)
+    data[:, Landmarks.X] = np.linspace(0.1, 0.9, len(LANDMARK_NAMES))
+    data[:, Landmarks.Y] = np.linspace(0.9, 0.1, len(LANDMARK_NAMES))
+    data[:, Landmarks.VISIBILITY] = 0.8
+    return Landmarks(data)
+
+
+def make_response(frame_number: int, **overrides) -> dict:
+    response = {
+        "state": "IDLE",
+        "rep_count": 0,
+        "completed_rep": False,
+        "rep_score": None,
+        "feedback": [],
+        "avg_form_score": 0.0,
+        "angles": {"knee": 170.04, "hip": 165.0},
+        "frame_number": frame_number,
+        "seq": frame_number,
+        "dropped_frames": 0,
+        "model_complexity": 1,
+        "skipped_frames": 0,
+        "interpolated_frames": 0,
+    }
+    response.update(overrides)
+    return response
+
+
+def encode(responder, response, landmarks=None, overlay=False) -> dict:
+    return msgpack.unpackb(responder.encode_frame(response, landmarks, overlay))
+
+
+class TestQuantize:
+    def test_round_trip(self):
+        landmarks = make_landmarks()
+        payload = quantize_landmarks(landmarks)
+        assert len(payload) == len(LANDMARK_NAMES) * 3 * 2
+
+        values = dequantize_landmarks(payload)
+        expected = landmarks.data[:, [Landmarks.X, Landmarks.Y, Landmarks.VISIBILITY]]
+        np.testing.assert_allclose(values, expected, atol=1 / 65535)
+
+    def test_out_of_frame_clipped(self):
+        landmarks = make_landmarks()
+        landmarks.data[0, Landmarks.X] = -0.2
+        landmarks.data[1, Landmarks.X] = 1.3
+        values = dequantize_landmarks(quantize_landmarks(landmarks))
+        assert values[0, 0] == 0.0
+        assert values[1, 0] == 1.0
+
+
+class TestCompactResponder:
+    def test_first_frame_carries_everything(self):
+        message = encode(CompactResponder(), make_response(1))
+        assert message["f"] == 1
+        assert message["q"] == 1
+        assert message["s"] == "IDLE"
+        assert message["r"] == 0
+        assert message["fb"] == []
+        assert message["an"] == {"knee": 1700, "hip": 1650}
+        assert "c" not in message
+
+    def test_unchanged_fields_omitted(self):
+        responder = CompactResponder()
+        encode(responder, make_response(1))
+        message = encode(responder, make_response(2))
+        assert message == {"f": 2, "q": 2}
+
+    def test_only_changes_sent(self):
+        responder = CompactResponder()
+        encode(responder, make_response(1))
+        message = encode(
+            responder,
+            make_response(2, state="DOWN", angles={"knee": 120.0, "hip": 165.0}),
+        )
+        assert message["s"] == "DOWN"
+        assert message["an"] == {"knee": 1200}
+        assert "r" not in message
+
+    def test_completed_rep(self):
+        responder = CompactResponder()
+        encode(responder, make_response(1))
+        message = encode(
+            responder,
+            make_response(2, rep_count=1, completed_rep=True, rep_score=87.5),
+        )
+        assert message["r"] == 1
+        assert message["c"] is True
+        assert message["rs"] == 87.5
+
+    def test_lost_angles_cleared(self):
+        responder = CompactResponder()
+        encode(responder, make_response(1))
+        message = encode(responder, make_response(2, angles={"knee": 170.0}))
+        assert message["an"] == {"hip": None}
+
+    def test_landmarks_only_with_overlay(self):
+        responder = CompactResponder()
+        landmarks = make_landmarks()
+        assert "l" not in encode(responder, make_response(1), landmarks)
+
+        message = encode(responder, make_response(2), landmarks, overlay=True)
+        assert message["l"] == quantize_landmarks(landmarks)
+
+    def test_lost_pose_sent_once(self):
+        responder = CompactResponder()
+        encode(responder, make_response(1), make_landmarks(), overlay=True)
+        assert encode(responder, make_response(2), None, overlay=True)["l"] is None
+        assert "l" not in encode(responder, make_response(3), None, overlay=True)
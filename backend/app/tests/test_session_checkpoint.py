@@ -0,0 +1,242 @@
+"""Tests for resumable exercise session checkpoints."""
+
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.models.exercise import ExerciseSegment, ExerciseSessionCheckpoint
+from app.services.exercise_session_service import ExerciseSessionService
+from app.services.exercise_tracker import BicepCurlTracker, SquatTracker
+from app.services.session_checkpoint_service import (
+    SessionCheckpointer,
+    SessionCheckpointService,
+)
+
+
+def make_checkpoint(rep_count: int = 2, owner: str = "socket-a", **overrides):
+    tracker = SquatTracker()
+    tracker.rep_count = rep_count
+    tracker.form_scores = [80.0, 90.0][:rep_count]
+    fields = {
+        "token": "tok",
+        "owner": owner,
+        "member_id": "m1",
+        "exercise": "squat",
+        "tracker": tracker.snapshot(),
+        "rep_details": [
+            {"rep_number": i + 1, "score": 85.0, "feedback": []}
+            for i in range(rep_count)
+        ],
+        "frame_count": 120,
+        "duration_seconds": 30,
+        "started_at": datetime(2026, 1, 1, 9, 0),
+        **overrides,
+    }
+    return ExerciseSessionCheckpoint(**fields)
+
+
+class TestSessionCheckpointService:
+    @pytest.mark.asyncio
+    async def test_claim_is_exclusive(self, fake_redis):
+        await SessionCheckpointService.save(make_checkpoint())
+        first = await SessionCheckpointService.claim("tok", "socket-b")
+        assert first.tracker["rep_count"] == 2
+        assert first.started_at == datetime(2026, 1, 1, 9, 0)
+        assert await SessionCheckpointService.claim("tok", "socket-c") is None
+        assert await SessionCheckpointService.owned_by("tok", "socket-b")
+
+    @pytest.mark.asyncio
+    async def test_superseded_owner_cannot_write(self, fake_redis):
+        await SessionCheckpointService.save(make_checkpoint())
+        await SessionCheckpointService.claim("tok", "socket-b")
+        assert not await SessionCheckpointService.save(make_checkpoint(rep_count=1))
+        assert await SessionCheckpointService.save(make_checkpoint(owner="socket-b"))
+        stored = json.loads(fake_redis.data["exercise_session:tok"])
+        assert stored["owner"] == "socket-b"
+
+    @pytest.mark.asyncio
+    async def test_finished_session_cannot_be_recreated(self, fake_redis):
+        await SessionCheckpointService.save(make_checkpoint())
+        assert await SessionCheckpointService.claim_owned("tok", "socket-a")
+        assert not await SessionCheckpointService.save(make_checkpoint())
+        assert await SessionCheckpointService.claim("tok", "socket-b") is None
+        assert not await SessionCheckpointService.owned_by("tok", "socket-a")
+
+    @pytest.mark.asyncio
+    async def test_stored_as_json(self, fake_redis):
+        await SessionCheckpointService.save(make_checkpoint())
+        stored = json.loads(fake_redis.data["exercise_session:tok"])
+        assert stored["member_id"] == "m1"
+
+    @pytest.mark.asyncio
+    async def test_owned_by(self, fake_redis):
+        assert await SessionCheckpointService.owned_by("tok", "socket-a")
+        await SessionCheckpointService.save(make_checkpoint(owner="socket-b"))
+        assert not await SessionCheckpointService.owned_by("tok", "socket-a")
+        assert await SessionCheckpointService.owned_by("tok", "socket-b")
+
+    @pytest.mark.asyncio
+    async def test_finish_saves_session(self):
+        with patch(
+            "app.services.session_checkpoint_service.ExerciseSessionService.save_segments",
+            new_callable=AsyncMock,
+        ) as save:
+            await SessionCheckpointService.finish(make_checkpoint())
+        [segment] = save.call_args.args[1]
+        assert segment.exercise == "squat"
+        assert segment.tracker["rep_count"] == 2
+        assert segment.duration_seconds == 30
+        performance = save.call_args.kwargs["performance"]
+        assert performance["fps"] == 4.0
+        assert performance["stages"] == {}
+
+    @pytest.mark.asyncio
+    async def test_finish_skips_anonymous_sessions(self):
+        with patch(
+            "app.services.session_checkpoint_service.ExerciseSessionService.save_segments",
+            new_callable=AsyncMock,
+        ) as save:
+            await SessionCheckpointService.finish(
+                make_checkpoint(member_id="anonymous")
+            )
+        save.assert_not_called()
+
+    def test_all_segments(self):
+        curls = BicepCurlTracker()
+        curls.rep_count = 1
+        squats = ExerciseSegment(
+            exercise="squat",
+            tracker=SquatTracker().snapshot(),
+            started_at=datetime(2026, 1, 1, 9, 0),
+            duration_seconds=20,
+        )
+        checkpoint = make_checkpoint(
+            exercise="bicep_curl",
+            tracker=curls.snapshot(),
+            segments=[squats],
+            segment_offset=20,
+        )
+        first, current = checkpoint.all_segments()
+        assert first == squats
+        assert current.exercise == "bicep_curl"
+        assert current.started_at == datetime(2026, 1, 1, 9, 0, 20)
+        assert current.duration_seconds == 10
+
+    @pytest.mark.asyncio
+    async def test_resumed_session_not_finished(self, fake_redis):
+        await SessionCheckpointService.save(make_checkpoint())
+        # Resumed elsewhere: claimed and saved again by the new socket
+        checkpoint = await SessionCheckpointService.claim("tok", "socket-b")
+        checkpoint.owner = "socket-b"
+        await SessionCheckpointService.save(checkpoint)
+        with patch.object(
+            SessionCheckpointService, "finish", new_callable=AsyncMock
+        ) as finish:
+            await SessionCheckpointService.finish_after("tok", "socket-a", 0)
+        finish.assert_not_called()
+        assert await SessionCheckpointService.owned_by("tok", "socket-b")
+
+    @pytest.mark.asyncio
+    async def test_claim_owned(self, fake_redis):
+        await SessionCheckpointService.save(make_checkpoint(owner="socket-b"))
+        assert await SessionCheckpointService.claim_owned("tok", "socket-a") is None
+        assert "exercise_session:tok" in fake_redis.data
+        claimed = await SessionCheckpointService.claim_owned("tok", "socket-b")
+        assert claimed.owner == "socket-b"
+        assert json.loads(fake_redis.data["exercise_session:tok"]) == {"finished": True}
+
+    @pytest.mark.asyncio
+    async def test_abandoned_session_finished(self, fake_redis):
+        await SessionCheckpointService.save(make_checkpoint())
+        with patch.object(
+            SessionCheckpointService, "finish", new_callable=AsyncMock
+        ) as finish:
+            await SessionCheckpointService.finish_after("tok", "socket-a", 0)
+        finish.assert_called_once()
+        assert await SessionCheckpointService.claim("tok", "socket-b") is None
+
+
+class TestSaveSegments:
+    @staticmethod
+    def segment(exercise: str, tracker_cls, reps: int) -> ExerciseSegment:
+        tracker = tracker_cls()
+        tracker.rep_count = reps
+        tracker.form_scores = [80.0] * reps
+        return ExerciseSegment(
+            exercise=exercise,
+            tracker=tracker.snapshot(),
+            rep_details=[
+                {"rep_number": i + 1, "score": 80.0, "feedback": []}
+                for i in range(reps)
+            ],
+            started_at=datetime(2026, 1, 1, 9, 0),
+            duration_seconds=10,
+        )
+
+    @pytest.mark.asyncio
+    async def test_one_write_per_circuit(self):
+        collection = AsyncMock()
+        collection.insert_many.return_value = MagicMock(
+            inserted_ids=[ObjectId(), ObjectId()]
+        )
+        segments = [
+            self.segment("squat", SquatTracker, 3),
+            self.segment("squat", SquatTracker, 0),
+            self.segment("bicep_curl", BicepCurlTracker, 2),
+        ]
+        with patch(
+            "app.services.exercise_session_service.get_database",
+            return_value={"exercise_sessions": collection},
+        ):
+            saved = await ExerciseSessionService.save_segments(
+                "m1", segments, performance={"frames": 10}
+            )
+
+        collection.insert_many.assert_awaited_once()
+        collection.insert_one.assert_not_called()
+        # Blocks without reps are not saved
+        assert [s.exercise for s in saved] == ["squat", "bicep_curl"]
+        assert [s.total_reps for s in saved] == [3, 2]
+        assert [s.segment for s in saved] == [1, 2]
+        assert saved[0].circuit_id and saved[0].circuit_id == saved[1].circuit_id
+        assert saved[1].performance == {"frames": 10}
+
+    @pytest.mark.asyncio
+    async def test_single_exercise_is_not_a_circuit(self):
+        collection = AsyncMock()
+        collection.insert_many.return_value = MagicMock(inserted_ids=[ObjectId()])
+        with patch(
+            "app.services.exercise_session_service.get_database",
+            return_value={"exercise_sessions": collection},
+        ):
+            [saved] = await ExerciseSessionService.save_segments(
+                "m1", [self.segment("squat", SquatTracker, 1)]
+            )
+        assert saved.circuit_id is None
+        assert saved.segment is None
+
+    @pytest.mark.asyncio
+    async def test_nothing_to_save(self):
+        with patch(
+            "app.services.exercise_session_service.get_database"
+        ) as get_database:
+            assert (
+                await ExerciseSessionService.save_segments(
+                    "m1", [self.segment("squat", SquatTracker, 0)]
+                )
+                == []
+            )
+        get_database.assert_not_called()
+
+
+class TestSessionCheckpointer:
+    @pytest.mark.asyncio
+    async def test_rate_limited(self, fake_redis):
+        checkpointer = SessionCheckpointer(interval=60)
+        assert checkpointer.due()
+        await checkpointer.save(make_checkpoint())
+        assert not checkpointer.due()
+        assert checkpointer.writes == 1
@@ -0,0 +1,293 @@
+"""Tests for offline video upload analysis."""
+
+import asyncio
+import io
+import json
+import math
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.models.exercise import VideoAnalysisJob, VideoAnalysisStatus
+from app.services.pose_engine import Landmarks
+from app.services.video_analysis_service import VideoAnalysisService, _save_upload
+
+# One full squat rep, as knee angles per frame
+SQUAT_REP = [170, 165, 130, 100, 80, 85, 120, 150, 165, 170]
+
+
+def squat_landmarks(knee_angle: float) -> Landmarks:
+    """Both legs bent to `knee_angle` (hip straight above the knee)."""
+    phi = math.radians(180 - knee_angle)
+    points = {}
+    for side, x in (("LEFT", 0.4), ("RIGHT", 0.6)):
+        points[f"{side}_HIP"] = (x, 0.3)
+        points[f"{side}_KNEE"] = (x, 0.5)
+        points[f"{side}_ANKLE"] = (x + 0.2 * math.sin(phi), 0.5 + 0.2 * math.cos(phi))
+    return Landmarks.from_dict(
+        {
+            n: {"x": x, "y": y, "z": 0.0, "visibility": 0.9}
+            for n, (x, y) in points.items()
+        }
+    )
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.workers = [SimpleNamespace(worker_id=0), SimpleNamespace(worker_id=1)]
+        self.leases = [SimpleNamespace(worker=w, engine_slot=0) for w in self.workers]
+        self.released = []
+        # First-pixel values each lease was asked to infer, in order
+        self.seen: dict[int, list[int]] = {}
+
+    async def checkout(self, timeout):
+        if not self.leases:
+            raise asyncio.TimeoutError()
+        return self.leases.pop(0)
+
+    def release(self, lease):
+        self.released.append(lease)
+
+    async def infer(self, lease, frame, exercise):
+        angle = float(frame[0, 0, 0])
+        self.seen.setdefault(lease.worker.worker_id, []).append(int(angle))
+        return squat_landmarks(angle), {}, {"model_complexity": 1}
+
+
+def fake_video(frames: list[np.ndarray]):
+    """iter_video_frames stand-in serving [start, stop) of `frames`."""
+
+    def iter_frames(path, target_width, target_height, start=0, stop=None):
+        return iter(frames[start:stop])
+
+    return iter_frames
+
+
+@pytest.fixture(autouse=True)
+def engine_slots():
+    """A fresh node-wide video engine cap per test."""
+    with patch("app.services.video_analysis_service._engine_slots", None):
+        yield
+
+
+def make_job() -> VideoAnalysisJob:
+    return VideoAnalysisJob(
+        job_id="abc",
+        status=VideoAnalysisStatus.QUEUED,
+        exercise="squat",
+        member_id="m1",
+        created_at=datetime(2025, 6, 1),
+    )
+
+
+class TestVideoAnalysisEndpoints:
+    @pytest.mark.asyncio
+    async def test_upload_queues_job(self, client, mock_redis):
+        with patch.object(VideoAnalysisService, "run_job", new_callable=AsyncMock):
+            response = await client.post(
+                "/api/exercises/analyze",
+                data={"exercise": "squat", "member_id": "507f1f77bcf86cd799439011"},
+                files={"file": ("set.mp4", b"\x00" * 1024, "video/mp4")},
+            )
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "queued"
+        assert data["exercise"] == "squat"
+        mock_redis.set.assert_called()
+
+    @pytest.mark.asyncio
+    async def test_upload_over_limit(self, client, mock_redis):
+        with (
+            patch.object(settings, "video_max_upload_mb", 1),
+            patch("app.services.video_analysis_service._UPLOAD_CHUNK", 1024),
+            patch.object(VideoAnalysisService, "run_job", new_callable=AsyncMock),
+        ):
+            response = await client.post(
+                "/api/exercises/analyze",
+                data={"exercise": "squat", "member_id": "m1"},
+                files={"file": ("set.mp4", b"\x00" * (1024 * 1024 + 1), "video/mp4")},
+            )
+        assert response.status_code == 400
+        assert "1 MB limit" in response.json()["detail"]
+        mock_redis.set.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_upload_unknown_exercise(self, client):
+        response = await client.post(
+            "/api/exercises/analyze",
+            data={"exercise": "jumping_jacks", "member_id": "m1"},
+            files={"file": ("set.mp4", b"\x00", "video/mp4")},
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_get_job(self, client, mock_redis):
+        job = VideoAnalysisJob(
+            job_id="abc",
+            status=VideoAnalysisStatus.PROCESSING,
+            exercise="squat",
+            member_id="m1",
+            progress=0.5,
+            created_at=datetime(2025, 6, 1),
+        )
+        mock_redis.get = AsyncMock(return_value=job.model_dump_json())
+        response = await client.get("/api/exercises/analyze/abc")
+        assert response.status_code == 200
+        assert response.json()["progress"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_get_job_not_found(self, client):
+        response = await client.get("/api/exercises/analyze/missing")
+        assert response.status_code == 404
+
+
+class TestSaveUpload:
+    def test_stops_reading_past_limit(self, tmp_path):
+        source = io.BytesIO(b"\x00" * 10_000)
+        with (
+            patch("app.services.video_analysis_service._UPLOAD_CHUNK", 1000),
+            patch("tempfile.tempdir", str(tmp_path)),
+            pytest.raises(ValueError, match="limit"),
+        ):
+            _save_upload(source, ".mp4", max_bytes=2500)
+        # Gave up at the third chunk and removed the partial copy
+        assert source.tell() == 3000
+        assert list(tmp_path.iterdir()) == []
+
+    def test_copies_within_limit(self, tmp_path):
+        with patch("tempfile.tempdir", str(tmp_path)):
+            path = _save_upload(io.BytesIO(b"video"), ".mp4", max_bytes=5)
+        with open(path, "rb") as saved:
+            assert saved.read() == b"video"
+
+
+class TestVideoAnalysisPipeline:
+    @pytest.mark.asyncio
+    async def test_counts_reps_and_saves_session(self, tmp_path):
+        # Each fake frame carries its knee angle in the first pixel
+        frames = [np.full((4, 4, 3), a, dtype=np.uint8) for a in SQUAT_REP * 2]
+        video = tmp_path / "set.mp4"
+        video.write_bytes(b"")
+        executor = FakeExecutor()
+        saved = MagicMock(id="507f1f77bcf86cd799439022")
+        job = make_job()
+
+        with (
+            patch(
+                "app.services.video_analysis_service.get_pose_executor",
+                return_value=executor,
+            ),
+            patch("app.services.video_analysis_service.CV2_AVAILABLE", True),
+            patch(
+                "app.services.video_analysis_service.probe_video",
+                return_value=(len(frames), 10.0),
+            ),
+            patch(
+                "app.services.video_analysis_service.iter_video_frames",
+                side_effect=fake_video(frames),
+            ),
+            patch(
+                "app.services.video_analysis_service.RedisService.set_cached",
+                new_callable=AsyncMock,
+            ) as set_cached,
+            patch(
+                "app.services.video_analysis_service.ExerciseSessionService.save_session",
+                new_callable=AsyncMock,
+                return_value=saved,
+            ) as save_session,
+        ):
+            await VideoAnalysisService.run_job(job, str(video))
+
+        assert job.status == VideoAnalysisStatus.COMPLETED, job.error
+        assert job.frames_processed == len(frames)
+        assert job.total_reps == 2
+        assert job.session_id == saved.id
+        assert job.fps > 0
+        assert len(executor.released) == 2
+        assert save_session.call_args.kwargs["duration_seconds"] == 2
+        assert (
+            json.loads(json.dumps(set_cached.call_args.args[1]))["status"]
+            == "completed"
+        )
+        assert not video.exists()
+        # Each engine tracked one contiguous rep
+        assert executor.seen == {0: SQUAT_REP, 1: SQUAT_REP}
+
+    async def run_frames(self, tmp_path, frames, total_frames):
+        video = tmp_path / "set.mp4"
+        video.write_bytes(b"")
+        executor = FakeExecutor()
+        job = make_job()
+        with (
+            patch(
+                "app.services.video_analysis_service.get_pose_executor",
+                return_value=executor,
+            ),
+            patch("app.services.video_analysis_service.CV2_AVAILABLE", True),
+            patch(
+                "app.services.video_analysis_service.probe_video",
+                return_value=(total_frames, 10.0),
+            ),
+            patch(
+                "app.services.video_analysis_service.iter_video_frames",
+                side_effect=fake_video(frames),
+            ),
+            patch(
+                "app.services.video_analysis_service.RedisService.set_cached",
+                new_callable=AsyncMock,
+            ),
+        ):
+            await VideoAnalysisService.run_job(job, str(video))
+        assert job.status == VideoAnalysisStatus.COMPLETED, job.error
+        return executor, job
+
+    @pytest.mark.asyncio
+    async def test_engines_capped_per_node(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "video_analysis_max_engines", 1)
+        frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(12)]
+        executor, job = await self.run_frames(tmp_path, frames, len(frames))
+        assert executor.seen == {0: list(range(12))}
+        assert len(executor.released) == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_frame_count_runs_one_lane(self, tmp_path):
+        frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(12)]
+        executor, job = await self.run_frames(tmp_path, frames, None)
+        assert executor.seen == {0: list(range(12))}
+        assert job.frames_processed == 12
+
+    @pytest.mark.asyncio
+    async def test_short_frame_count_reads_to_end(self, tmp_path):
+        frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(12)]
+        executor, job = await self.run_frames(tmp_path, frames, 8)
+        assert executor.seen == {0: list(range(4)), 1: list(range(4, 12))}
+        assert job.frames_processed == 12
+
+    @pytest.mark.asyncio
+    async def test_fails_without_pose_engine(self, tmp_path):
+        video = tmp_path / "set.mp4"
+        video.write_bytes(b"")
+        job = VideoAnalysisJob(
+            job_id="abc",
+            status=VideoAnalysisStatus.QUEUED,
+            exercise="squat",
+            member_id="m1",
+            created_at=datetime(2025, 6, 1),
+        )
+        with (
+            patch(
+                "app.services.video_analysis_service.get_pose_executor",
+                return_value=None,
+            ),
+            patch(
+                "app.services.video_analysis_service.RedisService.set_cached",
+                new_callable=AsyncMock,
+            ),
+        ):
+            await VideoAnalysisService.run_job(job, str(video))
+        assert job.status == VideoAnalysisStatus.FAILED
+        assert "not available" in job.error
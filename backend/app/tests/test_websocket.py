@@ -0,0 +1,476 @@
+"""Tests for the real-time exercise WebSocket endpoint."""
+
+import asyncio
+import base64
+import io
+import json
+import math
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import msgpack
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.services.admission import AdmissionController
+from app.services.capture_control import CAPTURE_PROFILES
+from app.services.frame_protocol import (
+    FLAG_OVERLAY,
+    SUBPROTOCOL_BINARY,
+    SUBPROTOCOL_COMPACT,
+    SUBPROTOCOL_JSON,
+    encode_binary,
+)
+from app.services.pose_executor import PoseWorkerLost
+from app.services.session_checkpoint_service import SessionCheckpointService
+
+
+@pytest.fixture
+def ws_client():
+    """Sync test client with no pose executor running."""
+    with patch("app.api.websocket.get_pose_executor", return_value=None):
+        yield TestClient(app)
+
+
+class TestExerciseWebSocket:
+    def test_unknown_exercise_rejected(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/jumping_jacks") as ws:
+            assert "Unknown exercise" in ws.receive_json()["error"]
+
+    def test_unknown_frame_policy_rejected(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat?frames=random") as ws:
+            assert "Unknown frame policy" in ws.receive_json()["error"]
+
+    def test_invalid_json(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_text("not json")
+            assert ws.receive_json() == {"error": "Invalid JSON"}
+
+    def test_missing_frame(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"hello": "world"})
+            assert ws.receive_json() == {"error": "Missing 'frame' field"}
+
+    def test_frame_response(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat?frames=ordered") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"frame": "aGVsbG8="})
+            data = ws.receive_json()
+            assert data["state"] == "IDLE"
+            assert data["rep_count"] == 0
+            assert data["frame_number"] == 1
+            assert data["dropped_frames"] == 0
+            assert data["landmarks"] is None
+            assert data["queue_depths"] == {"receive": 0, "send": 0}
+
+    def test_timings_echoed_on_request(self, ws_client):
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat?frames=ordered&timings=1"
+        ) as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"frame": "aGVsbG8="})
+            timings = ws.receive_json()["timings"]
+            assert {"parse", "tracker", "frame"} <= set(timings)
+            assert timings["frame"] >= timings["parse"]
+
+    def test_timings_not_echoed_by_default(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"frame": "aGVsbG8="})
+            assert "timings" not in ws.receive_json()
+
+    def test_capture_profile_sent_on_connect(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            assert ws.receive_json() == {"type": "capture", **CAPTURE_PROFILES[1]}
+
+    def test_binary_subprotocol(self, ws_client):
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat?frames=ordered",
+            subprotocols=[SUBPROTOCOL_JSON, SUBPROTOCOL_BINARY],
+        ) as ws:
+            assert ws.accepted_subprotocol == SUBPROTOCOL_BINARY
+            ws.receive_json()  # capture profile
+            ws.send_bytes(encode_binary(b"\xff\xd8jpeg", seq=41))
+            data = ws.receive_json()
+            assert data["frame_number"] == 1
+            assert data["seq"] == 41
+
+    def test_binary_frame_too_short(self, ws_client):
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat", subprotocols=[SUBPROTOCOL_BINARY]
+        ) as ws:
+            ws.receive_json()  # capture profile
+            ws.send_bytes(b"\x00\x01")
+            assert ws.receive_json() == {"error": "Frame shorter than its header"}
+
+    def test_compact_subprotocol(self, ws_client):
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat?frames=ordered",
+            subprotocols=[SUBPROTOCOL_COMPACT, SUBPROTOCOL_BINARY],
+        ) as ws:
+            assert ws.accepted_subprotocol == SUBPROTOCOL_COMPACT
+            capture = msgpack.unpackb(ws.receive_bytes())
+            assert capture["type"] == "capture"
+
+            ws.send_bytes(encode_binary(b"\xff\xd8jpeg", seq=1))
+            first = msgpack.unpackb(ws.receive_bytes())
+            assert first["f"] == 1
+            assert first["q"] == 1
+            assert first["s"] == "IDLE"
+            assert first["r"] == 0
+            assert "l" not in first
+
+            ws.send_bytes(encode_binary(b"\xff\xd8jpeg", seq=2, flags=FLAG_OVERLAY))
+            second = msgpack.unpackb(ws.receive_bytes())
+            assert second["f"] == 2
+            assert "s" not in second
+            assert "r" not in second
+
+    def test_unknown_pose_source_rejected(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat?pose=gpu") as ws:
+            assert "Unsupported pose source" in ws.receive_json()["error"]
+
+    def test_client_landmarks(self, ws_client):
+        # Standing: hip, knee and ankle in a vertical line → knee angle ~180
+        rows = [[0.5, 0.1 + 0.06 * i, 0.0, 0.9] for i in range(13)]
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat?pose=client&frames=ordered"
+        ) as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"landmarks": rows})
+            data = ws.receive_json()
+            assert data["frame_number"] == 1
+            assert data["angles"]["primary"] > 175
+            assert data["landmarks"] is None
+
+            ws.send_json({"landmarks": [[0.5, 0.5, 0.0, 2.0]] * 13})
+            assert "visibility" in ws.receive_json()["error"]
+
+    def test_landmarks_need_client_mode(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"landmarks": None})
+            assert ws.receive_json() == {"error": "Landmark messages need pose=client"}
+
+
+class TestAdmission:
+    def test_rejected_at_capacity(self, ws_client):
+        full = AdmissionController(max_sessions=1, queue_size=0, queue_timeout=0)
+        full.live = 1
+        with patch("app.api.websocket.get_admission", return_value=full):
+            with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+                assert ws.receive_json() == {
+                    "error": "Server at capacity",
+                    "retry_after": 10,
+                }
+                with pytest.raises(WebSocketDisconnect) as closed:
+                    ws.receive_json()
+        assert closed.value.code == 1013
+        assert closed.value.reason == "retry-after=10"
+        assert full.live == 1
+
+    def test_slot_released_on_disconnect(self, ws_client):
+        admission = AdmissionController(max_sessions=1, queue_size=0, queue_timeout=0)
+        with patch("app.api.websocket.get_admission", return_value=admission):
+            with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+                ws.receive_json()  # capture profile
+                assert admission.live == 1
+        assert admission.live == 0
+
+    def test_released_when_client_leaves_during_setup(self, ws_client):
+        admission = AdmissionController(max_sessions=1, queue_size=0, queue_timeout=0)
+        executor = MagicMock()
+        executor.checkout = AsyncMock(return_value="lease")
+        with (
+            patch("app.api.websocket.get_admission", return_value=admission),
+            patch("app.api.websocket.get_pose_executor", return_value=executor),
+            patch(
+                "app.api.websocket.CaptureController.message",
+                side_effect=WebSocketDisconnect(1001),
+            ),
+        ):
+            with pytest.raises(WebSocketDisconnect):
+                with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+                    ws.receive_json()
+        assert admission.live == 0
+        executor.release.assert_called_once_with("lease")
+
+
+class TestPoseWorkerLoss:
+    def test_lost_engine_replaced_on_next_frame(self, ws_client):
+        executor = MagicMock(load=0.0)
+        executor.checkout = AsyncMock(side_effect=["lease-a", "lease-b"])
+        executor.infer = AsyncMock(
+            side_effect=[PoseWorkerLost("Pose worker died"), (None, {}, {})]
+        )
+        with patch("app.api.websocket.get_pose_executor", return_value=executor):
+            with ws_client.websocket_connect("/ws/exercise/squat?frames=ordered") as ws:
+                ws.receive_json()  # capture profile
+                for color in ((200, 40, 40), (40, 200, 40)):
+                    buf = io.BytesIO()
+                    Image.new("RGB", (64, 48), color).save(buf, "JPEG")
+                    ws.send_json({"frame": base64.b64encode(buf.getvalue()).decode()})
+                    ws.receive_json()
+        assert [c.args[0] for c in executor.infer.await_args_list] == [
+            "lease-a",
+            "lease-b",
+        ]
+        executor.release.assert_called_once_with("lease-b")
+
+
+class TestResumableSessions:
+    SQUAT_REP = [170, 165, 140, 110, 85, 88, 120, 150, 162, 165]
+
+    @staticmethod
+    def landmarks(knee_angle: float) -> list:
+        """13 landmark rows with the given angle at both knees."""
+        rows = [[0.5, 0.5, 0.0, 0.9] for _ in range(13)]
+        bend = math.radians(180 - knee_angle)
+        for hip, knee, ankle in ((7, 9, 11), (8, 10, 12)):
+            rows[hip][:2] = [0.5, 0.3]
+            rows[knee][:2] = [0.5, 0.5]
+            rows[ankle][:2] = [0.5 + 0.2 * math.sin(bend), 0.5 + 0.2 * math.cos(bend)]
+        return rows
+
+    def test_resume_keeps_rep_count(self, ws_client, fake_redis):
+        url = "/ws/exercise/squat?pose=client&frames=ordered&member_id=m1"
+        with ws_client.websocket_connect(url) as ws:
+            session = ws.receive_json()
+            assert session["type"] == "session"
+            assert session["resumed"] is False
+            ws.receive_json()  # capture profile
+            for angle in self.SQUAT_REP:
+                ws.send_json({"landmarks": self.landmarks(angle)})
+                data = ws.receive_json()
+            assert data["rep_count"] == 1
+            token = session["token"]
+            # Simulate a dropped connection rather than a normal close
+            ws.close(code=1006)
+
+        with ws_client.websocket_connect(f"{url}&session={token}") as ws:
+            session = ws.receive_json()
+            assert session == {
+                "type": "session",
+                "token": token,
+                "resumed": True,
+                "rep_count": 1,
+            }
+            ws.receive_json()  # capture profile
+            ws.send_json({"landmarks": self.landmarks(170)})
+            data = ws.receive_json()
+            assert data["rep_count"] == 1
+            assert data["frame_number"] == len(self.SQUAT_REP) + 1
+
+    def test_dropped_socket_does_not_finish_resumed_session(
+        self, ws_client, fake_redis
+    ):
+        url = "/ws/exercise/squat?pose=client&frames=ordered&member_id=m1"
+        with patch(
+            "app.api.websocket.SessionCheckpointService.schedule_finish"
+        ) as schedule_finish:
+            with ws_client.websocket_connect(url) as ws:
+                token = ws.receive_json()["token"]
+                ws.receive_json()  # capture profile
+                for angle in self.SQUAT_REP:
+                    ws.send_json({"landmarks": self.landmarks(angle)})
+                    ws.receive_json()
+                ws.close(code=1006)
+            dropped_owner = schedule_finish.call_args.args[1]
+
+            with ws_client.websocket_connect(f"{url}&session={token}") as ws:
+                assert ws.receive_json()["resumed"] is True
+                ws.receive_json()  # capture profile
+                # The dropped socket's grace period runs out mid-session
+                with patch(
+                    "app.services.session_checkpoint_service.ExerciseSessionService.save_segments",
+                    new_callable=AsyncMock,
+                ) as finalized:
+                    asyncio.run(
+                        SessionCheckpointService.finish_after(token, dropped_owner, 0)
+                    )
+                finalized.assert_not_called()
+                assert f"exercise_session:{token}" in fake_redis.data
+                ws.send_json({"landmarks": self.landmarks(170)})
+                assert ws.receive_json()["rep_count"] == 1
+
+    @pytest.mark.parametrize("code", [1000, 1005])
+    def test_clean_close_is_not_resumable(self, ws_client, fake_redis, code):
+        url = "/ws/exercise/squat?pose=client&frames=ordered&member_id=m1"
+        with patch(
+            "app.api.websocket.SessionCheckpointService.schedule_finish"
+        ) as schedule_finish:
+            with ws_client.websocket_connect(url) as ws:
+                token = ws.receive_json()["token"]
+                ws.receive_json()  # capture profile
+                ws.close(code=code)
+        schedule_finish.assert_not_called()
+        finished = json.loads(fake_redis.data[f"exercise_session:{token}"])
+        assert finished == {"finished": True}
+
+    def test_superseded_socket_does_not_save_twice(self, ws_client, fake_redis):
+        url = "/ws/exercise/squat?pose=client&frames=ordered&member_id=m1"
+        # One class serves both the socket and the grace-period finalizer
+        with patch(
+            "app.api.websocket.ExerciseSessionService.save_segments",
+            new_callable=AsyncMock,
+        ) as save:
+            # The old socket is half-open while the client resumes elsewhere
+            with ws_client.websocket_connect(url) as old:
+                token = old.receive_json()["token"]
+                old.receive_json()  # capture profile
+                for angle in self.SQUAT_REP:
+                    old.send_json({"landmarks": self.landmarks(angle)})
+                    old.receive_json()
+                key = f"exercise_session:{token}"
+                old_owner = json.loads(fake_redis.data[key])["owner"]
+
+                with ws_client.websocket_connect(f"{url}&session={token}") as new:
+                    assert new.receive_json()["resumed"] is True
+                    new.receive_json()  # capture profile
+                    new.close(code=1000)
+                save.assert_awaited_once()
+
+                old.close(code=1006)
+            asyncio.run(SessionCheckpointService.finish_after(token, old_owner, 0))
+
+        save.assert_awaited_once()
+        assert json.loads(fake_redis.data[key]) == {"finished": True}
+
+    def test_other_member_cannot_resume(self, ws_client, fake_redis):
+        with ws_client.websocket_connect("/ws/exercise/squat?member_id=m1") as ws:
+            token = ws.receive_json()["token"]
+            ws.close(code=1006)
+
+        with ws_client.websocket_connect(
+            f"/ws/exercise/squat?member_id=m2&session={token}"
+        ) as ws:
+            assert "another member" in ws.receive_json()["error"]
+        assert f"exercise_session:{token}" in fake_redis.data
+
+    def test_not_resumable_without_redis(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            assert ws.receive_json()["type"] == "capture"
+
+
+class TestCircuit:
+    def test_switch_exercise_keeps_socket(self, ws_client):
+        url = "/ws/exercise/squat?pose=client&frames=ordered&member_id=m1"
+        with patch(
+            "app.api.websocket.ExerciseSessionService.save_segments",
+            new_callable=AsyncMock,
+        ) as save:
+            with ws_client.websocket_connect(url) as ws:
+                ws.receive_json()  # capture profile
+                for angle in TestResumableSessions.SQUAT_REP:
+                    ws.send_json({"landmarks": TestResumableSessions.landmarks(angle)})
+                    assert "rep_count" in ws.receive_json()
+
+                ws.send_json({"type": "exercise", "exercise": "bicep_curl"})
+                assert ws.receive_json() == {
+                    "type": "exercise",
+                    "exercise": "bicep_curl",
+                    "segment": 2,
+                    "rep_count": 0,
+                }
+                ws.send_json({"landmarks": TestResumableSessions.landmarks(170)})
+                data = ws.receive_json()
+                assert data["rep_count"] == 0
+                assert data["frame_number"] == len(TestResumableSessions.SQUAT_REP) + 1
+
+        squats, curls = save.call_args.args[1]
+        assert squats.exercise == "squat"
+        assert squats.tracker["rep_count"] == 1
+        assert len(squats.rep_details) == 1
+        assert curls.exercise == "bicep_curl"
+        assert curls.rep_details == []
+
+    def test_unknown_exercise_keeps_current(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"type": "exercise", "exercise": "burpee"})
+            assert "Unknown exercise" in ws.receive_json()["error"]
+            ws.send_json({"type": "exercise"})
+            assert ws.receive_json() == {"error": "Missing 'exercise' field"}
+            ws.send_json({"type": "exercise", "exercise": "squat"})
+            assert ws.receive_json()["segment"] == 1
+
+    def test_binary_frame_without_subprotocol(self, ws_client):
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_bytes(encode_binary(b"\xff\xd8jpeg", seq=1))
+            assert ws.receive_json() == {
+                "error": f"Binary frames need the {SUBPROTOCOL_BINARY} subprotocol"
+            }
+            # The session survives the bad frame
+            ws.send_json({"type": "exercise", "exercise": "squat"})
+            assert ws.receive_json()["type"] == "exercise"
+
+    def test_control_text_on_binary_socket(self, ws_client):
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat", subprotocols=[SUBPROTOCOL_BINARY]
+        ) as ws:
+            ws.receive_json()  # capture profile
+            ws.send_text('{"type": "exercise", "exercise": "shoulder_press"}')
+            assert ws.receive_json()["exercise"] == "shoulder_press"
+            ws.send_bytes(encode_binary(b"not a jpeg", seq=1))
+            assert ws.receive_json()["seq"] == 1
+
+
+class TestFrameDeadline:
+    def test_stale_frame_expired_before_processing(self, ws_client):
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat?timings=1", subprotocols=[SUBPROTOCOL_BINARY]
+        ) as ws:
+            ws.receive_json()  # capture profile
+            ws.send_bytes(encode_binary(b"jpeg", seq=1, client_ts=1_000_000.0))
+            first = ws.receive_json()
+            assert first["expired_frames"] == 0
+            assert "age" in first["timings"]
+
+            # Captured 5 s before the first frame yet arriving after it
+            ws.send_bytes(encode_binary(b"jpeg", seq=2, client_ts=995_000.0))
+            # Control messages do not replace pending frames, so the ack
+            # follows the stale frame
+            ws.send_json({"type": "exercise", "exercise": "squat"})
+            assert ws.receive_json()["type"] == "exercise"
+
+            ws.send_bytes(encode_binary(b"jpeg", seq=3, client_ts=1_000_100.0))
+            data = ws.receive_json()
+            assert data["seq"] == 3
+            assert data["frame_number"] == 2
+            assert data["expired_frames"] == 1
+
+    def test_stale_json_frame_not_decoded(self, ws_client):
+        frame = base64.b64encode(b"jpeg").decode()
+        with ws_client.websocket_connect("/ws/exercise/squat") as ws:
+            ws.receive_json()  # capture profile
+            ws.send_json({"frame": frame, "seq": 1, "ts": 1_000_000.0})
+            assert ws.receive_json()["expired_frames"] == 0
+
+            # Not valid base64, but expired before anything decodes it
+            ws.send_json({"frame": "abc", "seq": 2, "ts": 995_000.0})
+            ws.send_json({"type": "exercise", "exercise": "squat"})
+            assert ws.receive_json()["type"] == "exercise"
+
+            ws.send_json({"frame": "abc", "seq": 3, "ts": 1_000_100.0})
+            assert ws.receive_json() == {"error": "Invalid base64 frame"}
+            ws.send_json({"frame": frame, "seq": 4, "ts": 1_000_200.0})
+            data = ws.receive_json()
+            assert data["seq"] == 4
+            assert data["expired_frames"] == 1
+
+    def test_ordered_frames_never_expire(self, ws_client):
+        with ws_client.websocket_connect(
+            "/ws/exercise/squat?frames=ordered", subprotocols=[SUBPROTOCOL_BINARY]
+        ) as ws:
+            ws.receive_json()  # capture profile
+            ws.send_bytes(encode_binary(b"jpeg", seq=1, client_ts=1_000_000.0))
+            ws.receive_json()
+            ws.send_bytes(encode_binary(b"jpeg", seq=2, client_ts=995_000.0))
+            data = ws.receive_json()
+            assert data["seq"] == 2
+            assert data["expired_frames"] == 0
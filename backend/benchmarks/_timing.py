@@ -0,0 +1,28 @@
+"""Small timing helpers shared by the benchmark scripts."""
+
+import statistics
+import time
+
+
+def measure(fn, repeat: int = 200, warmup: int = 10) -> dict:
+    """Call fn repeatedly and return per-call timings in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[int(len(samples) * 0.95) - 1],
+    }
+
+
+def report(title: str, rows: list[tuple[str, dict]]) -> None:
+    print(f"\n{title}")
+    print(f"  {'stage':<40} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, t in rows:
+        print(f"  {name:<40} {t['mean']:>9.3f} {t['p50']:>9.3f} {t['p95']:>9.3f}")
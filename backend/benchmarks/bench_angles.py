@@ -0,0 +1,68 @@
+"""
+Angle computation: scalar calculate_angle loop vs the batched kernel.
+
+    python -m benchmarks.bench_angles
+"""
+
+import numpy as np
+
+from app.services.pose_engine import (
+    ANGLE_PLANS,
+    LANDMARK_NAMES,
+    PoseEngine,
+    Landmarks,
+    calculate_angle,
+    calculate_angles,
+)
+from benchmarks._timing import measure, report
+
+FRAMES = [1, 300, 3000]
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    plan = ANGLE_PLANS["squat"]
+    # get_exercise_angles / get_angle do not touch the MediaPipe graph
+    engine = PoseEngine.__new__(PoseEngine)
+
+    for n in FRAMES:
+        frames = rng.random((n, len(LANDMARK_NAMES), 4)).astype(np.float32)
+        triplets = frames[:, plan.rows, :2]
+        landmarks = [Landmarks(f) for f in frames]
+        repeat = 50 if n > 300 else 200
+
+        def scalar_triplets():
+            for frame in triplets:
+                for a, b, c in frame:
+                    calculate_angle(a, b, c)
+
+        def scalar_engine():
+            for lm in landmarks:
+                for a, b, c in [
+                    ("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
+                    ("RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE"),
+                ]:
+                    engine.get_angle(lm, a, b, c)
+
+        def plan_per_frame():
+            for lm in landmarks:
+                plan.compute(lm)
+
+        rows = [
+            ("calculate_angle loop", measure(scalar_triplets, repeat)),
+            ("PoseEngine.get_angle loop", measure(scalar_engine, repeat)),
+            ("AnglePlan.compute per frame", measure(plan_per_frame, repeat)),
+            (
+                "calculate_angles (N, joints, 3, 2)",
+                measure(lambda: calculate_angles(triplets), repeat),
+            ),
+            (
+                "AnglePlan.compute_series",
+                measure(lambda: plan.compute_series(frames), repeat),
+            ),
+        ]
+        report(f"squat angles for {n} frame(s)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Pose backends compared on the same frames: per-frame latency, detection rate
+and how closely each backend's exercise angles agree with the reference one.
+
+    python -m benchmarks.bench_backends path/to/frames_or_video [--exercise squat]
+
+The input is a directory of JPEG frames (sorted by name) or a video file
+(needs opencv). Backends whose runtime or model files are missing are skipped.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.services.frame_decoder import FrameDecoder
+from app.services.pose_backends import BACKENDS, backend_available
+from app.services.pose_engine import ANGLE_PLANS, PoseEngine
+from benchmarks._timing import report
+
+
+def load_frames(path: str) -> list[np.ndarray]:
+    target = (settings.frame_target_width, settings.frame_target_height)
+    if os.path.isdir(path):
+        decoder = FrameDecoder(*target)
+        frames = []
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith((".jpg", ".jpeg")):
+                with open(os.path.join(path, name), "rb") as f:
+                    frames.append(decoder.decode(f.read()).copy())
+        return frames
+
+    from app.services.video_analysis_service import iter_video_frames
+
+    return list(iter_video_frames(path, *target))
+
+
+def run_backend(name: str, frames: list[np.ndarray], exercise: str) -> tuple:
+    """Per-frame latencies (ms) and the primary angle series (NaN = no angle)."""
+    engine = PoseEngine(
+        roi_padding=settings.pose_roi_padding,
+        model_complexity=settings.pose_model_complexity,
+        backend=name,
+        model_dir=settings.pose_model_dir,
+    )
+    plan = ANGLE_PLANS[exercise]
+    latencies, primary = [], []
+    try:
+        for frame in frames:
+            start = time.perf_counter()
+            landmarks = engine.process_frame(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+            angle = plan.compute(landmarks)["primary"] if landmarks else None
+            primary.append(np.nan if angle is None else angle)
+    finally:
+        engine.close()
+    return latencies, np.array(primary)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("frames", help="directory of JPEG frames or a video file")
+    parser.add_argument("--exercise", default="squat", choices=sorted(ANGLE_PLANS))
+    parser.add_argument("--reference", default="mediapipe", choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    print(f"{len(frames)} frames, exercise {args.exercise}")
+
+    results = {}
+    for name in BACKENDS:
+        if not backend_available(name):
+            print(f"  {name}: runtime not installed, skipped")
+            continue
+        try:
+            results[name] = run_backend(name, frames, args.exercise)
+        except Exception as e:
+            print(f"  {name}: skipped ({e})")
+
+    rows = []
+    for name, (latencies, _) in results.items():
+        samples = sorted(latencies)
+        rows.append(
+            (
+                name,
+                {
+                    "mean": float(np.mean(samples)),
+                    "p50": samples[len(samples) // 2],
+                    "p95": samples[int(len(samples) * 0.95) - 1],
+                },
+            )
+        )
+    report("per-frame inference latency", rows)
+
+    reference = results.get(args.reference)
+    print(f"\nprimary angle agreement with {args.reference}")
+    print(
+        f"  {'backend':<20} {'detected':>9} {'both':>9} {'MAE deg':>9} {'max deg':>9}"
+    )
+    for name, (_, primary) in results.items():
+        detected = float(np.mean(~np.isnan(primary)))
+        if reference is None or name == args.reference:
+            print(f"  {name:<20} {detected:>9.1%}")
+            continue
+        both = ~np.isnan(primary) & ~np.isnan(reference[1])
+        diff = np.abs(primary[both] - reference[1][both])
+        mae = f"{diff.mean():>9.2f}" if both.any() else f"{'-':>9}"
+        worst = f"{diff.max():>9.2f}" if both.any() else f"{'-':>9}"
+        print(f"  {name:<20} {detected:>9.1%} {both.mean():>9.1%} {mae} {worst}")
+
+
+if __name__ == "__main__":
+    main()
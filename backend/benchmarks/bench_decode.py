@@ -0,0 +1,75 @@
+"""
+Per-stage cost of decoding a client frame.
+
+Compares the original path (b64decode → Image.open().convert() → np.array)
+with FrameDecoder's DCT-downscaled decode into a reused buffer.
+
+    python -m benchmarks.bench_decode
+"""
+
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.services.frame_decoder import SIMPLEJPEG_AVAILABLE, FrameDecoder
+from benchmarks._timing import measure, report
+
+SIZES = [(640, 480), (1280, 720)]
+TARGET = (320, 240)
+
+
+def make_frame(width: int, height: int) -> str:
+    """A camera-like JPEG: smooth gradients plus sensor noise, quality 70."""
+    y, x = np.mgrid[0:height, 0:width]
+    rgb = np.stack([x * 255 // width, y * 255 // height, (x + y) % 256], axis=-1)
+    noise = np.random.default_rng(0).integers(0, 24, rgb.shape)
+    img = Image.fromarray((rgb + noise).clip(0, 255).astype(np.uint8))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=70)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def original_decode(jpeg: bytes) -> np.ndarray:
+    img = Image.open(io.BytesIO(jpeg)).convert("RGB")
+    return np.array(img)
+
+
+def main() -> None:
+    print(f"simplejpeg available: {SIMPLEJPEG_AVAILABLE}")
+    for width, height in SIZES:
+        frame_b64 = make_frame(width, height)
+        jpeg = base64.b64decode(frame_b64)
+        decoder = FrameDecoder(*TARGET)
+        shape = decoder.decode(jpeg).shape
+
+        rows = [
+            ("base64 decode", measure(lambda: base64.b64decode(frame_b64))),
+            (
+                "PIL open+convert+np.array (original)",
+                measure(lambda: original_decode(jpeg)),
+            ),
+            (
+                f"PIL draft to {TARGET[0]}x{TARGET[1]}",
+                measure(lambda: decoder._decode_pillow(jpeg)),
+            ),
+        ]
+        if SIMPLEJPEG_AVAILABLE:
+            rows.append(
+                (
+                    f"simplejpeg scaled into buffer → {shape[1]}x{shape[0]}",
+                    measure(lambda: decoder._decode_turbo(jpeg)),
+                )
+            )
+        rows.append(
+            (
+                "FrameDecoder.decode_b64 (end to end)",
+                measure(lambda: decoder.decode_b64(frame_b64)),
+            )
+        )
+        report(f"{width}x{height} JPEG ({len(jpeg) // 1024} KiB)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,62 @@
 import { ref, onUnmounted } from 'vue'
+import { decode } from '@msgpack/msgpack'
+
+// Binary frames: 16-byte little-endian header (uint32 seq, float64 client
+// capture timestamp in ms, uint16 flags, 2 reserved bytes) followed by the
+// JPEG bytes; JSON frames carry the same seq and capture time as seq and ts.
+// The server skips frames that arrive too long after capture.
+// With the compact subprotocol the server answers in msgpack deltas (see
+// backend response_codec). Servers that speak neither fall back to base64
+// JSON frames.
+const SUBPROTOCOL_COMPACT = 'fithub.compact.v1'
+const SUBPROTOCOL_BINARY = 'fithub.binary.v1'
+const SUBPROTOCOL_JSON = 'fithub.json.v1'
+const BINARY_SUBPROTOCOLS = [SUBPROTOCOL_COMPACT, SUBPROTOCOL_BINARY]
+const FRAME_HEADER_SIZE = 16
+// Header flags: the overlay is drawn, so compact responses carry landmarks;
+// the payload is landmarks computed in the browser instead of a JPEG
+const FLAG_OVERLAY = 0x1
+const FLAG_LANDMARKS = 0x2
+
+// Reconnects after a dropped connection, resuming the server-side session
+const RESUME_ATTEMPTS = 5
+const RESUME_DELAY_MS = 1000
+// Close codes after which the session cannot or should not resume
+const FINAL_CLOSE_CODES = [1000, 4000]
+// Server at capacity: retry after the delay in the close reason
+const CLOSE_TRY_AGAIN_LATER = 1013
+
+// Row order of compact landmarks (backend LANDMARK_NAMES)
+const LANDMARK_NAMES = [
+  'NOSE',
+  'LEFT_SHOULDER',
+  'RIGHT_SHOULDER',
+  'LEFT_ELBOW',
+  'RIGHT_ELBOW',
+  'LEFT_WRIST',
+  'RIGHT_WRIST',
+  'LEFT_HIP',
+  'RIGHT_HIP',
+  'LEFT_KNEE',
+  'RIGHT_KNEE',
+  'LEFT_ANKLE',
+  'RIGHT_ANKLE',
+]
+
+// Compact landmarks are uint16 little-endian (x, y, visibility) rows
+function dequantizeLandmarks(bytes) {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength)
+  const result = {}
+  LANDMARK_NAMES.forEach((name, row) => {
+    const offset = row * 6
+    result[name] = {
+      x: view.getUint16(offset, true) / 65535,
+      y: view.getUint16(offset + 2, true) / 65535,
+      visibility: view.getUint16(offset + 4, true) / 65535,
+    }
+  })
+  return result
+}
 
 export function useExerciseSocket() {
   const ws = ref(null)
@@ -10,35 +68,102 @@ export function useExerciseSocket() {
   const feedback = ref([])
   const angles = ref({})
   const landmarks = ref(null)
+  const droppedFrames = ref(0)
+  // Capture profile advertised by the server ({ width, height, fps, quality })
+  const capture = ref(null)
   const error = ref(null)
+  // True once the server accepted binary frames
+  const isBinary = ref(false)
+  let seq = 0
+  // Angles in degrees, as merged from compact deltas
+  let compactAngles = {}
+  // Exercise the server is tracking; switchExercise() changes it in place
+  const exercise = ref(null)
+  // Resumable session token from the server, and the reconnect state
+  const sessionToken = ref(null)
+  let lastConnect = null
+  let resumeAttempts = 0
+  let resumeTimer = null
 
-  function connect(exerciseType, memberId = 'anonymous') {
+  // poseSource 'client' sends landmarks from an in-browser BlazePose model
+  // (sendLandmarks) instead of frames
+  function connect(exerciseType, memberId = 'anonymous', poseSource = 'server') {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
     const host = window.location.host
-    const url = `${protocol}//${host}/ws/exercise/${exerciseType}?member_id=${memberId}`
+    let url = `${protocol}//${host}/ws/exercise/${exerciseType}?member_id=${memberId}&pose=${poseSource}`
+    if (lastConnect && sessionToken.value) {
+      url += `&session=${encodeURIComponent(sessionToken.value)}`
+    }
+    lastConnect = { exerciseType, memberId, poseSource }
+    exercise.value = exerciseType
 
-    ws.value = new WebSocket(url)
+    const socket = new WebSocket(url, [
+      SUBPROTOCOL_COMPACT,
+      SUBPROTOCOL_BINARY,
+      SUBPROTOCOL_JSON,
+    ])
+    ws.value = socket
+    ws.value.binaryType = 'arraybuffer'
+    seq = 0
+    compactAngles = {}
 
     ws.value.onopen = () => {
       isConnected.value = true
+      isBinary.value = BINARY_SUBPROTOCOLS.includes(ws.value.protocol)
       error.value = null
     }
 
     ws.value.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data)
+        const compact = typeof event.data !== 'string'
+        const data = compact ? decode(event.data) : JSON.parse(event.data)
 
         if (data.error) {
           error.value = data.error
           return
         }
 
+        if (data.type === 'session') {
+          sessionToken.value = data.token
+          repCount.value = data.rep_count
+          resumeAttempts = 0
+          return
+        }
+
+        if (data.type === 'exercise') {
+          // Resumes reconnect to the exercise now being tracked
+          exercise.value = data.exercise
+          lastConnect.exerciseType = data.exercise
+          state.value = 'IDLE'
+          repCount.value = data.rep_count
+          avgFormScore.value = null
+          lastRepScore.value = null
+          feedback.value = []
+          return
+        }
+
+        if (data.type === 'capture') {
+          capture.value = {
+            width: data.width,
+            height: data.height,
+            fps: data.fps,
+            quality: data.quality,
+          }
+          return
+        }
+
+        if (compact) {
+          applyDelta(data)
+          return
+        }
+
         state.value = data.state
         repCount.value = data.rep_count
         avgFormScore.value = data.avg_form_score
         feedback.value = data.feedback || []
         angles.value = data.angles || {}
         landmarks.value = data.landmarks || null
+        droppedFrames.value = data.dropped_frames || 0
 
         if (data.completed_rep && data.rep_score !== null) {
           lastRepScore.value = data.rep_score
@@ -48,8 +173,26 @@ export function useExerciseSocket() {
       }
     }
 
-    ws.value.onclose = () => {
+    ws.value.onclose = (event) => {
       isConnected.value = false
+      // A dropped connection (not disconnect()) resumes the same set; a full
+      // server is retried (or resumed) once its retry-after has passed
+      const atCapacity = event.code === CLOSE_TRY_AGAIN_LATER
+      if (
+        ws.value === socket &&
+        (sessionToken.value || atCapacity) &&
+        !FINAL_CLOSE_CODES.includes(event.code) &&
+        resumeAttempts < RESUME_ATTEMPTS
+      ) {
+        resumeAttempts++
+        const retryAfter = atCapacity
+          ? Number(/retry-after=(\d+)/.exec(event.reason)?.[1]) * 1000
+          : NaN
+        resumeTimer = setTimeout(() => {
+          const { exerciseType, memberId, poseSource } = lastConnect
+          connect(exerciseType, memberId, poseSource)
+        }, retryAfter || RESUME_DELAY_MS * resumeAttempts)
+      }
     }
 
     ws.value.onerror = () => {
@@ -58,18 +201,102 @@ export function useExerciseSocket() {
     }
   }
 
-  function sendFrame(base64Frame) {
+  // Merge one compact frame result; absent keys are unchanged
+  function applyDelta(data) {
+    if ('s' in data) state.value = data.s
+    if ('r' in data) repCount.value = data.r
+    if ('a' in data) avgFormScore.value = data.a
+    if ('fb' in data) feedback.value = data.fb || []
+    if ('d' in data) droppedFrames.value = data.d || 0
+    if (data.an) {
+      const merged = { ...compactAngles }
+      for (const [name, tenths] of Object.entries(data.an)) {
+        if (tenths === null) delete merged[name]
+        else merged[name] = tenths / 10
+      }
+      compactAngles = merged
+      angles.value = merged
+    }
+    if ('l' in data) {
+      landmarks.value = data.l ? dequantizeLandmarks(data.l) : null
+    }
+    if (data.c && data.rs !== null) {
+      lastRepScore.value = data.rs
+    }
+  }
+
+  // Epoch ms, the clock frames are stamped with
+  function now() {
+    return performance.timeOrigin + performance.now()
+  }
+
+  // Send a frame: a JPEG Blob in binary mode, a base64 string otherwise.
+  // `overlay` asks compact responses to include the landmarks; `capturedAt`
+  // is when the frame was grabbed from the camera (epoch ms).
+  async function sendFrame(frame, overlay = true, capturedAt = now()) {
+    if (!ws.value || ws.value.readyState !== WebSocket.OPEN) return
+
+    if (!isBinary.value) {
+      ws.value.send(JSON.stringify({ frame, seq: seq++, ts: capturedAt }))
+      return
+    }
+
+    const jpeg = new Uint8Array(await frame.arrayBuffer())
+    const message = new Uint8Array(FRAME_HEADER_SIZE + jpeg.length)
+    const header = new DataView(message.buffer)
+    header.setUint32(0, seq++ >>> 0, true)
+    header.setFloat64(4, capturedAt, true)
+    header.setUint16(12, overlay ? FLAG_OVERLAY : 0, true)
+    message.set(jpeg, FRAME_HEADER_SIZE)
     if (ws.value && ws.value.readyState === WebSocket.OPEN) {
-      ws.value.send(JSON.stringify({ frame: base64Frame }))
+      ws.value.send(message)
     }
   }
 
+  // Send landmarks computed in the browser: BlazePose results
+  // ([{ x, y, z, visibility }, ...], 33 entries) or null when no pose, for
+  // the video frame captured at `capturedAt` (epoch ms)
+  function sendLandmarks(points, capturedAt = now()) {
+    if (!ws.value || ws.value.readyState !== WebSocket.OPEN) return
+
+    const rows = points
+      ? points.map((p) => [p.x, p.y, p.z || 0, p.visibility ?? 1])
+      : null
+    if (!isBinary.value) {
+      ws.value.send(
+        JSON.stringify({ landmarks: rows, seq: seq++, ts: capturedAt }),
+      )
+      return
+    }
+
+    const values = rows ? rows.flat() : []
+    const message = new ArrayBuffer(FRAME_HEADER_SIZE + values.length * 4)
+    const view = new DataView(message)
+    view.setUint32(0, seq++ >>> 0, true)
+    view.setFloat64(4, capturedAt, true)
+    view.setUint16(12, FLAG_LANDMARKS, true)
+    values.forEach((value, i) => {
+      view.setFloat32(FRAME_HEADER_SIZE + i * 4, value, true)
+    })
+    ws.value.send(message)
+  }
+
+  // Start the next exercise of a circuit without reconnecting; the server
+  // saves each exercise as its own session when the socket closes
+  function switchExercise(exerciseType) {
+    if (!ws.value || ws.value.readyState !== WebSocket.OPEN) return
+    ws.value.send(JSON.stringify({ type: 'exercise', exercise: exerciseType }))
+  }
+
   function disconnect() {
+    clearTimeout(resumeTimer)
     if (ws.value) {
-      ws.value.close()
+      const socket = ws.value
       ws.value = null
+      socket.close(1000)
     }
     isConnected.value = false
+    isBinary.value = false
   }
 
   function reset() {
@@ -80,6 +307,12 @@ export function useExerciseSocket() {
     feedback.value = []
     angles.value = {}
     landmarks.value = null
+    droppedFrames.value = 0
+    capture.value = null
+    exercise.value = null
+    sessionToken.value = null
+    lastConnect = null
+    resumeAttempts = 0
   }
 
   onUnmounted(() => {
@@ -95,9 +328,16 @@ export function useExerciseSocket() {
     feedback,
     angles,
     landmarks,
+    droppedFrames,
+    capture,
+    isBinary,
+    exercise,
+    sessionToken,
     error,
     connect,
     sendFrame,
+    sendLandmarks,
+    switchExercise,
     disconnect,
     reset,
   }
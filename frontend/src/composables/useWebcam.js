@@ -34,24 +34,43 @@ export function useWebcam() {
     isActive.value = false
   }
 
-  function captureFrame() {
-    if (!videoRef.value || !isActive.value) return null
+  // Draw the current video frame onto a canvas scaled to fit width x height
+  function drawFrame(width, height) {
+    const videoWidth = videoRef.value.videoWidth || 640
+    const videoHeight = videoRef.value.videoHeight || 480
+    const scale = Math.min(1, width / videoWidth, height / videoHeight)
 
     const canvas = document.createElement('canvas')
-    canvas.width = videoRef.value.videoWidth || 640
-    canvas.height = videoRef.value.videoHeight || 480
+    canvas.width = Math.round(videoWidth * scale)
+    canvas.height = Math.round(videoHeight * scale)
 
     const ctx = canvas.getContext('2d')
     ctx.drawImage(videoRef.value, 0, 0, canvas.width, canvas.height)
+    return canvas
+  }
+
+  // Capture a frame, scaled down to fit width x height (never up)
+  function captureFrame({ width = 640, height = 480, quality = 0.7 } = {}) {
+    if (!videoRef.value || !isActive.value) return null
+
+    const canvas = drawFrame(width, height)
 
     // Return base64 JPEG (strip the data:image/jpeg;base64, prefix)
-    const dataUrl = canvas.toDataURL('image/jpeg', 0.7)
+    const dataUrl = canvas.toDataURL('image/jpeg', quality)
     return dataUrl.split(',')[1]
   }
 
+  // Same as captureFrame, as a JPEG Blob for binary sockets
+  function captureFrameBlob({ width = 640, height = 480, quality = 0.7 } = {}) {
+    if (!videoRef.value || !isActive.value) return Promise.resolve(null)
+
+    const canvas = drawFrame(width, height)
+    return new Promise((resolve) => canvas.toBlob(resolve, 'image/jpeg', quality))
+  }
+
   onUnmounted(() => {
     stop()
   })
 
-  return { videoRef, isActive, error, start, stop, captureFrame }
+  return { videoRef, isActive, error, start, stop, captureFrame, captureFrameBlob }
 }